@@ -0,0 +1,257 @@
+"""
+Per-request metrics.
+
+``RequestMetricsMiddleware`` records the database query count, database
+time, render time and total latency of every request, keyed by URL name
+(e.g. ``core:pins``). Render time covers turning the response's data into
+its body, such as JSON encoding; building the data, serializers
+included, counts towards the view. The timings of a request are returned
+in its ``Server-Timing`` header and aggregated into histograms served in
+the Prometheus text format by ``metrics_view``, to staff sessions and to
+scrapers presenting ``METRICS_TOKEN`` as a bearer token. The histograms
+live in the process, so with several workers each one reports its own.
+The middleware runs natively under both WSGI and ASGI.
+
+``metrics_view`` also reports the lookups of the catalog cache of
+``core.catalog``.
+
+``QUERY_BUDGETS`` maps URL names to the most queries a request may run.
+Exceeding it logs a warning, or raises ``QueryBudgetExceeded`` when
+``QUERY_BUDGET_RAISE`` is set, as it is under ``manage.py test``.
+"""
+import hmac
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async
+)
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core.catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class QueryBudgetExceeded(Exception):
+    """A view ran more queries than its budget allows"""
+
+
+class Histogram:
+    """Cumulative histogram with one series per view"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self.lock:
+            series = self.series.setdefault(
+                view, {'buckets': [0] * len(self.buckets), 'sum': 0.0,
+                       'count': 0}
+            )
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def expose(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self.lock:
+            for view, series in sorted(self.series.items()):
+                labels = f'view="{view}"'
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(
+                        f'{self.name}_bucket{{{labels},le="{bound}"}} {count}'
+                    )
+                lines += [
+                    f'{self.name}_bucket{{{labels},le="+Inf"}} '
+                    f'{series["count"]}',
+                    f'{self.name}_sum{{{labels}}} {series["sum"]}',
+                    f'{self.name}_count{{{labels}}} {series["count"]}',
+                ]
+        return lines
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Total request latency.',
+    DURATION_BUCKETS
+)
+DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries.',
+    DURATION_BUCKETS
+)
+RENDER_DURATION = Histogram(
+    'http_request_render_duration_seconds',
+    'Time spent rendering the response body from its data.',
+    DURATION_BUCKETS
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries per request.',
+    QUERY_BUCKETS
+)
+HISTOGRAMS = (REQUEST_DURATION, DB_DURATION, RENDER_DURATION, DB_QUERIES)
+
+
+class QueryRecorder:
+    """Database execute wrapper counting queries and their time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class RequestMetricsMiddleware:
+    """Record query count, database time, render time and latency"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        recorder = QueryRecorder()
+        request._render_seconds = 0.0
+        with self.record_queries(recorder):
+            response = self.get_response(request)
+        return self.finish(request, response, started, recorder)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        recorder = QueryRecorder()
+        request._render_seconds = 0.0
+        # Connections are per thread and async ORM calls run in the
+        # request's sync_to_async thread, so wrap that thread's connections.
+        stack = await sync_to_async(self.record_queries)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.finish(request, response, started, recorder)
+
+    def record_queries(self, recorder):
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def finish(self, request, response, started, recorder):
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        REQUEST_DURATION.observe(view, total)
+        DB_DURATION.observe(view, recorder.seconds)
+        RENDER_DURATION.observe(view, request._render_seconds)
+        DB_QUERIES.observe(view, recorder.count)
+
+        timings = ', '.join([
+            f'db;dur={recorder.seconds * 1000:.1f};'
+            f'desc="{recorder.count} queries"',
+            f'render;dur={request._render_seconds * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        if response.has_header('Server-Timing'):
+            timings = f'{response["Server-Timing"]}, {timings}'
+        response['Server-Timing'] = timings
+
+        self.check_budget(view, recorder.count)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time rendering, which happens after this hook returns"""
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def check_budget(self, view, count):
+        budget = settings.QUERY_BUDGETS.get(view)
+        if budget is None or count <= budget:
+            return
+        message = f'{view} ran {count} queries, budget is {budget}'
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def catalog_metrics():
+    """Return the lookup counts and size of the catalog cache"""
+    stats = catalog.stats()
+    return [
+        '# HELP catalog_cache_lookups_total Catalog cache lookups.',
+        '# TYPE catalog_cache_lookups_total counter',
+        f'catalog_cache_lookups_total{{result="hit"}} {stats["hits"]}',
+        f'catalog_cache_lookups_total{{result="miss"}} {stats["misses"]}',
+        '# HELP catalog_cache_loads_total Catalog cache reloads.',
+        '# TYPE catalog_cache_loads_total counter',
+        f'catalog_cache_loads_total {stats["loads"]}',
+        '# HELP catalog_cache_bytes Estimated size of the catalog cache.',
+        '# TYPE catalog_cache_bytes gauge',
+        f'catalog_cache_bytes {stats["bytes"]}',
+    ]
+
+
+def _scraper(request):
+    """Return whether the request carries the metrics bearer token"""
+    if not settings.METRICS_TOKEN:
+        return False
+    return hmac.compare_digest(
+        request.headers.get('Authorization', ''),
+        f'Bearer {settings.METRICS_TOKEN}'
+    )
+
+
+def metrics_view(request):
+    """Serve the request histograms in the Prometheus text format"""
+    if not (
+        _scraper(request) or request.user.is_staff
+        or request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    ):
+        return HttpResponseForbidden()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.expose()
+    lines += catalog_metrics()
+    return HttpResponse(
+        '\n'.join(lines) + '\n',
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
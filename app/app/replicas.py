@@ -0,0 +1,150 @@
+"""
+Read replica routing.
+
+``ReplicaRouter`` sends ORM reads to a replica only while a request to a
+view marked with ``replica_reads`` is being served, and only for safe
+methods. Everything else, including reads inside a transaction on the
+primary, uses ``default``. All reads of a request use the same replica,
+but each statement takes its own snapshot as replication moves on, so
+they do not see the data as of one point in time, just as autocommit
+reads on the primary do not. Cached responses stay correct because
+``versioned`` reads the version counter before the data: a response may
+hold data newer than its version, never older.
+
+Replication lags, so a client that has just written keeps reading from
+the primary for ``REPLICA_STICKY_SECONDS``. Writers are given a signed,
+timestamped ``REPLICA_STICKY_COOKIE``, so the client's next request
+reaches the primary whichever worker serves it, without a lookup in any
+store. Clients that do not keep cookies are also remembered in the
+``REPLICA_STICKY_CACHE`` cache, if set, by their ``Authorization``
+header or session cookie, which are known before the view authenticates
+the request. That cache must be shared by every worker and should not
+be a database cache, whose every lookup would hit the primary.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+# Replica alias chosen for the current request, if any.
+_use_replica = ContextVar('use_replica', default=None)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_reads(view):
+    """Mark a view function or class as safe to read from replicas"""
+    view.replica_reads = True
+    return view
+
+
+def replica_aliases():
+    return [
+        alias for alias in settings.DATABASES
+        if alias.startswith('replica')
+    ]
+
+
+class ReplicaRouter:
+    """Route reads of marked requests to their replica"""
+
+    def db_for_read(self, model, **hints):
+        alias = _use_replica.get()
+        if alias is None or connections['default'].in_atomic_block:
+            return 'default'
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+STICKY_SALT = 'app.replicas.sticky'
+
+
+def _sticky_key(request):
+    client = (
+        request.headers.get('Authorization')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    )
+    if not client:
+        return None
+    return 'replica-sticky:' + hashlib.sha256(client.encode()).hexdigest()
+
+
+class ReplicaMiddleware:
+    """Enable replica reads for marked views and pin writers to the
+    primary for a while"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _use_replica.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        self.mark_writer(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = _use_replica.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+        self.mark_writer(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        aliases = replica_aliases()
+        if (
+            request.method in SAFE_METHODS
+            and getattr(view, 'replica_reads', False)
+            and aliases
+        ):
+            if not self.recent_writer(request):
+                _use_replica.set(random.choice(aliases))
+
+    def recent_writer(self, request):
+        if request.get_signed_cookie(
+            settings.REPLICA_STICKY_COOKIE, None, salt=STICKY_SALT,
+            max_age=settings.REPLICA_STICKY_SECONDS,
+        ):
+            return True
+        key = _sticky_key(request)
+        if settings.REPLICA_STICKY_CACHE and key is not None:
+            return bool(caches[settings.REPLICA_STICKY_CACHE].get(key))
+        return False
+
+    def mark_writer(self, request, response):
+        if request.method in SAFE_METHODS:
+            return
+        response.set_signed_cookie(
+            settings.REPLICA_STICKY_COOKIE, '1', salt=STICKY_SALT,
+            max_age=settings.REPLICA_STICKY_SECONDS, httponly=True,
+            samesite='Lax', secure=request.is_secure(),
+        )
+        key = _sticky_key(request)
+        if settings.REPLICA_STICKY_CACHE and key is not None:
+            caches[settings.REPLICA_STICKY_CACHE].set(
+                key, True, settings.REPLICA_STICKY_SECONDS
+            )
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.0/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,12 +22,20 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-+ytnkc+t7zlmo8b&z6!bjf_)wko*l18pcfv4&1jll)0ufy5o$q'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY',
+    'django-insecure-+ytnkc+t7zlmo8b&z6!bjf_)wko*l18pcfv4&1jll)0ufy5o$q'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = bool(int(os.environ.get('DEBUG', 1)))
 
-ALLOWED_HOSTS = []
+# Set while running the test suite.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('ALLOWED_HOSTS', '').split(',') if host
+]
 
 
 # Application definition
@@ -38,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     #Third party apps
     'rest_framework',
@@ -51,6 +61,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.metrics.RequestMetricsMiddleware',
+    'app.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +70,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.tenancy.TenantMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -90,11 +103,74 @@ DATABASES = {
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
-        'PASSWORD': os.environ.get('DB_PASS')
+        'PASSWORD': os.environ.get('DB_PASS'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # Seconds a connection is reused across requests, 0 closes it after
+        # every request. Keep 0 under ASGI, where each request has its own
+        # thread and connection.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        # Check a reused connection is alive before the request uses it.
+        'CONN_HEALTH_CHECKS': bool(
+            int(os.environ.get('DB_CONN_HEALTH_CHECKS', 1))
+        ),
+        # Server-side cursors need the same server connection for a whole
+        # transaction, which poolers in transaction mode do not give.
+        'DISABLE_SERVER_SIDE_CURSORS': bool(
+            int(os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 0))
+        ),
     }
 }
 
 
+# Read replicas
+# Comma separated hosts of replicas of the default database, added as
+# replica1, replica2... Requests to views marked with
+# app.replicas.replica_reads read from them, except for clients that wrote
+# in the last REPLICA_STICKY_SECONDS. Tests use a mirror of default.
+
+_replica_hosts = [
+    host for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',')
+    if host
+]
+if TESTING and not _replica_hosts:
+    _replica_hosts = [DATABASES['default']['HOST']]
+
+for _index, _host in enumerate(_replica_hosts, 1):
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['app.replicas.ReplicaRouter']
+
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+# Writers are given this signed cookie for the length of the stickiness.
+REPLICA_STICKY_COOKIE = 'replica_sticky'
+# Optional CACHES alias also remembering writers that do not keep
+# cookies. It must be shared by every worker, e.g. shared on Redis; a
+# database cache would add a query on the primary to every read.
+REPLICA_STICKY_CACHE = os.environ.get('REPLICA_STICKY_CACHE') or None
+
+# Caches
+# default is kept in each process. shared is seen by every worker: by
+# default a table of the default database, created by manage.py
+# createcachetable, or e.g. django.core.cache.backends.redis.RedisCache
+# at SHARED_CACHE_LOCATION, as in production.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.db.DatabaseCache'
+        ),
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', 'django_cache'),
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -113,6 +189,62 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# PASSWORD_HASHER picks the algorithm new hashes use: pbkdf2, scrypt or
+# argon2 (needs argon2-cffi). The others stay listed so existing hashes
+# still verify, and they are rehashed with the preferred algorithm and
+# parameters on the next successful login.
+
+PASSWORD_HASHING = {
+    'ALGORITHM': os.environ.get('PASSWORD_HASHER', 'pbkdf2'),
+    'ARGON2_TIME_COST': int(os.environ.get('ARGON2_TIME_COST', 2)),
+    'ARGON2_MEMORY_COST': int(os.environ.get('ARGON2_MEMORY_COST', 19456)),
+    'ARGON2_PARALLELISM': int(os.environ.get('ARGON2_PARALLELISM', 1)),
+    'SCRYPT_WORK_FACTOR': int(os.environ.get('SCRYPT_WORK_FACTOR', 2 ** 14)),
+    'SCRYPT_BLOCK_SIZE': int(os.environ.get('SCRYPT_BLOCK_SIZE', 8)),
+    'SCRYPT_PARALLELISM': int(os.environ.get('SCRYPT_PARALLELISM', 1)),
+}
+
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'core.hashers.TunedScryptPasswordHasher',
+    'argon2': 'core.hashers.TunedArgon2PasswordHasher',
+}
+
+PASSWORD_HASHERS = [
+    _PASSWORD_HASHERS[PASSWORD_HASHING['ALGORITHM']],
+    *(
+        hasher for name, hasher in _PASSWORD_HASHERS.items()
+        if name != PASSWORD_HASHING['ALGORITHM']
+    ),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Most logins hashing passwords at the same time across all workers, and
+# how many seconds a login waits for a free slot before getting a 503.
+# Slots are held in the shared cache for at most LOGIN_HASH_LEASE
+# seconds, so those of a killed worker free themselves.
+LOGIN_HASH_CONCURRENCY = int(
+    os.environ.get('LOGIN_HASH_CONCURRENCY', os.cpu_count() or 2)
+)
+
+LOGIN_HASH_TIMEOUT = float(os.environ.get('LOGIN_HASH_TIMEOUT', 5))
+
+LOGIN_HASH_LEASE = int(os.environ.get('LOGIN_HASH_LEASE', 30))
+
+# Processes hashing passwords when users are provisioned in bulk, and the
+# most users provisioned by one request. A hash takes about 0.3s of CPU,
+# so a request gives at most USER_PROVISION_MAX_PASSWORDS accounts a
+# password, about 20 per process, well within GUNICORN_TIMEOUT; larger
+# batches are issued pins.
+PASSWORD_HASH_PROCESSES = int(
+    os.environ.get('PASSWORD_HASH_PROCESSES', os.cpu_count() or 1)
+)
+USER_PROVISION_MAX = int(os.environ.get('USER_PROVISION_MAX', 5000))
+USER_PROVISION_MAX_PASSWORDS = int(os.environ.get(
+    'USER_PROVISION_MAX_PASSWORDS', 20 * PASSWORD_HASH_PROCESSES
+))
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
@@ -141,16 +273,189 @@ AUTH_USER_MODEL = 'core.User'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication', 
+        'core.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Login attempts per client IP and per email address.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('LOGIN_IP_RATE', '30/minute'),
+        'login_email': os.environ.get('LOGIN_EMAIL_RATE', '10/minute'),
+        'pin_redeem_ip': os.environ.get('PIN_REDEEM_IP_RATE', '10/minute'),
+    },
 }
 
+# Default and largest page size of paginated list endpoints.
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 100))
+
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 1000))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'School Portal API',
     'DESCRIPTION': 'API documentation for the school portal',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
-}
\ No newline at end of file
+}
+
+# PIN generation
+# Upper bound on the number of pins one request may generate, the
+# number of pins written per INSERT and the allocator drawing the codes.
+
+PIN_GENERATION_MAX = int(os.environ.get('PIN_GENERATION_MAX', 10000))
+
+PIN_GENERATION_BATCH_SIZE = int(
+    os.environ.get('PIN_GENERATION_BATCH_SIZE', 1000)
+)
+
+PIN_ALLOCATOR = os.environ.get(
+    'PIN_ALLOCATOR', 'core.allocators.FeistelPINAllocator'
+)
+
+# Key of the pin code permutation, defaults to SECRET_KEY. Changing it
+# changes which codes future sequence numbers map to.
+PIN_ALLOCATOR_KEY = os.environ.get('PIN_ALLOCATOR_KEY', '')
+
+# Rows fetched per query when streaming pin exports. Each chunk is its
+# own query, so exports work without server-side cursors.
+PIN_EXPORT_CHUNK_SIZE = int(os.environ.get('PIN_EXPORT_CHUNK_SIZE', 2000))
+
+# Most requests to the async views running database work at once per
+# process, each holds a connection.
+ASYNC_DB_CONCURRENCY = int(os.environ.get('ASYNC_DB_CONCURRENCY', 20))
+
+# Largest number of scores accepted in one batch.
+SCORE_BATCH_MAX = int(os.environ.get('SCORE_BATCH_MAX', 5000))
+
+# Rows of a roster file validated and written per transaction, and the
+# most row errors reported back for one import.
+ROSTER_IMPORT_CHUNK_SIZE = int(
+    os.environ.get('ROSTER_IMPORT_CHUNK_SIZE', 1000)
+)
+ROSTER_IMPORT_MAX_ERRORS = int(
+    os.environ.get('ROSTER_IMPORT_MAX_ERRORS', 100)
+)
+
+# Report card archives are written to REPORT_CARD_DIR, which the web
+# servers serve them from, so it must be shared with the workers. Workers
+# render REPORT_CARD_BATCH_SIZE cards at a time over REPORT_CARD_PROCESSES
+# processes, and a running job with no progress for
+# REPORT_CARD_STALE_SECONDS is taken over by another worker.
+REPORT_CARD_DIR = os.environ.get(
+    'REPORT_CARD_DIR', str(BASE_DIR / 'report_cards')
+)
+REPORT_CARD_PROCESSES = int(
+    os.environ.get('REPORT_CARD_PROCESSES', os.cpu_count() or 1)
+)
+REPORT_CARD_BATCH_SIZE = int(os.environ.get('REPORT_CARD_BATCH_SIZE', 200))
+REPORT_CARD_STALE_SECONDS = int(
+    os.environ.get('REPORT_CARD_STALE_SECONDS', 300)
+)
+
+# Request metrics
+# Most database queries a request to each URL name may run. Exceeding a
+# budget is logged, and raises an error under 'manage.py test'.
+
+QUERY_BUDGETS = {
+    # Throttles and the hashing slot run about 18 of these against the
+    # shared cache when it is the database table, none with Redis. One
+    # more when the login rehashes the password, with the bump of the
+    # tokens version.
+    'core:token': 27,
+    # Updates also bump the tokens version.
+    'core:me': 7,
+    # Pin generation runs a few queries per batch, up to 10 batches.
+    'core:pins': 80,
+    'core:pins-export': 5,
+    # With 6 for the throttle when the shared cache is the database.
+    'core:pins-redeem': 16,
+    'core:lesson-gradebook': 8,
+    'core:async-me': 5,
+    'core:async-pins': 5,
+    'core:async-lesson-gradebook': 8,
+    'core:lesson-rankings': 4,
+    'core:rankings': 3,
+    'core:people-search': 3,
+    # Marking reads the lesson and its enrollments and updates the
+    # class's rows. The first marking of a month inserts the rows and
+    # updates them again.
+    'core:lesson-attendance': 7,
+    'core:report-cards': 3,
+    'core:report-card': 3,
+    'core:report-card-archive': 3,
+    'teacher:lessons': 3,
+    'teacher:lesson-roster': 4,
+    'teacher:students': 4,
+    'teacher:teachers': 3,
+}
+
+QUERY_BUDGET_RAISE = TESTING
+
+# Scrapers read /metrics/ with an "Authorization: Bearer METRICS_TOKEN"
+# header, or from METRICS_ALLOWED_IPS; staff logins always can. None are
+# allowed by default: behind a proxy every client has its address.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip
+]
+
+# Token authentication cache
+# Tokens are cached per process for TTL seconds. Set SHARED_CACHE to a
+# CACHES alias to also share them between workers for SHARED_TTL seconds.
+# Deleted tokens and changed users stop being served from any cache
+# within CHECK_INTERVAL seconds, when each process checks for them.
+
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'CHECK_INTERVAL': float(
+        os.environ.get('TOKEN_AUTH_CACHE_CHECK_INTERVAL', 1)
+    ),
+    'SHARED_CACHE': os.environ.get('TOKEN_AUTH_SHARED_CACHE') or None,
+    'SHARED_TTL': int(os.environ.get('TOKEN_AUTH_SHARED_TTL', 300)),
+}
+
+# Response cache
+# Data of versioned GET responses is cached in the ALIAS cache for TTL
+# seconds, keyed by the version of the school's data. A shared cache lets
+# workers reuse each other's responses.
+
+RESPONSE_CACHE = {
+    'ALIAS': os.environ.get('RESPONSE_CACHE', 'default'),
+    'TTL': int(os.environ.get('RESPONSE_CACHE_TTL', 300)),
+}
+
+# Catalog cache
+# Subjects, lessons and assignment types are kept in each process while
+# they fit in MAX_BYTES. Changes made by other processes are picked up
+# within CHECK_INTERVAL seconds.
+
+CATALOG_CACHE = {
+    'MAX_BYTES': int(os.environ.get('CATALOG_CACHE_MAX_BYTES', 16 * 2**20)),
+    'CHECK_INTERVAL': int(os.environ.get('CATALOG_CACHE_CHECK_INTERVAL', 5)),
+}
+
+# Attendance
+# Attendance is taken for up to PERIODS periods a day. Stored bitmaps are
+# laid out by this number, so changing it needs their rows rewritten.
+
+ATTENDANCE_PERIODS = int(os.environ.get('ATTENDANCE_PERIODS', 8))
+
+# Class rankings
+# Rankings are cached in the ALIAS cache for TTL seconds, keyed by the
+# version of their data. GRADE_BANDS maps the lowest total of each band
+# to its name.
+
+RANKING_CACHE = {
+    'ALIAS': os.environ.get('RANKING_CACHE', 'default'),
+    'TTL': int(os.environ.get('RANKING_CACHE_TTL', 3600)),
+}
+
+GRADE_BANDS = [
+    (80, 'A'),
+    (70, 'B'),
+    (60, 'C'),
+    (50, 'D'),
+    (40, 'E'),
+    (0, 'F'),
+]
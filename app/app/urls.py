@@ -5,6 +5,8 @@ from drf_spectacular.views import (
 from django.contrib import admin
 from django.urls import path, include
 
+from app.metrics import metrics_view
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,5 +15,7 @@ urlpatterns = [
         'api/docs/',
         SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'
     ),
+    path('metrics/', metrics_view, name='metrics'),
+    path('teacher/', include('teacher.urls')),
     path('', include('core.urls'))
 ]
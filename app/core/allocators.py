@@ -0,0 +1,91 @@
+"""
+Pin code allocators.
+
+An allocator hands out batches of pin codes. The allocator used by
+``core.utils.generate_pins`` is set with the ``PIN_ALLOCATOR`` setting.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from core.models import PIN, PINSequence
+
+PIN_LENGTH = 10
+# Pin codes are 10 hex digits, i.e. a 40 bit keyspace.
+KEYSPACE_BITS = PIN_LENGTH * 4
+HALF_BITS = KEYSPACE_BITS // 2
+HALF_MASK = (1 << HALF_BITS) - 1
+
+
+def _random_pin():
+    """Return a random 10 character pin code"""
+    return uuid.uuid4().hex[:PIN_LENGTH].upper()
+
+
+class RandomPINAllocator:
+    """Draw random codes and check them against the database.
+
+    Collisions are checked with one ``IN`` query per round and only the
+    colliding codes are drawn again.
+    """
+
+    def allocate(self, size):
+        codes = set()
+        while len(codes) < size:
+            candidates = set()
+            while len(codes) + len(candidates) < size:
+                code = _random_pin()
+                if code not in codes:
+                    candidates.add(code)
+            taken = PIN.objects.filter(
+                pin_code__in=candidates
+            ).values_list('pin_code', flat=True)
+            codes |= candidates.difference(taken)
+        return list(codes)
+
+
+class FeistelPINAllocator:
+    """Encrypt a reserved block of sequence numbers into pin codes.
+
+    Sequence numbers are reserved from ``PINSequence`` a block at a time
+    and run through a keyed Feistel network over the 40 bit keyspace.
+    The network is a permutation, so distinct sequence numbers always give
+    distinct codes and no lookup is needed, while the key keeps codes from
+    being guessed from one another.
+    """
+    sequence_name = 'pin'
+
+    def __init__(self, key=None, rounds=8):
+        key = key or settings.PIN_ALLOCATOR_KEY or settings.SECRET_KEY
+        self.key = hashlib.sha256(f'pin-allocator:{key}'.encode()).digest()
+        self.rounds = rounds
+
+    def _round(self, value, index):
+        digest = hashlib.blake2b(
+            value.to_bytes(3, 'big') + bytes([index]),
+            key=self.key, digest_size=4
+        ).digest()
+        return int.from_bytes(digest, 'big') & HALF_MASK
+
+    def permute(self, number):
+        """Map a sequence number to its position in the keyspace"""
+        left, right = number >> HALF_BITS, number & HALF_MASK
+        for index in range(self.rounds):
+            left, right = right, left ^ self._round(right, index)
+        return (left << HALF_BITS) | right
+
+    def allocate(self, size):
+        start = PINSequence.reserve(self.sequence_name, size)
+        if start + size > 1 << KEYSPACE_BITS:
+            raise ValueError('PIN keyspace is exhausted')
+        return [
+            f'{self.permute(number):0{PIN_LENGTH}X}'
+            for number in range(start, start + size)
+        ]
+
+
+def get_allocator():
+    """Return an instance of the configured pin allocator"""
+    return import_string(settings.PIN_ALLOCATOR)()
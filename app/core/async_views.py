@@ -0,0 +1,157 @@
+"""
+Async views of the read paths of the Core API.
+
+These are plain Django async views using the async ORM, so under an ASGI
+server a request waiting on the database does not hold a thread. DRF
+views are synchronous, so authentication, permissions and errors are
+handled here with the same rules and response shapes as the DRF views in
+``core.views``.
+
+Each async request using the database holds its own connection, so at
+most ``ASYNC_DB_CONCURRENCY`` of them run at once per process and the
+rest wait on the event loop rather than exhausting Postgres connections.
+The connection is released before the slot is.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.translation import gettext as _
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+
+from app.replicas import replica_reads
+from core import models
+from core.authentication import aauthenticate_token
+from core.filters import filter_pins
+from core.gradebook import GradebookError, compute_gradebook
+from core.pagination import KeysetPagination
+from core.serializers import (
+    PINFilterSerializer,
+    PINSerializer,
+    UserSerializer
+)
+
+
+_db_slots = None
+
+
+def _release_connections():
+    """Close this thread's connections as Django does after a request"""
+    for connection in connections.all(initialized_only=True):
+        # Connections in a transaction, as in test cases, are kept.
+        if not connection.in_atomic_block:
+            connection.close_if_unusable_or_obsolete()
+
+
+def limit_concurrency(view):
+    """Run an async view once one of the database slots is free"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        global _db_slots
+        if _db_slots is None:
+            _db_slots = asyncio.Semaphore(settings.ASYNC_DB_CONCURRENCY)
+        async with _db_slots:
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                # Django only closes it once the response is sent, which
+                # under load is long after the slot is released.
+                await sync_to_async(_release_connections)()
+    return wrapper
+
+
+def _error(detail, status):
+    response = JsonResponse({'detail': detail}, status=status)
+    if status == 401:
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+def _unauthorized():
+    return _error(_('Authentication credentials were not provided.'), 401)
+
+
+def _forbidden():
+    return _error(
+        _('You do not have permission to perform this action.'), 403
+    )
+
+
+@require_GET
+@limit_concurrency
+async def me(request):
+    """Return the authenticated user"""
+    user = await aauthenticate_token(request)
+    if user is None:
+        return _unauthorized()
+    request.user = user
+    return JsonResponse(UserSerializer(user).data)
+
+
+@replica_reads
+@require_GET
+@limit_concurrency
+async def pin_list(request):
+    """List the pins of the user's school, newest first"""
+    user = await aauthenticate_token(request)
+    if user is None:
+        return _unauthorized()
+    request.user = user
+    if not user.is_staff:
+        return _forbidden()
+
+    params = Request(request)
+    serializer = PINFilterSerializer(data=params.query_params)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
+    queryset = models.PIN.objects.all()
+    if user.school_id is not None:
+        queryset = queryset.filter(school_id=user.school_id)
+    elif not user.is_superuser:
+        queryset = queryset.none()
+    queryset = filter_pins(queryset, serializer.validated_data)
+
+    paginator = KeysetPagination()
+    try:
+        rows = paginator.get_page_queryset(queryset, params)
+    except NotFound as error:
+        return _error(error.detail, 404)
+    page = paginator.set_page([pin async for pin in rows])
+    return JsonResponse({
+        'next': paginator.get_next_link(),
+        'results': PINSerializer(page, many=True).data,
+    })
+
+
+@replica_reads
+@require_GET
+@limit_concurrency
+async def lesson_gradebook(request, pk):
+    """Return the grades of every student of a lesson"""
+    user = await aauthenticate_token(request)
+    if user is None:
+        return _unauthorized()
+    request.user = user
+    if not (user.is_staff or user.is_teacher):
+        return _forbidden()
+
+    try:
+        lesson = await models.Lesson.scoped.aget(pk=pk)
+    except models.Lesson.DoesNotExist:
+        return _error(_('No Lesson matches the given query.'), 404)
+    try:
+        # The computation is NumPy work between a few queries, run it
+        # off the event loop.
+        gradebook = await sync_to_async(compute_gradebook)(lesson)
+    except GradebookError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return JsonResponse({
+        'lesson': lesson.pk,
+        'categories': gradebook.categories(),
+        'students': gradebook.rows(),
+    })
@@ -0,0 +1,166 @@
+"""
+Attendance.
+
+Each enrollment has one ``Attendance`` row a month instead of one row per
+period. The row holds two bitmaps of ``31 * ATTENDANCE_PERIODS`` bits,
+one bit per period of every day, day by day: ``marked`` for the periods
+whose attendance was taken and ``present`` for those the student
+attended. Marking a class sets one bit in the rows of all its students
+with a single ``UPDATE`` using ``set_bit``.
+
+Reports unpack the bitmaps of a class into one NumPy array and count its
+bits along each axis, giving the rates of every student, day and the
+class as a whole without counting rows.
+"""
+import calendar
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import BinaryField, Case, Func, Value, When
+from django.utils.translation import gettext as _
+
+from core.models import Attendance, Enrollment
+
+DAYS = 31
+
+
+class AttendanceError(ValueError):
+    """The attendance cannot be marked"""
+
+
+def month_bytes():
+    """Return the size of a month's bitmap"""
+    return -(-DAYS * settings.ATTENDANCE_PERIODS // 8)
+
+
+def _unpack(bitmaps):
+    """Return the bitmaps as a (rows, days, periods) array of bools"""
+    periods = settings.ATTENDANCE_PERIODS
+    packed = np.frombuffer(b''.join(bitmaps), dtype=np.uint8).reshape(
+        len(bitmaps), month_bytes()
+    )
+    bits = np.unpackbits(
+        packed, axis=1, count=DAYS * periods, bitorder='little'
+    )
+    return bits.reshape(len(bitmaps), DAYS, periods).astype(bool)
+
+
+def _rate(present, marked):
+    return round(present / marked * 100, 1) if marked else None
+
+
+class SetBit(Func):
+    """A bytea with one bit set, bits counted from the right of each byte"""
+    function = 'SET_BIT'
+    output_field = BinaryField()
+
+
+def mark_class(lesson, day, period, absent=()):
+    """Mark every student of a lesson present for a period of a day,
+    except the ``absent`` student ids.
+
+    Returns the number of students marked.
+    """
+    if not 1 <= period <= settings.ATTENDANCE_PERIODS:
+        raise AttendanceError(
+            _('Period must be between 1 and %(max)s') % {
+                'max': settings.ATTENDANCE_PERIODS
+            }
+        )
+    month = day.replace(day=1)
+    bit = (day.day - 1) * settings.ATTENDANCE_PERIODS + period - 1
+    enrollments = dict(
+        Enrollment.objects.filter(lesson=lesson).values_list(
+            'student_id', 'id'
+        )
+    )
+    unknown = set(absent) - enrollments.keys()
+    if unknown:
+        raise AttendanceError(
+            _('Students %(ids)s are not enrolled in the lesson') % {
+                'ids': ', '.join(map(str, sorted(unknown)))
+            }
+        )
+    if not enrollments:
+        return 0
+    rows = Attendance.objects.filter(
+        enrollment_id__in=enrollments.values(), month=month
+    )
+    # Each row is updated in place and locked while it is, so markings
+    # of other periods made at the same time are kept.
+    changes = {
+        'marked': SetBit('marked', Value(bit), Value(1)),
+        'present': SetBit('present', Value(bit), Case(
+            When(
+                enrollment_id__in=[enrollments[pk] for pk in absent],
+                then=Value(0)
+            ),
+            default=Value(1)
+        )),
+    }
+    with transaction.atomic():
+        if rows.update(**changes) == len(enrollments):
+            return len(enrollments)
+        # Create the month's missing rows, then mark them all again,
+        # which leaves the others as they are.
+        empty = bytes(month_bytes())
+        Attendance.objects.bulk_create([
+            Attendance(
+                school_id=lesson.school_id, enrollment_id=enrollment_id,
+                month=month, marked=empty, present=empty
+            )
+            for enrollment_id in enrollments.values()
+        ], ignore_conflicts=True, batch_size=5000)
+        rows.update(**changes)
+    return len(enrollments)
+
+
+def lesson_attendance(lesson, month):
+    """Return the attendance rates of a lesson's students, of each day
+    and of the class over a month"""
+    month = month.replace(day=1)
+    rows = list(Attendance.objects.filter(
+        enrollment__lesson=lesson, month=month
+    ).order_by(
+        'enrollment__student__last_name', 'enrollment__student_id'
+    ).values_list(
+        'enrollment__student_id', 'enrollment__student__first_name',
+        'enrollment__student__last_name', 'marked', 'present'
+    ))
+    days = calendar.monthrange(month.year, month.month)[1]
+    report = {
+        'lesson': lesson.pk, 'month': month, 'marked': 0, 'present': 0,
+        'rate': None, 'students': [], 'days': [],
+    }
+    if not rows:
+        return report
+    marked = _unpack([row[3] for row in rows])
+    present = _unpack([row[4] for row in rows]) & marked
+    student_marked = marked.sum(axis=(1, 2)).tolist()
+    student_present = present.sum(axis=(1, 2)).tolist()
+    day_marked = marked.sum(axis=(0, 2)).tolist()
+    day_present = present.sum(axis=(0, 2)).tolist()
+    report['marked'] = sum(student_marked)
+    report['present'] = sum(student_present)
+    report['rate'] = _rate(report['present'], report['marked'])
+    report['students'] = [
+        {
+            'student': student_id, 'name': f'{first_name} {last_name}',
+            'marked': student_marked[index],
+            'present': student_present[index],
+            'rate': _rate(student_present[index], student_marked[index]),
+        }
+        for index, (student_id, first_name, last_name, *bitmaps) in
+        enumerate(rows)
+    ]
+    report['days'] = [
+        {
+            'date': month.replace(day=index + 1),
+            'marked': day_marked[index],
+            'present': day_present[index],
+            'rate': _rate(day_present[index], day_marked[index]),
+        }
+        for index in range(days) if day_marked[index]
+    ]
+    return report
@@ -0,0 +1,289 @@
+"""
+Token authentication with a cache in front of the token lookup.
+
+Tokens are kept in a bounded in-process LRU with a TTL and, when
+``TOKEN_AUTH_CACHE['SHARED_CACHE']`` names a Django cache, in that cache
+too so workers share lookups. Deleting a token, or saving or deleting a
+user, which covers deactivation and role flag changes, bumps the
+``tokens`` data version in the same transaction. Every process compares
+the version with the one its entries were cached under at most every
+``CHECK_INTERVAL`` seconds and drops them all when it moved, and entries
+of the shared cache cached under an older version are ignored. The
+handlers in ``core.signals`` also drop the writing process's entries
+once the change commits. Tokens of inactive users are rejected even when
+cached.
+
+``aauthenticate_token`` does the same lookup for async views.
+
+``authenticate_login`` bounds how many logins hash passwords at once
+across every worker, so a burst of logins cannot take every CPU away
+from other requests. The slots are leased keys of the ``shared`` cache.
+"""
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework.authtoken.models import Token
+
+
+SCOPE = 'tokens'
+
+
+def _stamp_rows():
+    model = apps.get_model('core', 'DataVersion')
+    return model.objects.filter(scope=SCOPE).values_list(
+        'version', flat=True
+    )
+
+
+class TokenCache:
+    """Bounded LRU mapping token keys to tokens with their user"""
+
+    def __init__(self, max_size, ttl, check_interval=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.entries = OrderedDict()
+        self.user_keys = defaultdict(set)
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+        self.stamp = None
+        self.checked_at = 0.0
+
+    def check(self):
+        """Return the tokens version, dropping every entry when it moved
+        since they were cached. Queries it at most every check_interval
+        seconds."""
+        if time.monotonic() < self.checked_at:
+            return self.stamp
+        return self.update_stamp(_stamp_rows().first() or 0)
+
+    async def acheck(self):
+        if time.monotonic() < self.checked_at:
+            return self.stamp
+        return self.update_stamp(await _stamp_rows().afirst() or 0)
+
+    def update_stamp(self, stamp):
+        with self.lock:
+            if stamp != self.stamp:
+                self.entries.clear()
+                self.user_keys.clear()
+                self.stamp = stamp
+            self.checked_at = time.monotonic() + self.check_interval
+            return stamp
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, token, stamp=None):
+        """Cache a token read under the ``stamp`` version"""
+        with self.lock:
+            if stamp != self.stamp:
+                return
+            self.entries[key] = (token, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            self.user_keys[token.user_id].add(key)
+            while len(self.entries) > self.max_size:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.user_keys[evicted.user_id].discard(evicted.key)
+
+    def invalidate(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.user_keys[entry[0].user_id].discard(key)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            for key in self.user_keys.pop(user_id, ()):
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.user_keys.clear()
+            self.stamp = None
+            self.checked_at = 0.0
+
+
+def _setting(name):
+    return settings.TOKEN_AUTH_CACHE[name]
+
+
+token_cache = TokenCache(
+    _setting('MAX_SIZE'), _setting('TTL'), _setting('CHECK_INTERVAL')
+)
+
+
+def _shared_cache():
+    alias = _setting('SHARED_CACHE')
+    return caches[alias] if alias else None
+
+
+def _shared_key(key):
+    return f'auth-token:{key}'
+
+
+def _shared_token(entry, stamp):
+    """Return the token of a shared cache entry cached under ``stamp``"""
+    if entry is None or entry[0] != stamp:
+        return None
+    return entry[1]
+
+
+def invalidate_token(key):
+    """Drop a token from the local and shared caches"""
+    token_cache.invalidate(key)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete(_shared_key(key))
+
+
+def invalidate_user(user_id):
+    """Drop every token of a user from the local and shared caches"""
+    token_cache.invalidate_user(user_id)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.delete_many([
+            _shared_key(key) for key in
+            Token.objects.filter(user_id=user_id).values_list(
+                'key', flat=True
+            )
+        ])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the token and user lookup"""
+
+    def authenticate_credentials(self, key):
+        # Read before the token, so a token changed meanwhile is cached
+        # under the version before the change and ignored after it.
+        stamp = token_cache.check()
+        token = token_cache.get(key)
+        shared = _shared_cache()
+        if token is None and shared is not None:
+            token = _shared_token(shared.get(_shared_key(key)), stamp)
+            if token is not None:
+                token_cache.set(key, token, stamp)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token, stamp)
+            if shared is not None:
+                shared.set(
+                    _shared_key(key), (stamp, token), _setting('SHARED_TTL')
+                )
+        if not token.user.is_active:
+            raise AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        # Copies keep requests from changing each other's user.
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token.user, token
+
+
+async def aauthenticate_token(request):
+    """Return the user of a request's token for async views, or None.
+
+    Async counterpart of ``CachedTokenAuthentication`` for plain Django
+    views, which DRF's authentication classes cannot serve.
+    """
+    auth = request.headers.get('Authorization', '').split()
+    if len(auth) != 2 or auth[0].lower() != 'token':
+        return None
+    key = auth[1]
+    stamp = await token_cache.acheck()
+    token = token_cache.get(key)
+    shared = _shared_cache()
+    if token is None and shared is not None:
+        token = _shared_token(await shared.aget(_shared_key(key)), stamp)
+        if token is not None:
+            token_cache.set(key, token, stamp)
+    if token is None:
+        try:
+            token = await Token.objects.select_related('user').aget(key=key)
+        except Token.DoesNotExist:
+            return None
+        token_cache.set(key, token, stamp)
+        if shared is not None:
+            await shared.aset(
+                _shared_key(key), (stamp, token), _setting('SHARED_TTL')
+            )
+    if not token.user.is_active:
+        return None
+    return copy.copy(token.user)
+
+
+class LoginBusy(APIException):
+    """Every password hashing slot stayed taken"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many logins in progress, try again shortly.')
+    default_code = 'login_busy'
+
+
+class SharedSemaphore:
+    """Semaphore whose slots are keys of a cache shared by processes.
+
+    A slot is taken by adding its key, which fails while another holder
+    has it, and is leased for ``lease`` seconds so the slots of a worker
+    that died free themselves.
+    """
+    poll_interval = 0.05
+
+    def __init__(self, cache, name, size, lease):
+        self.cache = cache
+        self.keys = [f'semaphore:{name}:{index}' for index in range(size)]
+        self.lease = lease
+
+    def acquire(self, timeout):
+        """Return a held slot, or None once ``timeout`` seconds passed"""
+        holder = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while True:
+            for key in self.keys:
+                if self.cache.add(key, holder, self.lease):
+                    return key, holder
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def release(self, slot):
+        key, holder = slot
+        if self.cache.get(key) == holder:
+            self.cache.delete(key)
+
+
+def login_slots():
+    return SharedSemaphore(
+        caches['shared'], 'login-hash', settings.LOGIN_HASH_CONCURRENCY,
+        settings.LOGIN_HASH_LEASE
+    )
+
+
+def authenticate_login(request, **credentials):
+    """Authenticate credentials once a password hashing slot is free"""
+    slots = login_slots()
+    slot = slots.acquire(timeout=settings.LOGIN_HASH_TIMEOUT)
+    if slot is None:
+        raise LoginBusy()
+    try:
+        return authenticate(request=request, **credentials)
+    finally:
+        slots.release(slot)
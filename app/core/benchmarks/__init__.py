@@ -0,0 +1,35 @@
+"""
+Benchmarks run with ``python manage.py benchmark <name>``.
+
+Each module listed in ``BENCHMARKS`` defines ``add_arguments(parser)`` and
+``run(command, options)``. Benchmarks run inside a transaction that is
+rolled back, so the data they create is never kept. Modules that set
+``ROLLBACK = False`` commit their data and remove it themselves.
+"""
+import time
+from contextlib import contextmanager
+
+BENCHMARKS = {
+    'pin_allocator': 'core.benchmarks.pins',
+    'pin_redemption': 'core.benchmarks.redemption',
+    'gradebook': 'core.benchmarks.gradebook',
+    'token_auth': 'core.benchmarks.token_auth',
+    'http_load': 'core.benchmarks.http_load',
+    'connections': 'core.benchmarks.connections',
+    'tenancy': 'core.benchmarks.tenancy',
+    'provisioning': 'core.benchmarks.provisioning',
+    'report_cards': 'core.benchmarks.report_cards',
+    'rankings': 'core.benchmarks.rankings',
+    'search': 'core.benchmarks.search',
+    'attendance': 'core.benchmarks.attendance',
+}
+
+
+@contextmanager
+def timer(results, name):
+    """Add the time spent in the block to ``results[name]``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        results[name] = time.perf_counter() - started
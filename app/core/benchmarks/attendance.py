@@ -0,0 +1,70 @@
+"""
+Mark a month of attendance for a large class and report it.
+
+    python manage.py benchmark attendance --students 1000 --days 20
+
+Times marking the class for every period of ``--days`` school days and
+reading its monthly report, and gives the size of a month's row. The
+benchmark's transaction keeps every row version the marking wrote, so
+reports run slower here than on a vacuumed table.
+"""
+import random
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection
+
+from core import models
+from core.attendance import lesson_attendance, mark_class
+from core.benchmarks import timer
+from core.benchmarks.gradebook import _seed
+
+
+def add_arguments(parser):
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+
+
+def run(command, options):
+    lesson, _ = _seed(options['students'], 0)
+    students = list(models.Enrollment.objects.filter(
+        lesson=lesson
+    ).values_list('student_id', flat=True))
+    rng = random.Random(1)
+    periods = settings.ATTENDANCE_PERIODS
+    days = [
+        date(2024, 9, 2) + timedelta(days=offset)
+        for offset in range(28) if offset % 7 < 5
+    ][:options['days']]
+    results = {}
+
+    with timer(results, 'mark'):
+        for day in days:
+            for period in range(1, periods + 1):
+                mark_class(
+                    lesson, day, period,
+                    rng.sample(students, len(students) // 10)
+                )
+    with timer(results, 'report'):
+        for _ in range(options['repeat']):
+            lesson_attendance(lesson, date(2024, 9, 1))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT avg(pg_column_size(attendance.*)) '
+            'FROM core_attendance attendance'
+        )
+        size = cursor.fetchone()[0]
+
+    marks = len(days) * periods
+    command.stdout.write(
+        f'mark    {results["mark"] / marks * 1000:>9.2f} ms a period '
+        f'for {len(students)} students'
+    )
+    command.stdout.write(
+        f'report  {results["report"] / options["repeat"] * 1000:>9.2f} ms'
+    )
+    command.stdout.write(
+        f'{size:.0f} bytes a student for the month in one row, '
+        f'against {marks} rows one per period'
+    )
@@ -0,0 +1,56 @@
+"""
+Measure the per-request cost of opening database connections against
+persistent connections, with and without health checks.
+
+    python manage.py benchmark connections --requests 2000
+
+Each request runs Django's request start and finish signal handlers
+around a small query, as a real request does. Run it with
+DB_HOST/DB_PORT pointing at PgBouncer to measure the pooler instead.
+"""
+import time
+
+from django.core.signals import request_finished, request_started
+from django.db import connection
+
+ROLLBACK = False
+
+MODES = [
+    ('new connection per request', 0, False),
+    ('persistent', 60, False),
+    ('persistent + health checks', 60, True),
+]
+
+
+def add_arguments(parser):
+    parser.add_argument('--requests', type=int, default=2000)
+
+
+def run(command, options):
+    settings_dict = connection.settings_dict
+    saved = settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS']
+    try:
+        for name, max_age, health_checks in MODES:
+            connection.close()
+            settings_dict['CONN_MAX_AGE'] = max_age
+            settings_dict['CONN_HEALTH_CHECKS'] = health_checks
+            connects = 0
+            started = time.perf_counter()
+            for _ in range(options['requests']):
+                request_started.send(sender=__name__)
+                if connection.connection is None:
+                    connects += 1
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                request_finished.send(sender=__name__)
+            seconds = time.perf_counter() - started
+            command.stdout.write(
+                f'{name:<28}{options["requests"] / seconds:>8.0f} requests/s'
+                f'{seconds / options["requests"] * 1000:>8.2f} ms/request'
+                f'{connects:>7} connects'
+            )
+    finally:
+        connection.close()
+        settings_dict['CONN_MAX_AGE'], settings_dict['CONN_HEALTH_CHECKS'] = (
+            saved
+        )
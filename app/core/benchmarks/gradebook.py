@@ -0,0 +1,153 @@
+"""
+Compute a large lesson's gradebook.
+
+    python manage.py benchmark gradebook --students 2000 --assignments 200
+
+Compares the array engine with computing grades one student at a time
+through ORM relations, measured on ``--naive-students`` students and
+extrapolated to the class. Then times gradebook requests rebuilt after a
+change, served from the response cache, and revalidated with a 304.
+"""
+from datetime import date
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import models, versions
+from core.benchmarks import timer
+from core.gradebook import compute, compute_gradebook
+
+BATCH_SIZE = 10000
+CATEGORIES = [('Class work', 30), ('Tests', 30), ('Exams', 40)]
+
+
+def add_arguments(parser):
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--assignments', type=int, default=200)
+    parser.add_argument('--naive-students', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=20)
+
+
+def _seed(students, assignments):
+    school = models.School.objects.create(
+        name='Benchmark', address='', email='bench@eg.com', phone=''
+    )
+    subject = models.Subject.objects.create(
+        school=school, name='Benchmark subject', subject_type='core',
+        subect_code='BENCH'
+    )
+    lesson = models.Lesson.objects.create(
+        subject=subject, description='Benchmark', term='First', year=2024
+    )
+    types = [
+        models.AssignmentType.objects.create(
+            lesson=lesson, name=name, percentage=percentage
+        )
+        for name, percentage in CATEGORIES
+    ]
+    assignment_objs = models.Assignment.objects.bulk_create([
+        models.Assignment(
+            assignment_type=types[index % len(types)],
+            name=f'Assignment {index}', max_points=100
+        )
+        for index in range(assignments)
+    ])
+    student_objs = models.Student.objects.bulk_create([
+        models.Student(
+            school=school, first_name=f'Student{index}', last_name='Bench',
+            gender='m', date_of_birth=date(2010, 1, 1),
+            nationality='Ghanaian', grade_level='JHS 1'
+        )
+        for index in range(students)
+    ], batch_size=BATCH_SIZE)
+    models.Enrollment.objects.bulk_create([
+        models.Enrollment(student=student, lesson=lesson)
+        for student in student_objs
+    ], batch_size=BATCH_SIZE)
+
+    rng = np.random.default_rng(0)
+    marks = rng.integers(0, 101, size=(students, assignments))
+    rows = []
+    for student, student_marks in zip(student_objs, marks.tolist()):
+        for assignment, mark in zip(assignment_objs, student_marks):
+            rows.append(models.Score(
+                student=student, assignment=assignment, score=mark
+            ))
+            if len(rows) == BATCH_SIZE:
+                models.Score.objects.bulk_create(rows)
+                rows = []
+    models.Score.objects.bulk_create(rows)
+    return lesson, student_objs
+
+
+def _naive_total(student, lesson):
+    """Compute one student's grade through ORM relations"""
+    total = 0
+    for assignment_type in lesson.assignment_type.all():
+        earned = possible = 0
+        for assignment in assignment_type.assignments.all():
+            score = assignment.scores.filter(student=student).first()
+            if score is not None:
+                earned += float(score.score)
+                possible += assignment.max_points
+        if possible:
+            total += earned / possible * assignment_type.percentage
+    return total
+
+
+def run(command, options):
+    students, assignments = options['students'], options['assignments']
+    command.stdout.write(
+        f'Seeding {students} students x {assignments} assignments...'
+    )
+    lesson, student_objs = _seed(students, assignments)
+
+    results = {}
+    with timer(results, 'load + compute'):
+        gradebook = compute_gradebook(lesson)
+    max_points = np.full(assignments, 100.)
+    categories = np.arange(assignments) % len(CATEGORIES)
+    weights = np.array([percentage for _, percentage in CATEGORIES], float)
+    with timer(results, 'compute only'):
+        compute(gradebook.scores, max_points, categories, weights)
+    sample = student_objs[:options['naive_students']]
+    with timer(results, 'naive ORM'):
+        for student in sample:
+            _naive_total(student, lesson)
+    results['naive ORM'] *= students / max(len(sample), 1)
+
+    for name, seconds in results.items():
+        command.stdout.write(f'{name:<16}{seconds:>10.3f}s')
+    _time_requests(command, lesson, options['requests'])
+
+
+def _time_requests(command, lesson, count):
+    teacher = get_user_model().objects.create_user(
+        email='bench@gradebook.benchmark', is_teacher=True,
+        school=lesson.school
+    )
+    client = APIClient(SERVER_NAME='localhost')
+    client.force_authenticate(user=teacher)
+    url = reverse('core:lesson-gradebook', args=[lesson.pk])
+    caches[settings.RESPONSE_CACHE['ALIAS']].clear()
+    etag = client.get(url)['ETag']
+
+    results = {}
+    with timer(results, 'GET, rebuilt'):
+        for _ in range(count):
+            versions.bump(lesson.school_id)
+            etag = client.get(url)['ETag']
+    with timer(results, 'GET, cached'):
+        for _ in range(count):
+            client.get(url)
+    with timer(results, 'GET, 304'):
+        for _ in range(count):
+            client.get(url, HTTP_IF_NONE_MATCH=etag)
+    for name, seconds in results.items():
+        command.stdout.write(
+            f'{name:<16}{seconds / count * 1000:>10.2f} ms per request'
+        )
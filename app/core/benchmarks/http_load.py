@@ -0,0 +1,127 @@
+"""
+Measure throughput and latency of running servers under many concurrent
+keep-alive connections.
+
+Start the servers to compare against the same database, e.g. the sync
+WSGI stack and the async ASGI stack:
+
+    gunicorn app.wsgi -w 4 -b 127.0.0.1:8001
+    uvicorn app.asgi:application --workers 4 --port 8002
+
+then load them in turn:
+
+    python manage.py benchmark http_load --connections 1000 \\
+        --target wsgi=http://127.0.0.1:8001/me/ \\
+        --target asgi=http://127.0.0.1:8002/async/me/
+
+Requests carry the token of a staff user created for the run.
+"""
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+
+ROLLBACK = False
+EMAIL = 'load@http.benchmark'
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--target', action='append', required=True, metavar='NAME=URL',
+        help='Server to load, may be repeated.'
+    )
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument(
+        '--duration', type=float, default=10,
+        help='Seconds to load each target for.'
+    )
+
+
+async def _get(reader, writer, request):
+    """Send a request and read the response, return its status and
+    whether the connection stays open"""
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = dict(
+        (name.strip().lower(), value.strip())
+        for name, _, value in (line.partition(':') for line in lines[1:-2])
+    )
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+        keep_alive = headers.get('connection', '').lower() != 'close'
+    else:
+        await reader.read()
+        keep_alive = False
+    return status, keep_alive
+
+
+async def _client(url, token, deadline, latencies, errors):
+    parts = urlsplit(url)
+    request = (
+        f'GET {parts.path or "/"}{"?" + parts.query if parts.query else ""} '
+        f'HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+        f'Authorization: Token {token}\r\n\r\n'
+    ).encode()
+    connection = None
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            if connection is None:
+                connection = await asyncio.open_connection(
+                    parts.hostname, parts.port or 80
+                )
+            status, keep_alive = await _get(*connection, request)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            errors['connection'] += 1
+            keep_alive = False
+            await asyncio.sleep(0.1)
+        else:
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+        if not keep_alive and connection is not None:
+            connection[1].close()
+            connection = None
+    if connection is not None:
+        connection[1].close()
+
+
+async def _load(url, token, connections, duration):
+    latencies, errors = [], {'connection': 0}
+    deadline = time.monotonic() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        _client(url, token, deadline, latencies, errors)
+        for _ in range(connections)
+    ))
+    return latencies, errors, time.perf_counter() - started
+
+
+def run(command, options):
+    user = get_user_model().objects.create_user(
+        email=EMAIL, password='benchmark', is_staff=True
+    )
+    token = Token.objects.create(user=user)
+    try:
+        for target in options['target']:
+            name, _, url = target.partition('=')
+            latencies, errors, seconds = asyncio.run(_load(
+                url, token.key, options['connections'], options['duration']
+            ))
+            p50, p95, p99 = (
+                np.percentile(latencies, [50, 95, 99]) * 1000
+                if latencies else (np.nan,) * 3
+            )
+            command.stdout.write(
+                f'{name:<8}{len(latencies) / seconds:>9.0f} requests/s  '
+                f'p50 {p50:>7.1f}ms  p95 {p95:>7.1f}ms  '
+                f'p99 {p99:>7.1f}ms  errors {errors}'
+            )
+    finally:
+        user.delete()
@@ -0,0 +1,70 @@
+"""
+Compare pin code generators as the pin table grows.
+
+    python manage.py benchmark pin_allocator --sizes 10000 100000 1000000
+"""
+from core.allocators import (
+    FeistelPINAllocator,
+    RandomPINAllocator,
+    _random_pin
+)
+from core.benchmarks import timer
+from core.models import PIN
+from core.utils import generate_unique_pin
+
+SEED_BATCH_SIZE = 10000
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--sizes', type=int, nargs='+',
+        default=[10000, 100000, 1000000],
+        help='Number of existing pins to measure at.'
+    )
+    parser.add_argument(
+        '--count', type=int, default=10000,
+        help='Number of codes each generator draws per measurement.'
+    )
+
+
+def _seed(count):
+    """Store ``count`` pins with random codes"""
+    expire = PIN.default_expire()
+    while count > 0:
+        size = min(count, SEED_BATCH_SIZE)
+        PIN.objects.bulk_create(
+            [
+                PIN(pin_code=_random_pin(), pin_type='student', expire=expire)
+                for _ in range(size)
+            ],
+            ignore_conflicts=True
+        )
+        count -= size
+
+
+def run(command, options):
+    count = options['count']
+    generators = {
+        'uuid + exists()': lambda: [
+            generate_unique_pin() for _ in range(count)
+        ],
+        'random + IN': lambda: RandomPINAllocator().allocate(count),
+        'feistel': lambda: FeistelPINAllocator().allocate(count),
+    }
+    command.stdout.write(
+        f'{"existing pins":>14}  {"generator":<16}{"seconds":>10}'
+        f'{"codes/s":>12}'
+    )
+    existing = PIN.objects.count()
+    for size in sorted(options['sizes']):
+        _seed(size - existing)
+        existing = max(existing, size)
+        results = {}
+        for name, generate in generators.items():
+            with timer(results, name):
+                generate()
+        for name, seconds in results.items():
+            command.stdout.write(
+                f'{existing:>14}  {name:<16}{seconds:>10.3f}'
+                f'{count / seconds:>12.0f}'
+            )
@@ -0,0 +1,62 @@
+"""
+Compare creating student accounts one at a time with provisioning them in
+bulk, with hashed passwords and with pins.
+
+    python manage.py benchmark provisioning --users 200 --processes 4
+
+The pool only helps with more than one CPU.
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.provisioning import provision_users
+
+
+def add_arguments(parser):
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--processes', type=int)
+
+
+def _accounts(prefix, count):
+    return [
+        {'email': f'{prefix}{index}@prov.bench', 'password': 'benchmark'}
+        for index in range(count)
+    ]
+
+
+def _one_at_a_time(accounts, options):
+    for account in accounts:
+        get_user_model().objects.create_studentuser(
+            account['email'], account['password']
+        )
+
+
+def run(command, options):
+    count = options['users']
+    for name, prefix, create in [
+        ('create_studentuser', 'a', _one_at_a_time),
+        ('provision_users, 1 process', 'b',
+         lambda accounts, options: provision_users(
+             accounts, 'student', processes=1
+         )),
+        ('provision_users, pool', 'c',
+         lambda accounts, options: provision_users(
+             accounts, 'student', processes=options['processes']
+         )),
+        ('provision_users, pins', 'd',
+         lambda accounts, options: provision_users(
+             accounts, 'student', issue_pins=True
+         )),
+    ]:
+        accounts = _accounts(prefix, count)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            create(accounts, options)
+            seconds = time.perf_counter() - started
+        command.stdout.write(
+            f'{name:<30}{count / seconds:>9.1f} users/s'
+            f'{len(queries):>7} queries'
+        )
@@ -0,0 +1,61 @@
+"""
+Rank the students of a large lesson.
+
+    python manage.py benchmark rankings --students 2000 --assignments 50
+
+Compares ranking in Python after loading every total with the window
+function query, then times the cached ranking.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from core import grades
+from core.benchmarks import timer
+from core.benchmarks.gradebook import _seed
+from core.models import LessonGrade
+from core.rankings import lesson_ranking
+
+
+def add_arguments(parser):
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--assignments', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+
+
+def _python_ranking(lesson):
+    """Rank by loading the totals and sorting them"""
+    totals = sorted(
+        LessonGrade.objects.filter(
+            lesson=lesson, total__isnull=False
+        ).select_related('student'),
+        key=lambda grade: -grade.total
+    )
+    positions, previous = [], None
+    for index, grade in enumerate(totals, 1):
+        if grade.total != previous:
+            position, previous = index, grade.total
+        positions.append((grade.student_id, position))
+    return positions
+
+
+def run(command, options):
+    lesson, _ = _seed(options['students'], options['assignments'])
+    grades.rebuild([lesson])
+    cache = caches[settings.RANKING_CACHE['ALIAS']]
+    repeat = options['repeat']
+    results = {}
+
+    with timer(results, 'python'):
+        for _ in range(repeat):
+            _python_ranking(lesson)
+    with timer(results, 'window'):
+        for _ in range(repeat):
+            cache.clear()
+            lesson_ranking(lesson)
+    lesson_ranking(lesson)
+    with timer(results, 'cached'):
+        for _ in range(repeat):
+            lesson_ranking(lesson)
+
+    for name, seconds in results.items():
+        command.stdout.write(f'{name:<8}{seconds / repeat * 1000:>9.2f} ms')
@@ -0,0 +1,68 @@
+"""
+Measure pin redemption throughput with concurrent clients.
+
+    python manage.py benchmark pin_redemption --pins 2000 --workers 16
+
+Pass ``--contended`` to have every worker race for the same few pins.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+
+from core.models import PIN
+from core.utils import PINUnavailable, generate_pins, redeem_pin
+
+ROLLBACK = False
+EMAIL_DOMAIN = 'redeem.benchmark'
+
+
+def add_arguments(parser):
+    parser.add_argument('--pins', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument(
+        '--contended', action='store_true',
+        help='Redeem each pin from every worker.'
+    )
+    parser.add_argument(
+        '--hasher', default='django.contrib.auth.hashers.MD5PasswordHasher',
+        help='Password hasher, a fast one isolates the database cost.'
+    )
+
+
+def run(command, options):
+    pins, _ = generate_pins('student', options['pins'])
+    codes = [pin.pin_code for pin in pins]
+    if options['contended']:
+        codes = [code for code in codes for _ in range(options['workers'])]
+
+    def redeem(item):
+        index, code = item
+        try:
+            redeem_pin(code, f'user{index}@{EMAIL_DOMAIN}', 'benchmark')
+            return True
+        except PINUnavailable:
+            return False
+        finally:
+            connection.close()
+
+    try:
+        with override_settings(PASSWORD_HASHERS=[options['hasher']]):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['workers']) as executor:
+                results = list(executor.map(redeem, enumerate(codes)))
+            seconds = time.perf_counter() - started
+    finally:
+        get_user_model().objects.filter(
+            email__endswith=f'@{EMAIL_DOMAIN}'
+        ).delete()
+        PIN.objects.filter(pk__in=[pin.pk for pin in pins]).delete()
+
+    command.stdout.write(
+        f'{len(codes)} attempts, {results.count(True)} redeemed, '
+        f'{results.count(False)} rejected in {seconds:.3f}s '
+        f'({len(codes) / seconds:.0f} attempts/s, '
+        f'{options["workers"]} workers)'
+    )
@@ -0,0 +1,113 @@
+"""
+Build the report cards of a school.
+
+    python manage.py benchmark report_cards --students 1000 --lessons 8
+
+Times loading the grades, then rendering the cards into an archive in one
+process and over a pool of ``--processes``. The pool only helps with more
+than one CPU.
+"""
+import shutil
+import tempfile
+from datetime import date
+
+import numpy as np
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core import models
+from core.benchmarks import timer
+from core.report_cards import build_archive, collect_cards
+
+BATCH_SIZE = 10000
+CATEGORIES = [('Class work', 30), ('Tests', 30), ('Exams', 40)]
+
+
+def add_arguments(parser):
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--lessons', type=int, default=8)
+    parser.add_argument('--assignments', type=int, default=12)
+    parser.add_argument('--processes', type=int)
+
+
+def _seed(students, lessons, assignments):
+    school = models.School.objects.create(
+        name='Benchmark', address='', email='bench@eg.com', phone=''
+    )
+    student_objs = models.Student.objects.bulk_create([
+        models.Student(
+            school=school, first_name=f'Student{index}', last_name='Bench',
+            gender='m', date_of_birth=date(2010, 1, 1),
+            nationality='Ghanaian', grade_level='JHS 1'
+        )
+        for index in range(students)
+    ], batch_size=BATCH_SIZE)
+    rng = np.random.default_rng(0)
+    for number in range(lessons):
+        subject = models.Subject.objects.create(
+            school=school, name=f'Subject {number}', subject_type='core',
+            subect_code=f'BEN{number}'
+        )
+        lesson = models.Lesson.objects.create(
+            subject=subject, description='Benchmark', term='First',
+            year=2024
+        )
+        types = [
+            models.AssignmentType.objects.create(
+                lesson=lesson, name=name, percentage=percentage
+            )
+            for name, percentage in CATEGORIES
+        ]
+        assignment_objs = models.Assignment.objects.bulk_create([
+            models.Assignment(
+                assignment_type=types[index % len(types)],
+                name=f'Assignment {index}', max_points=100
+            )
+            for index in range(assignments)
+        ])
+        models.Enrollment.objects.bulk_create([
+            models.Enrollment(student=student, lesson=lesson)
+            for student in student_objs
+        ], batch_size=BATCH_SIZE)
+        marks = rng.integers(0, 101, size=(students, assignments)).tolist()
+        models.Score.objects.bulk_create([
+            models.Score(student=student, assignment=assignment, score=mark)
+            for student, student_marks in zip(student_objs, marks)
+            for assignment, mark in zip(assignment_objs, student_marks)
+        ], batch_size=BATCH_SIZE)
+    return school
+
+
+def run(command, options):
+    school = _seed(
+        options['students'], options['lessons'], options['assignments']
+    )
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        with override_settings(REPORT_CARD_DIR=directory):
+            for name, processes in [
+                ('1 process', 1), ('pool', options['processes'])
+            ]:
+                job = models.ReportCardJob.objects.create(
+                    school=school, term='First', year=2024, status='running'
+                )
+                if processes == 1:
+                    with CaptureQueriesContext(connection) as queries:
+                        with timer(results, 'collect_cards'):
+                            collect_cards(job)
+                with timer(results, name):
+                    build_archive(job, processes=processes)
+    finally:
+        shutil.rmtree(directory)
+
+    command.stdout.write(
+        f"collect_cards: {results['collect_cards'] * 1000:.0f} ms, "
+        f'{len(queries)} queries'
+    )
+    for name in ['1 process', 'pool']:
+        command.stdout.write(
+            f'build_archive, {name}: {results[name]:.2f} s, '
+            f"{options['students'] / results[name]:.0f} cards/s"
+        )
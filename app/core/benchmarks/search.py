@@ -0,0 +1,116 @@
+"""
+Search the students of one school among many.
+
+    python manage.py benchmark search --students 1000000 --schools 10
+
+Spreads the students over ``--schools`` schools and searches those of
+one, so the school filter applies after the search indexes match.
+Compares ``icontains`` filters over the name, id and phone fields with
+the indexed search of ``core.search``, reports the median and 95th
+percentile latency of each over a set of name, id and phone queries, and
+prints the plan of the first search. The trigram part of the search is
+only measured where ``pg_trgm`` is installed.
+"""
+import random
+import statistics
+import time
+from datetime import date
+
+from django.db import connection
+from django.db.models import Q
+
+from core import models
+from core.search import search_people, trigram_available
+
+FIRST_NAMES = [
+    'Kwame', 'Ama', 'Kofi', 'Akosua', 'Yaw', 'Abena', 'Kwesi', 'Efua',
+    'Kojo', 'Adwoa', 'Kwabena', 'Yaa', 'Fiifi', 'Esi', 'Nana', 'Afia',
+]
+LAST_NAMES = [
+    'Mensah', 'Owusu', 'Boateng', 'Asante', 'Addo', 'Osei', 'Appiah',
+    'Agyeman', 'Darko', 'Frimpong', 'Nkrumah', 'Quaye', 'Tetteh',
+    'Amoako', 'Ofori', 'Sarpong',
+]
+
+
+def add_arguments(parser):
+    parser.add_argument('--students', type=int, default=1000000)
+    parser.add_argument('--schools', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=50)
+
+
+def _seed(schools, count):
+    rng = random.Random(1)
+    for start in range(0, count, 10000):
+        models.Student.objects.bulk_create([
+            models.Student(
+                school=schools[number % len(schools)],
+                first_name=rng.choice(FIRST_NAMES),
+                middle_name=rng.choice(FIRST_NAMES) if number % 3 else '',
+                last_name=f'{rng.choice(LAST_NAMES)}{number % 997}',
+                national_id=f'GHA-{number:09d}-{number % 10}',
+                phone_number=f'02{rng.randrange(10 ** 8):08d}',
+                gender='f', date_of_birth=date(2010, 1, 1),
+                nationality='Ghanaian', grade_level='JHS 1'
+            )
+            for number in range(start, min(start + 10000, count))
+        ])
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE core_student')
+
+
+def _icontains(queryset, text):
+    matches = Q()
+    for word in text.split():
+        matches &= (
+            Q(first_name__icontains=word) | Q(middle_name__icontains=word)
+            | Q(last_name__icontains=word) | Q(national_id__icontains=word)
+            | Q(phone_number__icontains=word)
+        )
+    return queryset.filter(matches).order_by('last_name', 'id')
+
+
+def _latencies(queries, search):
+    latencies = []
+    for text in queries:
+        started = time.perf_counter()
+        list(search(text)[:20])
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def run(command, options):
+    schools = [
+        models.School.objects.create(
+            name=f'Search School {index}', address='Box 1',
+            email=f'school{index}@search.benchmark', phone='0200000000'
+        )
+        for index in range(options['schools'])
+    ]
+    _seed(schools, options['students'])
+    students = models.Student.objects.filter(school=schools[0])
+    rng = random.Random(2)
+    queries = [
+        rng.choice([
+            f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)[:4]}',
+            f'{rng.choice(LAST_NAMES)}{rng.randrange(997)}',
+            f'{rng.randrange(0, options["students"], len(schools)):09d}',
+        ])
+        for _ in range(options['queries'])
+    ]
+    command.stdout.write(
+        f'{options["students"]} students in {len(schools)} schools, '
+        f'trigram index: {trigram_available(connection.alias)}'
+    )
+    command.stdout.write(search_people(students, queries[0])[:20].explain())
+
+    for name, search in (
+        ('icontains', lambda text: _icontains(students, text)),
+        ('search', lambda text: search_people(students, text)),
+    ):
+        latencies = _latencies(queries, search)
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        command.stdout.write(
+            f'{name:<10}p50 {statistics.median(latencies):>8.2f} ms'
+            f'   p95 {p95:>8.2f} ms'
+        )
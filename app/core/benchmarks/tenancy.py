@@ -0,0 +1,112 @@
+"""
+Compare reading one school's scores through joins with reading them
+through the school key, with many schools in the database.
+
+    python manage.py benchmark tenancy --schools 500 --students 2000
+
+Each school gets one lesson with ``--assignments`` assignments, scored
+for every student. The plan lines show how each query reads the score
+table.
+"""
+import time
+from datetime import date
+
+from django.db import connection
+from django.db.models import Avg
+
+from core import models
+
+
+def add_arguments(parser):
+    parser.add_argument('--schools', type=int, default=500)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--assignments', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=20)
+
+
+def _create_school(index, options):
+    school = models.School.objects.create(
+        name=f'School {index}', address='Box 1',
+        email=f'school{index}@tenancy.benchmark', phone='0200000000'
+    )
+    subject = models.Subject.objects.create(
+        school=school, name='Mathematics', subject_type='core',
+        subect_code='MATH'
+    )
+    lesson = models.Lesson.objects.create(
+        subject=subject, description='Mathematics', term='First', year=2024
+    )
+    assignment_type = models.AssignmentType.objects.create(
+        lesson=lesson, name='Exam', percentage=100
+    )
+    assignments = models.Assignment.objects.bulk_create([
+        models.Assignment(
+            school=school, assignment_type=assignment_type,
+            name=f'Exam {number}', max_points=100
+        )
+        for number in range(options['assignments'])
+    ])
+    students = models.Student.objects.bulk_create([
+        models.Student(
+            school=school, first_name=f'First{number}',
+            last_name=f'Last{number}', gender='f',
+            date_of_birth=date(2010, 1, 1), nationality='Ghanaian',
+            grade_level='JHS 1'
+        )
+        for number in range(options['students'])
+    ])
+    models.Score.objects.bulk_create([
+        models.Score(
+            school=school, student=student, assignment=assignment,
+            score=(student.pk * 7 + assignment.pk) % 100
+        )
+        for student in students for assignment in assignments
+    ], batch_size=5000)
+    return school, lesson
+
+
+def _score_plan(queryset):
+    plan = queryset.explain()
+    return [
+        line.strip() for line in plan.splitlines() if 'core_score' in line
+    ]
+
+
+def run(command, options):
+    started = time.perf_counter()
+    schools = [
+        _create_school(index, options) for index in range(options['schools'])
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE core_score, core_student, core_assignment')
+    command.stdout.write(
+        f'Created {options["schools"]} schools x {options["students"]} '
+        f'students in {time.perf_counter() - started:.1f}s'
+    )
+
+    school, lesson = schools[len(schools) // 2]
+    queries = [
+        ('school average, join',
+         models.Score.objects.filter(student__school=school)),
+        ('school average, school key',
+         models.Score.objects.filter(school=school)),
+        ('lesson average, join',
+         models.Score.objects.filter(
+             assignment__assignment_type__lesson=lesson
+         )),
+        ('lesson average, school key',
+         models.Score.objects.filter(
+             school=school,
+             assignment__in=models.Assignment.objects.filter(
+                 school=school, assignment_type__lesson=lesson
+             )
+         )),
+    ]
+    for name, queryset in queries:
+        started = time.perf_counter()
+        for _ in range(options['repeat']):
+            queryset.aggregate(average=Avg('score'))
+        milliseconds = (time.perf_counter() - started) / options['repeat']
+        command.stdout.write(f'{name:<30}{milliseconds * 1000:>9.2f} ms')
+        for line in _score_plan(queryset.values('score')):
+            command.stdout.write(f'    {line}')
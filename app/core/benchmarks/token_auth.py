@@ -0,0 +1,47 @@
+"""
+Measure authenticated requests per second with and without the token
+cache.
+
+    python manage.py benchmark token_auth --requests 2000
+"""
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import CachedTokenAuthentication, token_cache
+from core.views import ManageUserView
+
+
+def add_arguments(parser):
+    parser.add_argument('--requests', type=int, default=2000)
+
+
+def run(command, options):
+    user = get_user_model().objects.create_user(
+        email='bench@token.benchmark', password='benchmark'
+    )
+    token = Token.objects.create(user=user)
+    client = APIClient(SERVER_NAME='localhost')
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    url = reverse('core:me')
+
+    for name, authentication in [
+        ('TokenAuthentication', TokenAuthentication),
+        ('CachedTokenAuthentication', CachedTokenAuthentication),
+    ]:
+        token_cache.clear()
+        with patch.object(
+            ManageUserView, 'authentication_classes', [authentication]
+        ):
+            started = time.perf_counter()
+            for _ in range(options['requests']):
+                client.get(url)
+            seconds = time.perf_counter() - started
+        command.stdout.write(
+            f'{name:<28}{options["requests"] / seconds:>10.0f} requests/s'
+        )
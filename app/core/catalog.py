@@ -0,0 +1,191 @@
+"""
+In-process catalog of subjects, lessons and assignment types.
+
+These tables are small and read far more often than written, so each
+process keeps them in dicts keyed by id, and subjects also by school and
+code, to resolve names without queries. The handlers in ``core.signals``
+bump the ``catalog`` data version whenever a row changes and drop this
+process's copy once the write commits. Other processes compare their
+copy's version stamp with the database at most every
+``CATALOG_CACHE['CHECK_INTERVAL']`` seconds and reload it when it moved.
+
+A catalog larger than ``CATALOG_CACHE['MAX_BYTES']`` is not kept: every
+lookup misses and callers read the database as before. Lookups of rows
+created since the last load miss as well. ``stats`` reports the hit rate;
+its counters are updated without a lock, so concurrent lookups may lose
+a few counts.
+"""
+import logging
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from django.apps import apps
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCOPE = 'catalog'
+
+SubjectEntry = namedtuple(
+    'SubjectEntry', ['id', 'school_id', 'name', 'code']
+)
+AssignmentTypeEntry = namedtuple(
+    'AssignmentTypeEntry', ['id', 'lesson_id', 'name', 'percentage']
+)
+
+
+class LessonEntry(namedtuple(
+    'LessonEntry',
+    ['id', 'school_id', 'subject_id', 'subject', 'description', 'term',
+     'year']
+)):
+    """A lesson with the name of its subject"""
+    __slots__ = ()
+
+    def __str__(self):
+        return f'{self.subject} - ({self.term} {self.year})'
+
+
+def _size(maps):
+    """Estimate the bytes held by the catalog's maps"""
+    size = 0
+    for entries in maps.values():
+        size += sys.getsizeof(entries)
+        for key, entry in entries.items():
+            size += sys.getsizeof(key) + sys.getsizeof(entry)
+            if isinstance(entry, tuple):
+                size += sum(sys.getsizeof(value) for value in entry)
+    return size
+
+
+class Catalog:
+    """Subjects, lessons and assignment types of every school by id"""
+
+    def __init__(self, max_bytes, check_interval):
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.maps = None
+        self.stamp = None
+        self.checked_at = 0.0
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.loads = 0
+
+    def _stamp(self):
+        model = apps.get_model('core', 'DataVersion')
+        return model.objects.filter(scope=SCOPE).values_list(
+            'version', 'updated_at'
+        ).first()
+
+    def _load(self, stamp):
+        Subject = apps.get_model('core', 'Subject')
+        Lesson = apps.get_model('core', 'Lesson')
+        AssignmentType = apps.get_model('core', 'AssignmentType')
+        subjects = {
+            row[0]: SubjectEntry(*row)
+            for row in Subject.objects.values_list(
+                'id', 'school_id', 'name', 'subect_code'
+            )
+        }
+        maps = {
+            'subjects': subjects,
+            'subject_codes': {
+                (subject.school_id, subject.code.lower()): subject
+                for subject in subjects.values() if subject.code
+            },
+            'lessons': {
+                row[0]: LessonEntry(*row)
+                for row in Lesson.objects.values_list(
+                    'id', 'school_id', 'subject_id', 'subject__name',
+                    'description', 'term', 'year'
+                )
+            },
+            'assignment_types': {
+                row[0]: AssignmentTypeEntry(*row)
+                for row in AssignmentType.objects.values_list(
+                    'id', 'lesson_id', 'name', 'percentage'
+                )
+            },
+        }
+        self.size = _size(maps)
+        self.loads += 1
+        if self.size > self.max_bytes:
+            logger.warning(
+                'Catalog of %s bytes exceeds its budget of %s bytes',
+                self.size, self.max_bytes
+            )
+            maps = {name: {} for name in maps}
+        self.maps, self.stamp = maps, stamp
+
+    def _current(self):
+        """Return the maps, reloaded if their version is out of date"""
+        now = time.monotonic()
+        maps = self.maps
+        if maps is not None and now < self.checked_at:
+            return maps
+        with self.lock:
+            if self.maps is None or now >= self.checked_at:
+                stamp = self._stamp()
+                if self.maps is None or stamp != self.stamp:
+                    self._load(stamp)
+                self.checked_at = time.monotonic() + self.check_interval
+            return self.maps
+
+    def _get(self, name, *keys):
+        entries = self._current()[name]
+        entry = next(
+            (entries[key] for key in keys if key in entries), None
+        )
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def subject(self, subject_id):
+        """Return the subject entry of an id, or None"""
+        return self._get('subjects', subject_id)
+
+    def subject_by_code(self, school_id, code):
+        """Return the subject of a school, or a shared one, by its code
+        in any case"""
+        code = code.lower()
+        return self._get('subject_codes', (school_id, code), (None, code))
+
+    def lesson(self, lesson_id):
+        """Return the lesson entry of an id, or None"""
+        return self._get('lessons', lesson_id)
+
+    def assignment_type(self, assignment_type_id):
+        """Return the assignment type entry of an id, or None"""
+        return self._get('assignment_types', assignment_type_id)
+
+    def invalidate(self):
+        """Reload the catalog on its next use"""
+        with self.lock:
+            self.maps = None
+
+    def stats(self):
+        """Return the lookup counts and size of the catalog"""
+        lookups = self.hits + self.misses
+        maps = self.maps or {}
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'loads': self.loads,
+            'bytes': self.size,
+            'max_bytes': self.max_bytes,
+            'entries': sum(
+                len(maps.get(name, ()))
+                for name in ('subjects', 'lessons', 'assignment_types')
+            ),
+        }
+
+
+catalog = Catalog(
+    settings.CATALOG_CACHE['MAX_BYTES'],
+    settings.CATALOG_CACHE['CHECK_INTERVAL']
+)
@@ -0,0 +1,21 @@
+"""Queryset filters for the Core API"""
+
+
+def filter_pins(queryset, filters):
+    """Filter pins by the validated data of ``PINFilterSerializer``"""
+    if filters.get('school') is not None:
+        queryset = queryset.filter(school_id=filters['school'])
+    if filters.get('pin_type'):
+        queryset = queryset.filter(pin_type=filters['pin_type'])
+    if filters.get('is_used') is not None:
+        queryset = queryset.filter(is_used=filters['is_used'])
+    if filters.get('expired') is not None:
+        queryset = (
+            queryset.expired() if filters['expired']
+            else queryset.unexpired()
+        )
+    if filters.get('created_after'):
+        queryset = queryset.filter(created_at__gte=filters['created_after'])
+    if filters.get('created_before'):
+        queryset = queryset.filter(created_at__lt=filters['created_before'])
+    return queryset
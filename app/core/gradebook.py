@@ -0,0 +1,172 @@
+"""
+Gradebook computation.
+
+A lesson's scores are loaded with a fixed number of queries and laid out
+as a students x assignments matrix, from which category averages and
+weighted totals of the whole class are computed with array operations.
+
+Category averages are points earned over points possible, in percent.
+Only scored assignments count towards points possible unless
+``missing='zero'`` is passed, in which case missing scores count as 0.
+The weighted total is the average of the category averages weighted by
+``AssignmentType.percentage``, renormalised over the categories in which
+the student has a score.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from core.models import Assignment, AssignmentType, Enrollment, Score
+
+
+class GradebookError(ValueError):
+    """The lesson's grading setup cannot be computed"""
+
+
+@dataclass
+class Gradebook:
+    """Scores and grades of a lesson, one row per student"""
+    lesson_id: int
+    student_ids: np.ndarray
+    assignment_ids: np.ndarray
+    category_ids: np.ndarray
+    category_names: list
+    weights: np.ndarray
+    scores: np.ndarray
+    category_averages: np.ndarray
+    totals: np.ndarray
+
+    def categories(self):
+        """Return the assignment types of the lesson with their weights"""
+        return [
+            {'id': int(category_id), 'name': name, 'percentage': weight}
+            for category_id, name, weight in zip(
+                self.category_ids, self.category_names, self.weights.tolist()
+            )
+        ]
+
+    def rows(self):
+        """Return the grades of each student as plain Python values"""
+        return [
+            {
+                'student': int(student_id),
+                'categories': {
+                    int(category_id): _to_python(average)
+                    for category_id, average in zip(
+                        self.category_ids, averages
+                    )
+                },
+                'total': _to_python(total),
+            }
+            for student_id, averages, total in zip(
+                self.student_ids, self.category_averages, self.totals
+            )
+        ]
+
+
+def _to_python(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def validate_weights(weights):
+    """Check that category percentages sum to 100"""
+    if not np.isclose(np.sum(weights), 100):
+        raise GradebookError(
+            f'Assignment type percentages sum to {np.sum(weights):g}, '
+            'not 100'
+        )
+
+
+def weighted_totals(category_averages, weights):
+    """Weight category averages, ignoring categories without scores"""
+    present = ~np.isnan(category_averages)
+    weight_sums = present @ weights
+    weighted = np.where(present, category_averages, 0) @ weights
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(weight_sums > 0, weighted / weight_sums, np.nan)
+
+
+def compute(scores, max_points, assignment_categories, weights,
+            missing='exclude'):
+    """Return category averages and weighted totals.
+
+    ``scores`` is a students x assignments array with NaN for missing
+    scores, ``assignment_categories`` the category index of each
+    assignment and ``weights`` the percentage of each category.
+    """
+    validate_weights(weights)
+    scored = ~np.isnan(scores)
+    membership = np.zeros((len(max_points), len(weights)))
+    membership[np.arange(len(max_points)), assignment_categories] = 1
+
+    earned = np.where(scored, scores, 0) @ membership
+    if missing == 'zero':
+        possible = np.broadcast_to(max_points @ membership, earned.shape)
+    else:
+        possible = (scored * max_points) @ membership
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = np.where(possible > 0, earned / possible * 100, np.nan)
+    return averages, weighted_totals(averages, weights)
+
+
+def compute_gradebook(lesson, missing='exclude'):
+    """Load the scores of ``lesson`` and compute its gradebook"""
+    lesson_id = getattr(lesson, 'pk', lesson)
+    categories = list(
+        AssignmentType.objects.filter(lesson_id=lesson_id).order_by(
+            'id'
+        ).values_list('id', 'name', 'percentage')
+    )
+    assignments = np.array(
+        Assignment.objects.filter(
+            assignment_type__lesson_id=lesson_id
+        ).order_by('id').values_list(
+            'id', 'assignment_type_id', 'max_points'
+        ),
+        dtype=np.int64
+    ).reshape(-1, 3)
+    enrolled = Enrollment.objects.filter(
+        lesson_id=lesson_id
+    ).values_list('student_id', flat=True)
+    score_rows = list(
+        Score.objects.filter(
+            assignment__assignment_type__lesson_id=lesson_id
+        ).values_list('student_id', 'assignment_id', 'score')
+    )
+
+    category_ids = np.array([row[0] for row in categories], dtype=np.int64)
+    weights = np.array([row[2] for row in categories], dtype=float)
+    assignment_ids = assignments[:, 0]
+    student_ids = np.union1d(
+        np.fromiter(enrolled, dtype=np.int64),
+        np.fromiter((row[0] for row in score_rows), dtype=np.int64)
+    )
+
+    scores = np.full((len(student_ids), len(assignment_ids)), np.nan)
+    if score_rows:
+        rows = np.searchsorted(
+            student_ids, [row[0] for row in score_rows]
+        )
+        columns = np.searchsorted(
+            assignment_ids, [row[1] for row in score_rows]
+        )
+        scores[rows, columns] = [float(row[2]) for row in score_rows]
+
+    averages, totals = compute(
+        scores,
+        assignments[:, 2].astype(float),
+        np.searchsorted(category_ids, assignments[:, 1]),
+        weights,
+        missing=missing
+    )
+    return Gradebook(
+        lesson_id=lesson_id,
+        student_ids=student_ids,
+        assignment_ids=assignment_ids,
+        category_ids=category_ids,
+        category_names=[row[1] for row in categories],
+        weights=weights,
+        scores=scores,
+        category_averages=averages,
+        totals=totals,
+    )
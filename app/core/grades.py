@@ -0,0 +1,187 @@
+"""
+Materialised grade totals.
+
+``CategoryGrade`` holds the points of each student per assignment type and
+``LessonGrade`` their weighted total per lesson, with the semantics of
+``core.gradebook`` (missing scores excluded). The signal handlers in
+``core.signals`` keep them up to date by applying the delta of each
+``Score`` write instead of recomputing, and ``rebuild`` recomputes them
+for whole lessons with set-based queries. Both bump the version of the
+lessons whose totals they write.
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from core import versions
+from core.gradebook import compute_gradebook, weighted_totals
+from core.models import (
+    Assignment,
+    CategoryGrade,
+    Lesson,
+    LessonGrade,
+    Score
+)
+
+TOLERANCE = 0.01
+
+
+def _total(categories):
+    """Return the weighted total of ``(earned, possible, weight)`` rows"""
+    if not categories:
+        return None
+    earned, possible, weights = (
+        np.array(column, dtype=float) for column in zip(*categories)
+    )
+    with np.errstate(invalid='ignore', divide='ignore'):
+        averages = np.where(possible > 0, earned / possible * 100, np.nan)
+    total = weighted_totals(averages[np.newaxis], weights)[0]
+    return None if np.isnan(total) else float(total)
+
+
+def refresh_lesson_total(student_id, lesson_id, create=True):
+    """Recompute a student's lesson total from their category grades"""
+    total = _total(list(
+        CategoryGrade.objects.filter(
+            student_id=student_id, assignment_type__lesson_id=lesson_id
+        ).values_list(
+            'points_earned', 'points_possible', 'assignment_type__percentage'
+        )
+    ))
+    updated = LessonGrade.objects.filter(
+        student_id=student_id, lesson_id=lesson_id
+    ).update(total=total)
+    if not updated and create:
+        LessonGrade.objects.get_or_create(
+            student_id=student_id, lesson_id=lesson_id,
+            defaults={'total': total}
+        )
+    versions.bump_lessons([lesson_id])
+
+
+def apply_score_delta(student_id, assignment_id, score, sign):
+    """Add (``sign=1``) or remove (``sign=-1``) a score from the totals"""
+    try:
+        max_points, assignment_type_id, lesson_id = (
+            Assignment.objects.values_list(
+                'max_points', 'assignment_type_id',
+                'assignment_type__lesson_id'
+            ).get(pk=assignment_id)
+        )
+    except Assignment.DoesNotExist:
+        return
+    changes = {
+        'points_earned': F('points_earned') + sign * score,
+        'points_possible': F('points_possible') + sign * max_points,
+        'scored_count': F('scored_count') + sign,
+    }
+    category = CategoryGrade.objects.filter(
+        student_id=student_id, assignment_type_id=assignment_type_id
+    )
+    with transaction.atomic():
+        if not category.update(**changes) and sign > 0:
+            try:
+                with transaction.atomic():
+                    CategoryGrade.objects.create(
+                        student_id=student_id,
+                        assignment_type_id=assignment_type_id,
+                        points_earned=score, points_possible=max_points,
+                        scored_count=1
+                    )
+            except IntegrityError:
+                category.update(**changes)
+        # Removing a score never creates rows, so deleting a lesson or
+        # student does not leave totals pointing at deleted rows.
+        refresh_lesson_total(student_id, lesson_id, create=sign > 0)
+
+
+def rebuild(lessons=None, students=None):
+    """Recompute the totals of ``lessons`` (all by default) from scores.
+
+    Pass ``students`` to limit the rebuild to those students.
+    """
+    if lessons is None:
+        lessons = Lesson.objects.values_list('id', flat=True)
+    lesson_ids = [getattr(lesson, 'pk', lesson) for lesson in lessons]
+    scores = Score.objects.filter(
+        assignment__assignment_type__lesson_id__in=lesson_ids
+    )
+    categories = CategoryGrade.objects.filter(
+        assignment_type__lesson_id__in=lesson_ids
+    )
+    lesson_grades = LessonGrade.objects.filter(lesson_id__in=lesson_ids)
+    if students is not None:
+        scores = scores.filter(student_id__in=students)
+        categories = categories.filter(student_id__in=students)
+        lesson_grades = lesson_grades.filter(student_id__in=students)
+
+    rows = scores.values(
+        'student_id',
+        'assignment__assignment_type_id',
+        'assignment__assignment_type__lesson_id',
+        'assignment__assignment_type__percentage',
+    ).annotate(
+        earned=Sum('score'),
+        possible=Sum('assignment__max_points'),
+        count=Count('id'),
+    ).order_by()
+
+    by_student = defaultdict(list)
+    category_grades = []
+    for row in rows:
+        category_grades.append(CategoryGrade(
+            student_id=row['student_id'],
+            assignment_type_id=row['assignment__assignment_type_id'],
+            points_earned=row['earned'],
+            points_possible=row['possible'],
+            scored_count=row['count'],
+        ))
+        by_student[
+            row['student_id'], row['assignment__assignment_type__lesson_id']
+        ].append((
+            row['earned'], row['possible'],
+            row['assignment__assignment_type__percentage']
+        ))
+
+    with transaction.atomic():
+        categories.delete()
+        lesson_grades.delete()
+        CategoryGrade.objects.bulk_create(category_grades, batch_size=5000)
+        LessonGrade.objects.bulk_create([
+            LessonGrade(
+                student_id=student_id, lesson_id=lesson_id,
+                total=_total(categories)
+            )
+            for (student_id, lesson_id), categories in by_student.items()
+        ], batch_size=5000)
+        versions.bump_lessons(lesson_ids)
+
+
+def check(lesson):
+    """Compare a lesson's materialised totals with a fresh computation.
+
+    Returns a list of ``(student_id, stored, expected)`` mismatches, where
+    ``stored`` is None for students without a ``LessonGrade`` row.
+    """
+    gradebook = compute_gradebook(lesson)
+    stored = dict(
+        LessonGrade.objects.filter(
+            lesson_id=gradebook.lesson_id
+        ).values_list('student_id', 'total')
+    )
+    mismatches = []
+    for student_id, expected in zip(
+        gradebook.student_ids.tolist(), gradebook.totals.tolist()
+    ):
+        actual = stored.pop(student_id, None)
+        if np.isnan(expected):
+            if actual is not None:
+                mismatches.append((student_id, actual, None))
+        elif actual is None or abs(actual - expected) > TOLERANCE:
+            mismatches.append((student_id, actual, expected))
+    for student_id, actual in stored.items():
+        if actual is not None:
+            mismatches.append((student_id, actual, None))
+    return mismatches
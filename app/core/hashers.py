@@ -0,0 +1,44 @@
+"""
+Password hashers with parameters from ``settings.PASSWORD_HASHING``.
+
+They keep the algorithm names of Django's hashers, so hashes stay
+interchangeable with them, and report hashes made with other parameters
+as needing an update so they are rehashed on the next login.
+"""
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    ScryptPasswordHasher
+)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2id with configurable time, memory and parallelism"""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_HASHING['ARGON2_TIME_COST']
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_HASHING['ARGON2_MEMORY_COST']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASHING['ARGON2_PARALLELISM']
+
+
+class TunedScryptPasswordHasher(ScryptPasswordHasher):
+    """Scrypt with configurable work factor, block size and parallelism"""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_HASHING['SCRYPT_WORK_FACTOR']
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_HASHING['SCRYPT_BLOCK_SIZE']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_HASHING['SCRYPT_PARALLELISM']
@@ -0,0 +1,34 @@
+"""
+Django command to run a benchmark
+"""
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    """Django command to run a benchmark"""
+    help = 'Run a benchmark. Data created by the benchmark is rolled back.'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(
+            dest='benchmark', required=True
+        )
+        for name, module in BENCHMARKS.items():
+            subparser = subparsers.add_parser(name)
+            import_module(module).add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        """Entrypoint for command. """
+        module = import_module(BENCHMARKS[options['benchmark']])
+        if not getattr(module, 'ROLLBACK', True):
+            # Concurrent benchmarks need their data committed and clean
+            # up after themselves.
+            module.run(self, options)
+            return
+        with transaction.atomic():
+            module.run(self, options)
+            transaction.set_rollback(True)
@@ -0,0 +1,58 @@
+"""
+Django command to compare materialised grade totals with the gradebook
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core import grades
+from core.gradebook import GradebookError
+from core.models import Lesson
+
+
+class Command(BaseCommand):
+    """Django command to check grade totals against a fresh computation"""
+    help = (
+        'Compare LessonGrade totals with a fresh gradebook computation, '
+        'exiting with an error if any differ.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lesson', type=int, nargs='+', dest='lessons',
+            help='Lesson ids to check, all lessons by default.'
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='Rebuild the lessons whose totals differ.'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command. """
+        lessons = options['lessons'] or list(
+            Lesson.objects.values_list('id', flat=True)
+        )
+        inconsistent = []
+        for lesson_id in lessons:
+            try:
+                mismatches = grades.check(lesson_id)
+            except GradebookError as error:
+                self.stdout.write(f'Lesson {lesson_id} skipped: {error}')
+                continue
+            for student_id, stored, expected in mismatches:
+                self.stdout.write(
+                    f'Lesson {lesson_id} student {student_id}: '
+                    f'stored {stored}, expected {expected}'
+                )
+            if mismatches:
+                inconsistent.append(lesson_id)
+
+        if inconsistent and options['fix']:
+            grades.rebuild(inconsistent)
+            self.stdout.write(self.style.SUCCESS(
+                f'Rebuilt {len(inconsistent)} lessons'
+            ))
+        elif inconsistent:
+            raise CommandError(
+                f'{len(inconsistent)} lessons have inconsistent totals'
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('Grade totals consistent'))
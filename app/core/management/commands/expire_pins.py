@@ -0,0 +1,69 @@
+"""
+Django command to mark expired pins and purge old ones
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import PIN
+
+
+class Command(BaseCommand):
+    """Django command to mark expired pins in bounded batches"""
+    help = (
+        'Mark unused pins past their expiry date as expired, optionally '
+        'deleting unused pins that expired long ago.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of pins updated per statement.'
+        )
+        parser.add_argument(
+            '--purge-after-days', type=int,
+            help='Delete unused pins expired for more than this many days.'
+        )
+        parser.add_argument(
+            '--interval', type=int,
+            help='Keep running, sweeping every this many seconds.'
+        )
+
+    def _in_batches(self, queryset, action, batch_size):
+        """Apply ``action`` to ``queryset`` one batch of ids at a time"""
+        total = 0
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return total
+            total += action(PIN.objects.filter(id__in=ids))
+
+    def sweep(self, options):
+        expired = self._in_batches(
+            PIN.objects.stale().order_by('expire'),
+            lambda batch: batch.update(is_expired=True),
+            options['batch_size']
+        )
+        self.stdout.write(f'Marked {expired} pins expired')
+
+        if options['purge_after_days'] is not None:
+            cutoff = timezone.now() - timedelta(
+                days=options['purge_after_days']
+            )
+            purged = self._in_batches(
+                PIN.objects.filter(
+                    is_used=False, is_expired=True, expire__lt=cutoff
+                ).order_by('expire'),
+                lambda batch: batch.delete()[0],
+                options['batch_size']
+            )
+            self.stdout.write(f'Purged {purged} expired pins')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command. """
+        self.sweep(options)
+        while options['interval']:
+            time.sleep(options['interval'])
+            self.sweep(options)
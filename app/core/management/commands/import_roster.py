@@ -0,0 +1,57 @@
+"""
+Django command to import a roster file
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import RosterImport, School
+from core.roster import RosterError, import_roster
+
+
+class Command(BaseCommand):
+    """Django command to import students, teachers or enrollments"""
+    help = (
+        'Import students, teachers or enrollments of a school from a CSV or '
+        'XLSX file. Running it again on an interrupted import resumes it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file to import.')
+        parser.add_argument('--school', type=int, required=True)
+        parser.add_argument(
+            '--kind', required=True,
+            choices=[kind for kind, _ in RosterImport.KIND_CHOICES]
+        )
+        parser.add_argument(
+            '--chunk-size', type=int,
+            help='Rows written per transaction.'
+        )
+
+    def progress(self, job, rows_per_second):
+        self.stdout.write(
+            f'{job.rows_done} rows read, {job.rows_imported} imported, '
+            f'{job.rows_failed} failed ({rows_per_second:.0f} rows/s)'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command. """
+        try:
+            school = School.objects.get(pk=options['school'])
+        except School.DoesNotExist:
+            raise CommandError(f'School {options["school"]} does not exist')
+        try:
+            with open(options['path'], 'rb') as file:
+                job, errors, rows_per_second = import_roster(
+                    file, options['path'], options['kind'], school,
+                    chunk_size=options['chunk_size'], progress=self.progress
+                )
+        except (OSError, RosterError) as error:
+            raise CommandError(error)
+
+        for error in errors:
+            self.stderr.write(
+                f'Row {error["row"]}: {"; ".join(error["errors"])}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {job.rows_imported} of {job.rows_done} rows '
+            f'({rows_per_second:.0f} rows/s)'
+        ))
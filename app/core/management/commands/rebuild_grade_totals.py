@@ -0,0 +1,33 @@
+"""
+Django command to recompute materialised grade totals
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import grades
+from core.models import Lesson
+
+
+class Command(BaseCommand):
+    """Django command to recompute grade totals from scores"""
+    help = 'Recompute CategoryGrade and LessonGrade rows from scores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lesson', type=int, nargs='+', dest='lessons',
+            help='Lesson ids to rebuild, all lessons by default.'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command. """
+        lessons = options['lessons'] or list(
+            Lesson.objects.values_list('id', flat=True)
+        )
+        started = time.perf_counter()
+        for lesson_id in lessons:
+            grades.rebuild([lesson_id])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt totals of {len(lessons)} lessons in '
+            f'{time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,51 @@
+"""
+Django command to build queued report card archives
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.report_cards import claim_job, run_job
+
+
+class Command(BaseCommand):
+    """Django command to run report card jobs from the queue"""
+    help = (
+        'Claim queued report card jobs, or running ones whose worker '
+        'stopped, and build their archives.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty.'
+        )
+        parser.add_argument(
+            '--interval', type=int, default=5,
+            help='Seconds to wait before checking an empty queue again.'
+        )
+        parser.add_argument(
+            '--processes', type=int,
+            help='Processes rendering cards, REPORT_CARD_PROCESSES if unset.'
+        )
+
+    def progress(self, job):
+        self.stdout.write(
+            f'Job {job.pk}: {job.students_done}/{job.students_total} cards'
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command. """
+        while True:
+            job = claim_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+                continue
+            started = time.perf_counter()
+            run_job(job, options['processes'], progress=self.progress)
+            self.stdout.write(
+                f'Job {job.pk} {job.status} in '
+                f'{time.perf_counter() - started:.1f}s'
+            )
@@ -2,7 +2,7 @@
 Django command to wait for database avaialablity
 """
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 import time
 from psycopg2 import OperationalError as Psycopg2Error
 from django.db.utils import OperationalError
@@ -11,16 +11,35 @@ from django.db.utils import OperationalError
 class Command(BaseCommand):
     """Django command to wait for database"""
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='Seconds to wait before giving up.'
+        )
+        parser.add_argument(
+            '--max-delay', type=float, default=5,
+            help='Longest wait between attempts, in seconds.'
+        )
+
     def handle(self, *args, **options):
         """Entrypoint for command. """
         self.stdout.write('Waiting for Database...')
-        db_up = False
-        while db_up is False:
+        deadline = time.monotonic() + options['timeout']
+        delay = 0.5
+        while True:
             try:
                 self.check(databases=['default'])
-                db_up = True
+                break
             except (Psycopg2Error, OperationalError):
-                self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+                if time.monotonic() + delay > deadline:
+                    raise CommandError(
+                        f'Database unavailable after {options["timeout"]:g} '
+                        'seconds'
+                    )
+                self.stdout.write(
+                    f'Database unavailable, waiting {delay:g} seconds...'
+                )
+                time.sleep(delay)
+                delay = min(delay * 2, options['max_delay'])
 
         self.stdout.write(self.style.SUCCESS('Database available'))
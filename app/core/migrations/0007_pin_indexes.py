@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_pinsequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pin',
+            index=models.Index(fields=['school', '-created_at', '-id'], name='pin_school_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pin',
+            index=models.Index(fields=['school', 'pin_type', 'is_used', '-created_at'], name='pin_school_type_used_idx'),
+        ),
+    ]
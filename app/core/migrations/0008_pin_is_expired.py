@@ -0,0 +1,26 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_pin_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pin',
+            name='is_expired',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='pin',
+            index=models.Index(condition=models.Q(('is_expired', False), ('is_used', False)), fields=['school', 'pin_type', 'expire'], name='pin_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pin',
+            index=models.Index(condition=models.Q(('is_expired', False), ('is_used', False)), fields=['expire'], name='pin_unexpired_idx'),
+        ),
+    ]
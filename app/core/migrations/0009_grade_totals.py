@@ -0,0 +1,41 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_pin_is_expired'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryGrade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points_earned', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('points_possible', models.IntegerField(default=0)),
+                ('scored_count', models.IntegerField(default=0)),
+                ('assignment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_grades', to='core.assignmenttype')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_grades', to='core.student')),
+            ],
+            options={
+                'unique_together': {('student', 'assignment_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='LessonGrade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_grades', to='core.lesson')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lesson_grades', to='core.student')),
+            ],
+            options={
+                'unique_together': {('student', 'lesson')},
+            },
+        ),
+    ]
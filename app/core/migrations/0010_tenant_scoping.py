@@ -0,0 +1,99 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_schools(apps, schema_editor):
+    """Copy the school of existing lessons, assignments and scores.
+
+    Lessons take the school of their enrolled students, subjects stay
+    shared.
+    """
+    Assignment = apps.get_model('core', 'Assignment')
+    AssignmentType = apps.get_model('core', 'AssignmentType')
+    Enrollment = apps.get_model('core', 'Enrollment')
+    Lesson = apps.get_model('core', 'Lesson')
+    Score = apps.get_model('core', 'Score')
+
+    Lesson.objects.update(school_id=Subquery(
+        Enrollment.objects.filter(lesson_id=OuterRef('pk')).values(
+            'student__school_id'
+        )[:1]
+    ))
+    Assignment.objects.update(school_id=Subquery(
+        AssignmentType.objects.filter(
+            pk=OuterRef('assignment_type_id')
+        ).values('lesson__school_id')[:1]
+    ))
+    Score.objects.update(school_id=Subquery(
+        Assignment.objects.filter(pk=OuterRef('assignment_id')).values(
+            'school_id'
+        )[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_grade_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assignment',
+            name='school',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='core.school'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='school',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='lessons', to='core.school'),
+        ),
+        migrations.AddField(
+            model_name='score',
+            name='school',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scores', to='core.school'),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='school',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subjects', to='core.school'),
+        ),
+        migrations.RunPython(fill_schools, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='subject',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='subject',
+            name='subect_code',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='assignment',
+            index=models.Index(fields=['school', 'assignment_type'], name='assignment_school_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['school', 'year', 'term'], name='lesson_school_year_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(fields=['school', 'assignment'], name='score_school_assignment_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='score',
+            index=models.Index(fields=['school', 'student'], name='score_school_student_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='subject',
+            constraint=models.UniqueConstraint(fields=('school', 'name'), name='subject_school_name_unique', nulls_distinct=False),
+        ),
+        migrations.AddConstraint(
+            model_name='subject',
+            constraint=models.UniqueConstraint(fields=('school', 'subect_code'), name='subject_school_code_unique', nulls_distinct=False),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_tenant_scoping'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RosterImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('students', 'Students'), ('teachers', 'Teachers'), ('enrollments', 'Enrollments')], max_length=12)),
+                ('file_name', models.CharField(max_length=255)),
+                ('checksum', models.CharField(max_length=64)),
+                ('rows_done', models.IntegerField(default=0)),
+                ('rows_imported', models.IntegerField(default=0)),
+                ('rows_failed', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('school', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='roster_imports', to='core.school')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['school', 'kind', 'checksum'], name='roster_import_file_idx')],
+            },
+        ),
+    ]
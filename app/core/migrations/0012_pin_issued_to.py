@@ -0,0 +1,20 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_roster_import'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pin',
+            name='issued_to',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='issued_pins', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.0.14 on 2026-10-18 10:22
+
+import core.models
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Adding stored generated columns rewrites core_student and core_teacher
+# under an ACCESS EXCLUSIVE lock, and the GIN indexes are then built
+# without CONCURRENTLY, so both tables are locked against reads and
+# writes for the whole migration. Run it in a maintenance window on
+# large tables.
+#
+# Typo tolerant search needs pg_trgm, which some PostgreSQL builds lack.
+# Without it search matches on full text only.
+TRIGRAM_INDEXES = """
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'
+    ) THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS student_search_trgm_idx
+            ON core_student USING gin (search_text gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS teacher_search_trgm_idx
+            ON core_teacher USING gin (search_text gin_trgm_ops);
+    END IF;
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_report_card_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='search_text',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower(core.models.SpaceJoin('first_name', 'middle_name', 'last_name', 'national_id', 'phone_number')), output_field=models.TextField()),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('first_name', 'middle_name', 'last_name', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector(core.models.RegexpReplace('national_id', models.Value('[^[:alnum:]]+'), models.Value(' ')), core.models.RegexpReplace('phone_number', models.Value('[^[:alnum:]]+'), models.Value('')), config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='search_text',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Lower(core.models.SpaceJoin('first_name', 'middle_name', 'last_name', 'national_id', 'phone_number')), output_field=models.TextField()),
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('first_name', 'middle_name', 'last_name', config='simple', weight='A'), '||', django.contrib.postgres.search.SearchVector(core.models.RegexpReplace('national_id', models.Value('[^[:alnum:]]+'), models.Value(' ')), core.models.RegexpReplace('phone_number', models.Value('[^[:alnum:]]+'), models.Value('')), config='simple', weight='B'), django.contrib.postgres.search.SearchConfig('simple')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='student_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='teacher_search_vector_idx'),
+        ),
+        migrations.RunSQL(
+            TRIGRAM_INDEXES,
+            reverse_sql="""
+            DROP INDEX IF EXISTS student_search_trgm_idx;
+            DROP INDEX IF EXISTS teacher_search_trgm_idx;
+            """
+        ),
+    ]
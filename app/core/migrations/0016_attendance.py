@@ -0,0 +1,29 @@
+# Generated by Django 5.0.14 on 2026-10-18 10:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_person_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Attendance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('marked', models.BinaryField()),
+                ('present', models.BinaryField()),
+                ('enrollment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='core.enrollment')),
+                ('school', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance', to='core.school')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['school', 'month'], name='attendance_school_month_idx')],
+                'unique_together': {('enrollment', 'month')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_attendance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportcardjob',
+            name='attempt',
+            field=models.IntegerField(default=0),
+        ),
+    ]
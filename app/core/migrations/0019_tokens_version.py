@@ -0,0 +1,21 @@
+from django.db import migrations
+from django.utils import timezone
+
+
+def create_tokens_version(apps, schema_editor):
+    """Create the tokens counter, so bumping it is a single update"""
+    DataVersion = apps.get_model('core', 'DataVersion')
+    DataVersion.objects.using(schema_editor.connection.alias).get_or_create(
+        scope='tokens', defaults={'updated_at': timezone.now()}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_report_card_job_attempt'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_tokens_version, migrations.RunPython.noop),
+    ]
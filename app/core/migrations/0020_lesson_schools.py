@@ -0,0 +1,55 @@
+import logging
+
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_lesson_schools(apps, schema_editor):
+    """Give lessons of no school the school of their subject, or else of
+    their enrolled students, and report the ones still without one.
+
+    The backfill of 0010 only looked at enrollments, and lessons of
+    shared subjects were saved without a school since.
+    """
+    Enrollment = apps.get_model('core', 'Enrollment')
+    Lesson = apps.get_model('core', 'Lesson')
+    Subject = apps.get_model('core', 'Subject')
+    lessons = Lesson.objects.using(
+        schema_editor.connection.alias
+    ).filter(school__isnull=True)
+
+    lessons.update(school_id=Coalesce(
+        Subquery(
+            Subject.objects.filter(pk=OuterRef('subject_id')).values(
+                'school_id'
+            )[:1]
+        ),
+        Subquery(
+            Enrollment.objects.filter(lesson_id=OuterRef('pk')).values(
+                'student__school_id'
+            )[:1]
+        ),
+    ))
+    unresolved = list(lessons.values_list('pk', flat=True))
+    if unresolved:
+        logger.warning(
+            '%s lessons of shared subjects have no enrollments to take a '
+            'school from and stay hidden until one is set: %s',
+            len(unresolved), ', '.join(map(str, unresolved))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_tokens_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            resolve_lesson_schools, migrations.RunPython.noop
+        ),
+    ]
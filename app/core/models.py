@@ -1,4 +1,8 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.functions import Lower
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -8,6 +12,9 @@ from django.contrib.auth.models import (
 from django.utils import timezone
 from datetime import timedelta
 
+from core.catalog import catalog
+from core.tenancy import SchoolScopedManager
+
 
 class School(models.Model):
     name = models.CharField(max_length=255)
@@ -19,6 +26,30 @@ class School(models.Model):
         return self.name
 
 
+PERSON_SEARCH_FIELDS = (
+    'first_name', 'middle_name', 'last_name', 'national_id', 'phone_number'
+)
+
+
+class SpaceJoin(models.Func):
+    """Text columns joined by spaces.
+
+    Unlike ``Concat`` this compiles to ``||``, which is immutable, so it
+    can define generated columns and indexes. The columns must not be
+    null.
+    """
+    arg_joiner = " || ' ' || "
+    template = '%(expressions)s'
+    output_field = models.TextField()
+
+
+class RegexpReplace(models.Func):
+    """Text with every match of a pattern replaced"""
+    function = 'REGEXP_REPLACE'
+    template = "%(function)s(%(expressions)s, 'g')"
+    output_field = models.TextField()
+
+
 class Person(models.Model):
     """Person abstract model"""
     GENDER_CHOICES = (
@@ -47,12 +78,41 @@ class Person(models.Model):
     health_insurance_no = models.CharField(
         max_length=32, blank=True, default=''
     )
+    # Kept by the database on every write, see core.search.
+    search_text = models.GeneratedField(
+        expression=Lower(SpaceJoin(*PERSON_SEARCH_FIELDS)),
+        output_field=models.TextField(), db_persist=True
+    )
+    search_vector = models.GeneratedField(
+        expression=SearchVector(
+            'first_name', 'middle_name', 'last_name',
+            config='simple', weight='A'
+        ) + SearchVector(
+            # Split ids on punctuation and join the digits of phone
+            # numbers, so both match word by word.
+            RegexpReplace(
+                'national_id', models.Value('[^[:alnum:]]+'),
+                models.Value(' ')
+            ),
+            RegexpReplace(
+                'phone_number', models.Value('[^[:alnum:]]+'),
+                models.Value('')
+            ),
+            config='simple', weight='B'
+        ),
+        output_field=SearchVectorField(), db_persist=True
+    )
     
     def __str__(self):
         return f"{self.first_name} {self.middle_name} {self.last_name}"
 
     class Meta:
         abstract = True
+        indexes = [
+            GinIndex(
+                fields=['search_vector'], name='%(class)s_search_vector_idx'
+            ),
+        ]
 
 
 class UserManager(BaseUserManager):
@@ -69,40 +129,25 @@ class UserManager(BaseUserManager):
 
     def create_superuser(self, email, password):
         """Create and return a new superuser"""
-        user = self.create_user(email, password)
-        user.is_staff = True
-        user.is_superuser = True
-        user.save(using=self._db)
-        return user
+        return self.create_user(
+            email, password, is_staff=True, is_superuser=True
+        )
 
     def create_adminuser(self, email, password):
         """Create and return a new admin user"""
-        user = self.create_user(email, password)
-        user.is_staff = True
-        user.is_admin = True
-        user.save(using=self._db)
-        return user
+        return self.create_user(email, password, is_staff=True, is_admin=True)
 
     def create_teacheruser(self, email, password):
         """Create and return a new teacher user"""
-        user = self.create_user(email, password)
-        user.is_teacher = True
-        user.save(using=self._db)
-        return user
+        return self.create_user(email, password, is_teacher=True)
 
     def create_studentuser(self, email, password):
         """Create and return a new student user"""
-        user = self.create_user(email, password)
-        user.is_teacher = True
-        user.save(using=self._db)
-        return user
+        return self.create_user(email, password, is_student=True)
 
     def create_guardianuser(self, email, password):
         """Create and return a new guardian user"""
-        user = self.create_user(email, password)
-        user.is_teacher = True
-        user.save(using=self._db)
-        return user
+        return self.create_user(email, password, is_guardian=True)
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -124,6 +169,34 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class PINQuerySet(models.QuerySet):
+    """Queries on pins with the expiry check done in SQL"""
+
+    def expired(self):
+        """Pins marked expired or past their expiry date"""
+        return self.filter(
+            models.Q(is_expired=True) |
+            models.Q(expire__lt=timezone.now())
+        )
+
+    def unexpired(self):
+        """Pins that have not expired"""
+        return self.filter(is_expired=False).exclude(
+            expire__lt=timezone.now()
+        )
+
+    def available(self):
+        """Pins that are neither used nor expired"""
+        return self.unexpired().filter(is_used=False)
+
+    def stale(self):
+        """Unused pins past their expiry date not yet marked expired"""
+        return self.filter(
+            is_used=False, is_expired=False,
+            expire__lt=timezone.now()
+        )
+
+
 class PIN(models.Model):
     PIN_TYPE_CHOICES = ( ('teacher', 'Teacher'), ('student', 'Student'), )
     school = models.ForeignKey(
@@ -137,23 +210,81 @@ class PIN(models.Model):
         get_user_model(), on_delete=models.SET_NULL, null=True,
         blank=True, related_name='used_pins'
     )
+    # Account the pin sets the password of, rather than creating one.
+    issued_to = models.ForeignKey(
+        get_user_model(), on_delete=models.CASCADE, null=True,
+        blank=True, related_name='issued_pins'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     expire = models.DateTimeField(null=True, blank=True)
+    is_expired = models.BooleanField(default=False)
+
+    objects = PINQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['school', '-created_at', '-id'],
+                name='pin_school_created_idx'
+            ),
+            models.Index(
+                fields=['school', 'pin_type', 'is_used', '-created_at'],
+                name='pin_school_type_used_idx'
+            ),
+            models.Index(
+                fields=['school', 'pin_type', 'expire'],
+                condition=models.Q(is_used=False, is_expired=False),
+                name='pin_available_idx'
+            ),
+            models.Index(
+                fields=['expire'],
+                condition=models.Q(is_used=False, is_expired=False),
+                name='pin_unexpired_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'Pin {self.pin_code} ({'Used' if self.is_used else 'Available'})'
 
     def has_expired(self):
+        if self.is_expired:
+            return True
         if self.expire:
             return timezone.now() > self.expire
         return False
 
+    @staticmethod
+    def default_expire():
+        """Return the expiry date given to newly issued pins"""
+        return timezone.now() + timedelta(days=30)
+
     def save(self, *args, **kwargs):
         if not self.expire:
-            self.expire = timezone.now() + timedelta(days=30)
+            self.expire = self.default_expire()
         super().save(*args, **kwargs)
 
 
+class PINSequence(models.Model):
+    """Counter from which blocks of pin sequence numbers are reserved"""
+    name = models.CharField(max_length=32, unique=True)
+    next_value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} ({self.next_value})'
+
+    @classmethod
+    def reserve(cls, name, size):
+        """Reserve ``size`` numbers and return the first of them"""
+        with transaction.atomic():
+            sequence, _ = cls.objects.select_for_update().get_or_create(
+                name=name
+            )
+            start = sequence.next_value
+            sequence.next_value = start + size
+            sequence.save(update_fields=['next_value'])
+        return start
+
+
 class Teacher(Person):
     school = models.ForeignKey(
         School, related_name='teachers', on_delete=models.CASCADE
@@ -176,21 +307,42 @@ class Student(Person):
 
 
 class Subject(models.Model):
-    """Subjects in the system"""
+    """Subjects in the system, shared by all schools when school is null"""
     SUBJECT_TYPES = (('core', 'Core'), ('elective', 'Elective'))
-    name = models.CharField(
-        max_length=255, unique=True
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, db_index=False,
+        blank=True, null=True, related_name='subjects'
     )
+    name = models.CharField(max_length=255)
     subject_type = models.CharField(max_length=32, choices=SUBJECT_TYPES)
     subect_code = models.CharField(
-        max_length=64, unique=True, blank=True, default=''
+        max_length=64, blank=True, default=''
     )
 
+    objects = models.Manager()
+    scoped = SchoolScopedManager(include_shared=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['school', 'name'], nulls_distinct=False,
+                name='subject_school_name_unique'
+            ),
+            models.UniqueConstraint(
+                fields=['school', 'subect_code'], nulls_distinct=False,
+                name='subject_school_code_unique'
+            ),
+        ]
+
     def __str__(self) -> str:
         return f'{self.name}'
 
 
 class Lesson(models.Model):
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, db_index=False,
+        blank=True, null=True, related_name='lessons'
+    )
     subject = models.ForeignKey(
         Subject, on_delete=models.CASCADE,
         related_name='lessons'
@@ -201,8 +353,38 @@ class Lesson(models.Model):
     term = models.CharField(max_length=20)
     year = models.IntegerField()
 
+    objects = models.Manager()
+    scoped = SchoolScopedManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['school', 'year', 'term'],
+                name='lesson_school_year_term_idx'
+            ),
+        ]
+
     def __str__(self):
-        return f'{self.subject.name} - ({self.term} {self.year})'
+        return f'{self.subject_name} - ({self.term} {self.year})'
+
+    @property
+    def subject_name(self):
+        """Name of the subject, from the catalog unless it is loaded"""
+        if not Lesson.subject.is_cached(self):
+            entry = catalog.subject(self.subject_id)
+            if entry is not None:
+                return entry.name
+        return self.subject.name
+
+    def save(self, *args, **kwargs):
+        if self.school_id is None:
+            self.school_id = self.subject.school_id
+        if self.school_id is None:
+            # Lessons of no school would be invisible to every school.
+            raise ValidationError(
+                {'school': 'A lesson of a shared subject needs a school.'}
+            )
+        super().save(*args, **kwargs)
 
 
 class AssignmentType(models.Model):
@@ -220,6 +402,11 @@ class AssignmentType(models.Model):
 
 
 class Assignment(models.Model):
+    # Copied from the lesson so school queries need no joins.
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, db_index=False,
+        blank=True, null=True, related_name='assignments'
+    )
     assignment_type = models.ForeignKey(
         AssignmentType, related_name='assignments',
         on_delete=models.CASCADE
@@ -227,8 +414,35 @@ class Assignment(models.Model):
     name = models.CharField(max_length=255)
     max_points = models.IntegerField()  # The maximum possible
 
+    objects = models.Manager()
+    scoped = SchoolScopedManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['school', 'assignment_type'],
+                name='assignment_school_type_idx'
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.name} ({self.assignment_type.name})"
+        return f"{self.name} ({self.assignment_type_name})"
+
+    @property
+    def assignment_type_name(self):
+        """Name of the assignment type, from the catalog unless loaded"""
+        if not Assignment.assignment_type.is_cached(self):
+            entry = catalog.assignment_type(self.assignment_type_id)
+            if entry is not None:
+                return entry.name
+        return self.assignment_type.name
+
+    def save(self, *args, **kwargs):
+        if self.school_id is None:
+            self.school_id = AssignmentType.objects.filter(
+                pk=self.assignment_type_id
+            ).values_list('lesson__school_id', flat=True).first()
+        super().save(*args, **kwargs)
 
 
 class Enrollment(models.Model):
@@ -245,10 +459,50 @@ class Enrollment(models.Model):
         unique_together = ('student', 'lesson')
 
     def __str__(self):
-        return f"{self.student} enrolled in {self.lesson.name}"
+        lesson = None
+        if not Enrollment.lesson.is_cached(self):
+            lesson = catalog.lesson(self.lesson_id)
+        return f"{self.student} enrolled in {lesson or self.lesson}"
+
+
+class Attendance(models.Model):
+    """Attendance of an enrollment over a month, as bitmaps.
+
+    Each bitmap holds one bit per period of every day of the month, day
+    by day, see ``core.attendance``.
+    """
+    # Copied from the lesson so school queries need no joins.
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, db_index=False,
+        blank=True, null=True, related_name='attendance'
+    )
+    enrollment = models.ForeignKey(
+        Enrollment, related_name='attendance', on_delete=models.CASCADE
+    )
+    # First day of the month.
+    month = models.DateField()
+    # Periods whose attendance was taken, and those the student attended.
+    marked = models.BinaryField()
+    present = models.BinaryField()
+
+    class Meta:
+        unique_together = ('enrollment', 'month')
+        indexes = [
+            models.Index(
+                fields=['school', 'month'], name='attendance_school_month_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.enrollment_id} - {self.month:%Y-%m}"
 
 
 class Score(models.Model):
+    # Copied from the assignment so school queries need no joins.
+    school = models.ForeignKey(
+        School, on_delete=models.CASCADE, db_index=False,
+        blank=True, null=True, related_name='scores'
+    )
     student = models.ForeignKey(
         Student, related_name='scores', on_delete=models.CASCADE
     )
@@ -257,8 +511,169 @@ class Score(models.Model):
     )
     score = models.DecimalField(max_digits=5, decimal_places=2)
 
+    objects = models.Manager()
+    scoped = SchoolScopedManager()
+
     class Meta:
         unique_together = ('student', 'assignment')
+        indexes = [
+            models.Index(
+                fields=['school', 'assignment'],
+                name='score_school_assignment_idx'
+            ),
+            models.Index(
+                fields=['school', 'student'],
+                name='score_school_student_idx'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Keep the stored values to apply grade total deltas on update.
+        loaded = dict(zip(field_names, values))
+        if {'student_id', 'assignment_id', 'score'} <= loaded.keys():
+            instance._loaded_values = loaded
+        return instance
+
+    def __str__(self):
+        return f"{self.student} - {self.assignment.name}: " \
+            f"{self.score}/{self.assignment.max_points}"
+
+    def save(self, *args, **kwargs):
+        if self.school_id is None:
+            self.school_id = self.assignment.school_id
+        super().save(*args, **kwargs)
+
+
+class CategoryGrade(models.Model):
+    """Points of a student in an assignment type, kept in step with scores"""
+    student = models.ForeignKey(
+        Student, related_name='category_grades', on_delete=models.CASCADE
+    )
+    assignment_type = models.ForeignKey(
+        AssignmentType, related_name='student_grades',
+        on_delete=models.CASCADE
+    )
+    points_earned = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0
+    )
+    points_possible = models.IntegerField(default=0)
+    scored_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('student', 'assignment_type')
+
+    def __str__(self):
+        return f"{self.student_id} - {self.assignment_type_id}: " \
+            f"{self.points_earned}/{self.points_possible}"
+
+
+class LessonGrade(models.Model):
+    """Weighted total of a student in a lesson, kept in step with scores"""
+    student = models.ForeignKey(
+        Student, related_name='lesson_grades', on_delete=models.CASCADE
+    )
+    lesson = models.ForeignKey(
+        Lesson, related_name='student_grades', on_delete=models.CASCADE
+    )
+    total = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'lesson')
+
+    def __str__(self):
+        return f"{self.student_id} - {self.lesson_id}: {self.total}"
+
+
+class RosterImport(models.Model):
+    """Progress of a roster file import, the checkpoint it resumes from"""
+    KIND_CHOICES = (
+        ('students', 'Students'),
+        ('teachers', 'Teachers'),
+        ('enrollments', 'Enrollments'),
+    )
+    school = models.ForeignKey(
+        School, related_name='roster_imports', on_delete=models.CASCADE
+    )
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES)
+    file_name = models.CharField(max_length=255)
+    checksum = models.CharField(max_length=64)
+    # Rows read so far, the import resumes after them.
+    rows_done = models.IntegerField(default=0)
+    rows_imported = models.IntegerField(default=0)
+    rows_failed = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['school', 'kind', 'checksum'],
+                name='roster_import_file_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} from {self.file_name}: " \
+            f"{self.rows_done} rows"
+
+
+class DataVersion(models.Model):
+    """Counter bumped whenever the data of a school or lesson changes"""
+    # 'school:<id>', 'shared' for rows of no school, 'lesson:<id>' for
+    # the grade totals of a lesson, 'catalog' for the catalog and 'tokens'
+    # for changes cached tokens must see.
+    scope = models.CharField(max_length=32, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.scope} v{self.version}'
+
+
+class ReportCardJob(models.Model):
+    """Report cards of a school's students for a term, built by a worker"""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    school = models.ForeignKey(
+        School, related_name='report_card_jobs', on_delete=models.CASCADE
+    )
+    term = models.CharField(max_length=20)
+    year = models.IntegerField()
+    status = models.CharField(
+        max_length=7, choices=STATUS_CHOICES, default='queued'
+    )
+    requested_by = models.ForeignKey(
+        get_user_model(), on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='report_card_jobs'
+    )
+    students_total = models.IntegerField(default=0)
+    students_done = models.IntegerField(default=0)
+    # Path of the finished zip archive.
+    archive = models.CharField(max_length=255, blank=True, default='')
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Updated as the worker progresses, a stale one means it died.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Counts claims, only the worker of the latest one may save progress.
+    attempt = models.IntegerField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['status', 'created_at'],
+                name='report_card_job_status_idx'
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.student} - {self.assignment.name}: {self.points}/{self.assignment.max_points}"
+        return f'Report cards of {self.school_id} for {self.term} ' \
+            f'{self.year} ({self.status})'
@@ -0,0 +1,141 @@
+"""Pagination for the Core API"""
+import base64
+import binascii
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginate newest first on ``(created_at, id)``.
+
+    The cursor holds the last row of the previous page, so each page is
+    an index range scan from that row rather than an OFFSET.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.API_PAGE_SIZE
+        return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    def encode_cursor(self, instance):
+        position = f'{instance.created_at.isoformat()}|{instance.pk}'
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            position = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, pk = position.split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+    def get_page_queryset(self, queryset, request):
+        """Return the rows of the requested page, plus one, unevaluated"""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk),
+                created_at__lte=created_at
+            )
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, page):
+        """Drop the extra row of a page and keep the cursor after it"""
+        self.next_cursor = None
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            self.next_cursor = self.encode_cursor(page[-1])
+        return page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(
+            list(self.get_page_queryset(queryset, request))
+        )
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param, self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class IdKeysetPagination(KeysetPagination):
+    """Paginate in ``id`` order, for rows without a creation time"""
+
+    def encode_cursor(self, instance):
+        return base64.urlsafe_b64encode(str(instance.pk).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_page_queryset(self, queryset, request):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by('id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(id__gt=self.decode_cursor(cursor))
+        return queryset[:self.page_size + 1]
@@ -0,0 +1,78 @@
+"""
+Minimal PDF writer.
+
+Lays out lines of text in the standard Helvetica fonts on A4 pages, which
+needs no font files or third party library. Text is encoded as WinAnsi
+(cp1252), characters outside it are replaced.
+"""
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+
+
+def _escape(text):
+    return text.encode('cp1252', 'replace').replace(
+        b'\\', b'\\\\'
+    ).replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def _layout(lines):
+    """Split lines into the content streams of pages"""
+    pages, content, y = [], [], PAGE_HEIGHT - MARGIN
+    for text, size, bold in lines:
+        leading = size * 1.4
+        if y - leading < MARGIN:
+            pages.append(content)
+            content, y = [], PAGE_HEIGHT - MARGIN
+        y -= leading
+        if text:
+            content.append(b'BT /%s %d Tf %d %.1f Td (%s) Tj ET' % (
+                b'F2' if bold else b'F1', size, MARGIN, y, _escape(text)
+            ))
+    pages.append(content)
+    return [b'\n'.join(content) for content in pages]
+
+
+def text_pdf(lines):
+    """Return a PDF document of ``lines``.
+
+    Each line is a ``(text, size, bold)`` tuple, lines with empty text
+    add space.
+    """
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # The page tree, once pages are numbered.
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+        b'/Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold '
+        b'/Encoding /WinAnsiEncoding >>',
+    ]
+    pages = []
+    for stream in _layout(lines):
+        objects.append(
+            b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream)
+        )
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> '
+            b'/Contents %d 0 R >>' % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+        )
+        pages.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+        b' '.join(pages), len(pages)
+    )
+
+    document = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(document))
+        document += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(document)
+    document += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    for offset in offsets:
+        document += b'%010d 00000 n \n' % offset
+    document += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n' % (
+        len(objects) + 1, xref
+    )
+    document += b'%%EOF\n'
+    return bytes(document)
@@ -0,0 +1,101 @@
+"""
+Bulk user provisioning.
+
+``provision_users`` creates many users of one role at once. Hashing a
+password is deliberately slow CPU work, so passwords are hashed in a pool
+of ``PASSWORD_HASH_PROCESSES`` processes before any row is written, and
+the users are then inserted with ``bulk_create``. The pool is started
+once per worker and kept for later batches. A request still waits for
+its hashes, so it may give at most ``USER_PROVISION_MAX_PASSWORDS``
+accounts a password. Users can instead be issued one time pins which
+set their password when redeemed, skipping hashing altogether.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from core.utils import PIN_ROLE_FLAGS, generate_pins
+
+# User flags set for each role.
+ROLE_FLAGS = {
+    'teacher': {'is_teacher': True},
+    'student': {'is_student': True},
+    'guardian': {'is_guardian': True},
+    'admin': {'is_staff': True, 'is_admin': True},
+}
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(processes):
+    """Return this worker's pool of ``processes`` hashing processes"""
+    with _pools_lock:
+        if processes not in _pools:
+            # Workers set Django up themselves in case they are not forked.
+            _pools[processes] = ProcessPoolExecutor(
+                processes, initializer=django.setup
+            )
+        return _pools[processes]
+
+
+def hash_passwords(passwords, processes=None):
+    """Return the hashes of ``passwords``, computed in a process pool"""
+    processes = processes or settings.PASSWORD_HASH_PROCESSES
+    if min(processes, len(passwords)) <= 1:
+        return [make_password(password) for password in passwords]
+    pool = _pool(processes)
+    try:
+        return list(pool.map(
+            make_password, passwords,
+            chunksize=max(1, len(passwords) // (processes * 4))
+        ))
+    except BrokenProcessPool:
+        # A killed hashing process breaks the pool, start a new one.
+        with _pools_lock:
+            if _pools.get(processes) is pool:
+                del _pools[processes]
+        raise
+
+
+def provision_users(accounts, role, school=None, issue_pins=False,
+                    processes=None):
+    """Create users of ``role`` for ``accounts`` in bulk.
+
+    ``accounts`` are dicts of an ``email`` and, unless ``issue_pins``, a
+    ``password``. With ``issue_pins`` the users get unusable passwords and
+    a pin each instead, which only teachers and students can redeem.
+    Returns the users and their pins, in the order of ``accounts``.
+    """
+    if issue_pins and role not in PIN_ROLE_FLAGS:
+        raise ValueError(f'Pins cannot be issued to {role} users')
+    if issue_pins:
+        passwords = [make_password(None) for _ in accounts]
+    else:
+        passwords = hash_passwords(
+            [account['password'] for account in accounts], processes
+        )
+
+    User = get_user_model()
+    users = [
+        User(
+            email=account['email'], password=password, school=school,
+            **ROLE_FLAGS[role]
+        )
+        for account, password in zip(accounts, passwords)
+    ]
+    pins = []
+    with transaction.atomic():
+        User.objects.bulk_create(users, batch_size=1000)
+        if issue_pins:
+            pins, _ = generate_pins(
+                role, len(users), school=school, issued_to=users
+            )
+    return users, pins
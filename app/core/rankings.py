@@ -0,0 +1,113 @@
+"""
+Class positions.
+
+Students are ranked in SQL with window functions over their
+``LessonGrade`` totals: within a lesson on their total, and over a term on
+the average of their totals across the term's lessons. Each row has its
+position, ties sharing the better one ("3rd of 120"), its dense rank, its
+percentile (the percentage of the class ranked below) and its grade band
+from ``GRADE_BANDS``. Students without a total are not ranked.
+
+Rankings are cached in the ``RANKING_CACHE`` cache under the version of
+their data: a lesson's ranking under the lesson's version, bumped by every
+change to its totals, and a term's under the version of the school.
+"""
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Avg, Case, F, FloatField, Value, When, Window
+from django.db.models.functions import DenseRank, PercentRank, Rank
+
+from core import versions
+from core.models import LessonGrade
+
+
+def _band(field):
+    """Return the grade band of ``field`` as a SQL expression"""
+    bands = sorted(settings.GRADE_BANDS, reverse=True)
+    return Case(
+        *[
+            When(**{f'{field}__gte': minimum}, then=Value(band))
+            for minimum, band in bands[:-1]
+        ],
+        default=Value(bands[-1][1])
+    )
+
+
+def _ranked(queryset, field):
+    """Annotate ``queryset`` with the positions of its rows by ``field``"""
+    return queryset.annotate(
+        position=Window(Rank(), order_by=F(field).desc()),
+        dense_rank=Window(DenseRank(), order_by=F(field).desc()),
+        percent_rank=Window(PercentRank(), order_by=F(field).asc()),
+        band=_band(field),
+    ).order_by('position', 'student__last_name', 'student_id')
+
+
+def _rows(queryset, field):
+    rows = list(_ranked(queryset, field).values(
+        'student_id', 'student__first_name', 'student__last_name', field,
+        'position', 'dense_rank', 'percent_rank', 'band'
+    ))
+    return [
+        {
+            'student': row['student_id'],
+            'name': f"{row['student__first_name']} "
+                    f"{row['student__last_name']}",
+            'total': round(row[field], 2),
+            'position': row['position'],
+            'dense_rank': row['dense_rank'],
+            'percentile': round(row['percent_rank'] * 100, 1),
+            'band': row['band'],
+        }
+        for row in rows
+    ]
+
+
+def _cached(key, build):
+    cache = caches[settings.RANKING_CACHE['ALIAS']]
+    ranking = cache.get(key)
+    if ranking is None:
+        ranking = build()
+        cache.set(key, ranking, settings.RANKING_CACHE['TTL'])
+    return ranking
+
+
+def lesson_ranking(lesson):
+    """Return the positions of the students of a lesson"""
+    version = versions.lesson_version(lesson.pk)
+
+    def build():
+        students = _rows(LessonGrade.objects.filter(
+            lesson_id=lesson.pk, total__isnull=False
+        ), 'total')
+        return {
+            'lesson': lesson.pk, 'term': lesson.term, 'year': lesson.year,
+            'out_of': len(students), 'students': students,
+        }
+
+    return _cached(
+        f'ranking:lesson:{lesson.pk}:{quote(lesson.term)}:{lesson.year}:'
+        f'{version}', build
+    )
+
+
+def term_ranking(school_id, term, year):
+    """Return the positions of a school's students over a term"""
+    etag, _ = versions.current_version(school_id)
+
+    def build():
+        averages = LessonGrade.objects.filter(
+            lesson__school_id=school_id, lesson__term=term,
+            lesson__year=year, total__isnull=False
+        ).values('student_id').annotate(
+            average=Avg('total', output_field=FloatField())
+        )
+        students = _rows(averages, 'average')
+        return {
+            'term': term, 'year': year, 'out_of': len(students),
+            'students': students,
+        }
+
+    return _cached(f'ranking:term:{quote(term)}:{year}:{etag}', build)
@@ -0,0 +1,317 @@
+"""
+Report cards.
+
+A ``ReportCardJob`` builds the report card of every student of a school
+for one term, as a zip archive of PDFs in ``REPORT_CARD_DIR``. Jobs are
+rows queued by the API and run by the ``report_card_worker`` command,
+which claims them with ``SKIP LOCKED`` so several workers can share the
+queue.
+
+Grades are loaded with ``compute_gradebook``, one fixed set of queries
+per lesson, and gathered into a plain dict per student. Rendering the
+PDFs, the slow part, is fanned out over ``REPORT_CARD_PROCESSES``
+processes, ``REPORT_CARD_BATCH_SIZE`` students at a time. Each batch is
+streamed into its own part archive, renamed into place once complete,
+and the job's progress saved, so a job whose worker died resumes after
+its last complete batch. The parts are merged into the final archive
+when all students are done.
+
+A worker that only stalled may still be running when its job is claimed
+again. Every claim bumps the job's ``attempt`` and progress is only saved
+by the worker of the latest one: the other gets ``JobLost`` at its next
+checkpoint and stops. Parts and archives are named after their attempt,
+so the two never write the same file.
+
+A finished job whose archive went missing is queued again by ``requeue``
+when it is downloaded.
+"""
+import logging
+import os
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+import django
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+
+from core.gradebook import GradebookError, compute_gradebook
+from core.models import Assignment, Lesson, ReportCardJob, Student
+from core.pdf import text_pdf
+
+logger = logging.getLogger(__name__)
+
+
+def _grade(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def _percent(value):
+    return '-' if value is None else f'{value:.1f}%'
+
+
+def collect_cards(job):
+    """Return the report card data of every student of the job's school"""
+    students = Student.objects.filter(school_id=job.school_id).order_by(
+        'id'
+    ).values_list('id', 'first_name', 'last_name', 'grade_level')
+    cards = {
+        pk: {
+            'student': pk, 'name': f'{first_name} {last_name}',
+            'grade_level': grade_level, 'school': job.school.name,
+            'term': job.term, 'year': job.year, 'lessons': [],
+        }
+        for pk, first_name, last_name, grade_level in students
+    }
+    lessons = list(
+        Lesson.objects.filter(
+            school_id=job.school_id, term=job.term, year=job.year
+        ).select_related('subject').order_by('subject__name', 'id')
+    )
+    assignments = {
+        pk: (name, max_points)
+        for pk, name, max_points in Assignment.objects.filter(
+            assignment_type__lesson__in=lessons
+        ).values_list('id', 'name', 'max_points')
+    }
+
+    for lesson in lessons:
+        try:
+            gradebook = compute_gradebook(lesson)
+        except GradebookError as error:
+            logger.warning('Lesson %s not graded: %s', lesson.pk, error)
+            continue
+        for row, student_id in enumerate(gradebook.student_ids.tolist()):
+            if student_id not in cards:
+                continue
+            cards[student_id]['lessons'].append({
+                'subject': lesson.subject.name,
+                'total': _grade(gradebook.totals[row]),
+                'categories': [
+                    (name, weight, _grade(average))
+                    for name, weight, average in zip(
+                        gradebook.category_names, gradebook.weights.tolist(),
+                        gradebook.category_averages[row]
+                    )
+                ],
+                'scores': [
+                    (*assignments[pk], _grade(score))
+                    for pk, score in zip(
+                        gradebook.assignment_ids.tolist(),
+                        gradebook.scores[row]
+                    )
+                ],
+            })
+    return list(cards.values())
+
+
+def card_name(card):
+    """Return the file name of a report card in the archive"""
+    return f"{card['student']}-{slugify(card['name']) or 'student'}.pdf"
+
+
+def render_report_card(card):
+    """Return the file name and PDF of a report card"""
+    lines = [
+        (card['school'], 16, True),
+        (f"Report card, {card['term']} {card['year']}", 12, False),
+        ('', 8, False),
+        (card['name'], 13, True),
+        (f"Grade level: {card['grade_level']}", 10, False),
+        ('', 8, False),
+    ]
+    for lesson in card['lessons']:
+        lines.append(
+            (f"{lesson['subject']}: {_percent(lesson['total'])}", 12, True)
+        )
+        for name, weight, average in lesson['categories']:
+            lines.append(
+                (f'{name} ({weight:g}%): {_percent(average)}', 10, False)
+            )
+        for name, max_points, score in lesson['scores']:
+            score = '-' if score is None else f'{score:g}'
+            lines.append((f'    {name}: {score} / {max_points}', 9, False))
+        lines.append(('', 8, False))
+    if not card['lessons']:
+        lines.append(('No graded lessons this term.', 10, False))
+    return card_name(card), text_pdf(lines)
+
+
+@contextmanager
+def _renderer(processes):
+    """Yield a function rendering a batch of cards, in order"""
+    if processes <= 1:
+        yield lambda cards: map(render_report_card, cards)
+        return
+    with ProcessPoolExecutor(processes, initializer=django.setup) as pool:
+        yield lambda cards: pool.map(
+            render_report_card, cards,
+            chunksize=max(1, len(cards) // (processes * 4))
+        )
+
+
+def job_directory(job):
+    """Return the directory holding the part archives of a job"""
+    return Path(settings.REPORT_CARD_DIR) / f'job-{job.pk}'
+
+
+class JobLost(Exception):
+    """The job was claimed again by another worker"""
+
+
+def _checkpoint(job, *fields):
+    """Save progress, unless the job was claimed again since"""
+    job.heartbeat_at = timezone.now()
+    changes = {
+        field: getattr(job, field) for field in [*fields, 'heartbeat_at']
+    }
+    if not ReportCardJob.objects.filter(
+        pk=job.pk, attempt=job.attempt
+    ).update(**changes):
+        raise JobLost(f'Job {job.pk} was claimed by another worker')
+
+
+def _done_students(parts):
+    """Return the ids of the students whose cards are in ``parts``"""
+    done = set()
+    for part in parts:
+        with zipfile.ZipFile(part) as archive:
+            done.update(
+                int(name.split('-', 1)[0]) for name in archive.namelist()
+            )
+    return done
+
+
+def _merge(parts, target):
+    """Stream the members of the part archives into ``target``, each
+    card once"""
+    temporary = target.with_suffix('.tmp')
+    names = set()
+    with zipfile.ZipFile(temporary, 'w', zipfile.ZIP_DEFLATED) as merged:
+        for part in parts:
+            with zipfile.ZipFile(part) as archive:
+                for info in archive.infolist():
+                    if info.filename in names:
+                        continue
+                    names.add(info.filename)
+                    with archive.open(info) as source, \
+                            merged.open(info.filename, 'w') as destination:
+                        shutil.copyfileobj(source, destination)
+    os.replace(temporary, target)
+
+
+def build_archive(job, processes=None, progress=None):
+    """Render the report cards of a job into its archive.
+
+    Cards already in the part archives of an earlier, interrupted run are
+    kept. ``progress`` is called with the job after each batch.
+    """
+    cards = collect_cards(job)
+    directory = job_directory(job)
+    directory.mkdir(parents=True, exist_ok=True)
+    # Parts being written by earlier attempts are incomplete.
+    for temporary in directory.glob('*.tmp'):
+        temporary.unlink(missing_ok=True)
+    parts = sorted(directory.glob('part-*.zip'))
+    done = _done_students(parts)
+    pending = [card for card in cards if card['student'] not in done]
+    job.students_total = len(done) + len(pending)
+    job.students_done = len(done)
+    _checkpoint(job, 'students_total', 'students_done')
+
+    batch_size = settings.REPORT_CARD_BATCH_SIZE
+    processes = min(
+        processes or settings.REPORT_CARD_PROCESSES, len(pending) or 1
+    )
+    with _renderer(processes) as render:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            part = directory / f'part-{job.attempt:03d}-{len(parts):05d}.zip'
+            temporary = part.with_suffix('.tmp')
+            with zipfile.ZipFile(
+                temporary, 'w', zipfile.ZIP_DEFLATED
+            ) as archive:
+                for name, document in render(batch):
+                    archive.writestr(name, document)
+            os.replace(temporary, part)
+            parts.append(part)
+            job.students_done += len(batch)
+            _checkpoint(job, 'students_done')
+            if progress:
+                progress(job)
+
+    name = f'report-cards-{job.pk}-{job.attempt}.zip'
+    target = Path(settings.REPORT_CARD_DIR) / name
+    _merge(parts, target)
+    job.archive = name
+    job.status = 'done'
+    job.finished_at = timezone.now()
+    try:
+        _checkpoint(job, 'archive', 'status', 'finished_at')
+    except JobLost:
+        target.unlink()
+        raise
+    shutil.rmtree(directory)
+
+
+def claim_job():
+    """Mark the oldest waiting job running and return it, or None.
+
+    Running jobs whose worker stopped reporting progress are claimed
+    again and resume where it stopped.
+    """
+    stale = timezone.now() - timedelta(
+        seconds=settings.REPORT_CARD_STALE_SECONDS
+    )
+    with transaction.atomic():
+        job = ReportCardJob.objects.select_for_update(
+            skip_locked=True
+        ).filter(
+            Q(status='queued') | Q(status='running', heartbeat_at__lt=stale)
+        ).order_by('created_at').first()
+        if job is None:
+            return None
+        job.attempt += 1
+        job.status = 'running'
+        job.started_at = job.started_at or timezone.now()
+        job.heartbeat_at = timezone.now()
+        job.save(update_fields=[
+            'attempt', 'status', 'started_at', 'heartbeat_at'
+        ])
+    return job
+
+
+def requeue(job):
+    """Queue a finished job whose archive is gone to be built again"""
+    ReportCardJob.objects.filter(
+        pk=job.pk, status='done', archive=job.archive
+    ).update(
+        status='queued', archive='', students_total=0, students_done=0,
+        finished_at=None
+    )
+
+
+def run_job(job, processes=None, progress=None):
+    """Build the archive of a claimed job, recording any failure"""
+    try:
+        build_archive(job, processes=processes, progress=progress)
+    except JobLost:
+        logger.warning('Report card job %s was claimed again', job.pk)
+    except Exception as error:
+        logger.exception('Report card job %s failed', job.pk)
+        job.status = 'failed'
+        job.error = str(error) or type(error).__name__
+        job.finished_at = timezone.now()
+        try:
+            _checkpoint(job, 'status', 'error', 'finished_at')
+        except JobLost:
+            # The error may come from the other worker's cleanup.
+            pass
+    return job
@@ -0,0 +1,371 @@
+"""
+Roster import.
+
+Students, teachers and enrollments are read from CSV or XLSX files in
+chunks of ``ROSTER_IMPORT_CHUNK_SIZE`` rows. Each chunk is validated as a
+batch, its foreign keys resolved through lookup maps loaded once per
+import, and its valid rows written with COPY on PostgreSQL. The chunk and
+the import's checkpoint are committed together, so importing the same
+file again resumes after the last chunk written.
+
+Columns are named after model fields. Student and teacher rows may have
+an ``account_email`` column to also create their login, with an unusable
+password and a pin issued to it that sets one when redeemed. Pins are
+handed out from the school's pin export, which names the account each
+was issued to. Enrollment rows name the student by ``student_id`` or
+``national_id`` and the lesson by ``lesson_id`` or by ``subject_code``,
+``term`` and ``year``.
+
+XLSX files need openpyxl.
+"""
+import codecs
+import csv
+import hashlib
+import io
+import time
+import zipfile
+from datetime import date, datetime
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from core import versions
+from core.catalog import catalog
+from core.models import (
+    Enrollment, Lesson, RosterImport, Student, Subject, Teacher,
+)
+from core.utils import PIN_ROLE_FLAGS, generate_pins
+
+
+class RosterError(ValueError):
+    """The roster file cannot be imported"""
+
+
+def file_checksum(file):
+    """Return the SHA-256 of a file, which identifies its import"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(1 << 16), b''):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _sheet_rows(workbook):
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [_cell(value).strip() for value in next(rows, ())]
+        for values in rows:
+            yield dict(zip(header, map(_cell, values)))
+    finally:
+        workbook.close()
+
+
+def read_rows(file, name):
+    """Return an iterator over the rows of a CSV or XLSX file as dicts"""
+    if not name.lower().endswith('.xlsx'):
+        return csv.DictReader(codecs.iterdecode(file, 'utf-8-sig'))
+    try:
+        import openpyxl
+    except ImportError:
+        raise RosterError(_('Install openpyxl to import XLSX files'))
+    try:
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError, OSError):
+        raise RosterError(_('File is not a valid XLSX file'))
+    return _sheet_rows(workbook)
+
+
+def _clean_row(row):
+    return {
+        key.strip(): (value or '').strip() if isinstance(value, str) else ''
+        for key, value in row.items() if key
+    }
+
+
+def _row_error(number, messages):
+    return {'row': number, 'errors': messages}
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace(
+        '\n', '\\n'
+    ).replace('\r', '\\r')
+
+
+def copy_rows(model, objects):
+    """Insert unsaved objects with COPY, or bulk_create off PostgreSQL"""
+    if not objects:
+        return
+    if connection.vendor != 'postgresql':
+        model.objects.bulk_create(objects, batch_size=5000)
+        return
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not field.primary_key and not field.generated
+    ]
+    buffer = io.StringIO()
+    for obj in objects:
+        buffer.write('\t'.join(
+            _copy_value(field.get_db_prep_save(
+                getattr(obj, field.attname), connection
+            ))
+            for field in fields
+        ) + '\n')
+    buffer.seek(0)
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(
+            f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN',
+            buffer
+        )
+
+
+class PersonImporter:
+    """Import students or teachers, with a login for rows that ask"""
+
+    def __init__(self, model, role, school):
+        self.model = model
+        self.role = role
+        self.school = school
+        self.field_names = {
+            field.name for field in model._meta.concrete_fields
+            if field.name not in ('id', 'school', 'user')
+        }
+        self.email_field = get_user_model()._meta.get_field('email')
+
+    def import_chunk(self, rows, start):
+        people, errors, emails = [], [], {}
+        for number, row in enumerate(rows, start + 1):
+            person = self.model(school=self.school, **{
+                name: value for name, value in row.items()
+                if name in self.field_names
+            })
+            messages = []
+            try:
+                person.clean_fields(exclude=['school', 'user'])
+            except ValidationError as error:
+                messages = [
+                    f'{field}: {message}'
+                    for field, field_messages in error.message_dict.items()
+                    for message in field_messages
+                ]
+            email = row.get('account_email', '').lower()
+            if email:
+                try:
+                    self.email_field.clean(email, None)
+                except ValidationError as error:
+                    messages += [f'account_email: {m}' for m in error.messages]
+                if email in emails:
+                    messages.append(
+                        _('account_email: Appears more than once')
+                    )
+            if messages:
+                errors.append(_row_error(number, messages))
+                continue
+            if email:
+                emails[email] = number
+            people.append((person, email))
+
+        User = get_user_model()
+        for email in User.objects.filter(
+            email__in=list(emails)
+        ).values_list('email', flat=True):
+            errors.append(_row_error(
+                emails.pop(email), [_('account_email: Already in use')]
+            ))
+        people = [
+            (person, email) for person, email in people
+            if not email or email in emails
+        ]
+        users = User.objects.bulk_create([
+            self.new_user(email) for person, email in people if email
+        ])
+        if users:
+            generate_pins(
+                self.role, len(users), school=self.school, issued_to=users
+            )
+        logins = iter(users)
+        for person, email in people:
+            if email:
+                person.user_id = next(logins).pk
+        copy_rows(self.model, [person for person, _ in people])
+        return len(people), sorted(errors, key=lambda error: error['row'])
+
+    def new_user(self, email):
+        user = get_user_model()(
+            email=email, school=self.school,
+            **{PIN_ROLE_FLAGS[self.role]: True}
+        )
+        user.set_unusable_password()
+        return user
+
+
+class EnrollmentImporter:
+    """Import enrollments of students in lessons of the school"""
+
+    def __init__(self, school):
+        self.school_id = school.pk
+        students = list(
+            Student.objects.filter(school=school).values_list(
+                'id', 'national_id'
+            )
+        )
+        self.student_ids = {pk for pk, _ in students}
+        self.students_by_national_id = {
+            national_id: pk for pk, national_id in students if national_id
+        }
+        lessons = list(
+            Lesson.objects.filter(school=school).values_list(
+                'id', 'subject_id', 'term', 'year'
+            )
+        )
+        self.lesson_ids = {pk for pk, *_ in lessons}
+        self.lessons_by_key = {
+            (subject_id, term.lower(), str(year)): pk
+            for pk, subject_id, term, year in lessons
+        }
+        self.subject_ids = {}
+        self.enrolled = set(
+            Enrollment.objects.filter(
+                lesson_id__in=self.lesson_ids
+            ).values_list('student_id', 'lesson_id')
+        )
+
+    def find_student(self, row):
+        if row.get('student_id'):
+            pk = int(row['student_id']) if row['student_id'].isdigit() else 0
+            return pk if pk in self.student_ids else None
+        return self.students_by_national_id.get(row.get('national_id'))
+
+    def find_lesson(self, row):
+        if row.get('lesson_id'):
+            pk = int(row['lesson_id']) if row['lesson_id'].isdigit() else 0
+            return pk if pk in self.lesson_ids else None
+        return self.lessons_by_key.get((
+            self.find_subject(row.get('subject_code', '')),
+            row.get('term', '').lower(),
+            row.get('year', '')
+        ))
+
+    def find_subject(self, code):
+        """Return the id of the school's subject of a code, or else the
+        shared one's"""
+        if code not in self.subject_ids:
+            entry = catalog.subject_by_code(self.school_id, code)
+            if entry is not None:
+                self.subject_ids[code] = entry.id
+            else:
+                # Over the catalog's budget, or created since its load.
+                self.subject_ids[code] = Subject.objects.filter(
+                    Q(school_id=self.school_id) | Q(school__isnull=True),
+                    subect_code__iexact=code,
+                ).order_by(
+                    F('school_id').asc(nulls_last=True)
+                ).values_list('id', flat=True).first()
+        return self.subject_ids[code]
+
+    def import_chunk(self, rows, start):
+        enrollments, errors = [], []
+        for number, row in enumerate(rows, start + 1):
+            student_id = self.find_student(row)
+            lesson_id = self.find_lesson(row)
+            messages = []
+            if student_id is None:
+                messages.append(_('Unknown student'))
+            if lesson_id is None:
+                messages.append(_('Unknown lesson'))
+            if messages:
+                errors.append(_row_error(number, messages))
+            elif (student_id, lesson_id) not in self.enrolled:
+                self.enrolled.add((student_id, lesson_id))
+                enrollments.append(
+                    Enrollment(student_id=student_id, lesson_id=lesson_id)
+                )
+        copy_rows(Enrollment, enrollments)
+        return len(enrollments), errors
+
+
+IMPORTERS = {
+    'students': lambda school: PersonImporter(Student, 'student', school),
+    'teachers': lambda school: PersonImporter(Teacher, 'teacher', school),
+    'enrollments': EnrollmentImporter,
+}
+
+
+def import_roster(file, name, kind, school, chunk_size=None, progress=None):
+    """Import a roster file, resuming an unfinished import of the same file.
+
+    ``progress`` is called with the import and the rows per second after
+    each chunk. Returns the import, the errors of invalid rows (up to
+    ``ROSTER_IMPORT_MAX_ERRORS``) and the rows per second.
+    """
+    chunk_size = chunk_size or settings.ROSTER_IMPORT_CHUNK_SIZE
+    checksum = file_checksum(file)
+    if RosterImport.objects.filter(
+        school=school, kind=kind, checksum=checksum,
+        finished_at__isnull=False
+    ).exists():
+        raise RosterError(_('This file has already been imported'))
+    job, _created = RosterImport.objects.get_or_create(
+        school=school, kind=kind, checksum=checksum, finished_at=None,
+        defaults={'file_name': name}
+    )
+
+    importer = IMPORTERS[kind](school)
+    rows = islice(
+        (_clean_row(row) for row in read_rows(file, name)),
+        job.rows_done, None
+    )
+    errors, read = [], 0
+    started = time.perf_counter()
+    try:
+        while chunk := list(islice(rows, chunk_size)):
+            with transaction.atomic():
+                imported, chunk_errors = importer.import_chunk(
+                    chunk, job.rows_done
+                )
+                job.rows_done += len(chunk)
+                job.rows_imported += imported
+                job.rows_failed += len(chunk_errors)
+                job.save(update_fields=[
+                    'rows_done', 'rows_imported', 'rows_failed'
+                ])
+                if imported:
+                    versions.bump(school.pk)
+            errors += chunk_errors[
+                :settings.ROSTER_IMPORT_MAX_ERRORS - len(errors)
+            ]
+            read += len(chunk)
+            if progress is not None:
+                progress(job, read / (time.perf_counter() - started))
+    except (UnicodeDecodeError, csv.Error):
+        raise RosterError(_('File must be a UTF-8 CSV or an XLSX file'))
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['finished_at'])
+    seconds = time.perf_counter() - started
+    return job, errors, read / seconds if seconds else 0.0
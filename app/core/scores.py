@@ -0,0 +1,123 @@
+"""
+Bulk score entry.
+
+A batch holds the scores of one assignment. Rows are validated together
+with array operations, invalid rows are reported back and the valid ones
+are upserted in a single statement.
+"""
+import csv
+import io
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from django.db import transaction
+from django.utils.translation import gettext as _
+
+from core import grades, versions
+from core.models import Enrollment, Score
+
+# Largest value a Score.score column holds.
+SCORE_LIMIT = 1000
+
+
+def read_csv(file):
+    """Return the rows of an uploaded CSV file with a header row"""
+    text = io.StringIO(file.read().decode('utf-8-sig'))
+    return list(csv.DictReader(text))
+
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+def _parse_score(value):
+    try:
+        return Decimal(str(value).strip()).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def validate_scores(assignment, rows):
+    """Validate a batch of ``{'student': id, 'score': value}`` rows.
+
+    Returns the student ids, parsed scores and a list of error messages
+    per row, empty for valid rows.
+    """
+    student_ids = np.array(
+        [_parse_int(row.get('student')) for row in rows], dtype=np.int64
+    )
+    parsed = [_parse_score(row.get('score')) for row in rows]
+    values = np.array(
+        [np.nan if score is None else float(score) for score in parsed]
+    )
+    enrolled = np.fromiter(
+        Enrollment.objects.filter(
+            lesson_id=assignment.assignment_type.lesson_id
+        ).values_list('student_id', flat=True),
+        dtype=np.int64
+    )
+    unique, counts = np.unique(student_ids, return_counts=True)
+
+    checks = [
+        (student_ids < 0, _('Student must be an id')),
+        (
+            (student_ids >= 0) & ~np.isin(student_ids, enrolled),
+            _('Student is not enrolled in the lesson')
+        ),
+        (
+            np.isin(student_ids, unique[counts > 1]),
+            _('Student appears more than once')
+        ),
+        (np.isnan(values), _('Score must be a number')),
+        (
+            (values < 0) | (values > assignment.max_points)
+            | (values >= SCORE_LIMIT),
+            _('Score must be between 0 and %(max)s') % {
+                'max': assignment.max_points
+            }
+        ),
+    ]
+    errors = [[] for row in rows]
+    for failed, message in checks:
+        for index in np.flatnonzero(failed):
+            errors[index].append(message)
+    return student_ids.tolist(), parsed, errors
+
+
+def save_scores(assignment, rows):
+    """Upsert the valid rows of a batch.
+
+    Returns the number of scores saved and the errors of invalid rows.
+    """
+    student_ids, parsed, errors = validate_scores(assignment, rows)
+    valid = {
+        student_id: score
+        for student_id, score, row_errors in zip(student_ids, parsed, errors)
+        if not row_errors
+    }
+    with transaction.atomic():
+        Score.objects.bulk_create(
+            [
+                Score(
+                    student_id=student_id, assignment=assignment,
+                    school_id=assignment.school_id, score=score
+                )
+                for student_id, score in valid.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['student', 'assignment'],
+            update_fields=['score'],
+            batch_size=5000
+        )
+        # bulk_create sends no signals, refresh the affected totals.
+        grades.rebuild(
+            [assignment.assignment_type.lesson_id], students=list(valid)
+        )
+        versions.bump(assignment.school_id)
+    return len(valid), [
+        {'row': index, 'student': rows[index].get('student'), 'errors': e}
+        for index, e in enumerate(errors) if e
+    ]
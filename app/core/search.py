@@ -0,0 +1,72 @@
+"""
+People search.
+
+Students and teachers carry two generated columns, kept by the database
+on every write including bulk inserts and COPY:
+
+* ``search_vector``, a ``simple`` configuration tsvector of the names
+  (weight A) and the national id and phone number (weight B), with a GIN
+  index. Each word of a query matches as a prefix, so "kwa men" finds
+  "Kwame Mensah" and "0244" finds the phone number "024-412-3456".
+* ``search_text``, the same fields lowercased in one string. Where the
+  ``pg_trgm`` extension is installed it has a trigram GIN index and
+  matches by trigram word similarity, which tolerates typos and finds
+  the middle of ids and phone numbers. Without the extension only the
+  full text matches are returned, as a substring match could not use an
+  index.
+
+Results are ordered by the better of the full text rank and the trigram
+similarity.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+
+WORD = re.compile(r'\w+')
+
+_trigram_databases = {}
+
+
+def trigram_available(alias):
+    """Return whether the ``pg_trgm`` extension is installed"""
+    if alias not in _trigram_databases:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+            )
+            _trigram_databases[alias] = cursor.fetchone() is not None
+    return _trigram_databases[alias]
+
+
+def prefix_query(text):
+    """Return a query matching every word of ``text`` as a prefix"""
+    words = WORD.findall(text.lower())
+    if not words:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{word}:*' for word in words),
+        search_type='raw', config='simple'
+    )
+
+
+def search_people(queryset, text):
+    """Return the rows of a student or teacher queryset matching
+    ``text``, best first, with their ``rank``"""
+    text = ' '.join(text.lower().split())
+    query = prefix_query(text)
+    if query is None:
+        return queryset.none()
+    matches = Q(search_vector=query)
+    rank = SearchRank(F('search_vector'), query)
+    if trigram_available(queryset.db):
+        matches |= Q(search_text__trigram_word_similar=text)
+        rank = Greatest(
+            rank, TrigramWordSimilarity(Value(text), 'search_text')
+        )
+    return queryset.filter(matches).annotate(rank=rank).order_by(
+        '-rank', 'last_name', 'first_name', 'id'
+    )
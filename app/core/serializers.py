@@ -1,14 +1,20 @@
 """
 Serializers for the Core API
 """
-from django.contrib.auth import (
-    get_user_model,
-    authenticate
-)
+import csv
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
 from core import models
+from core.authentication import authenticate_login
+from core.provisioning import ROLE_FLAGS
+from core.scores import read_csv
+from core.utils import PIN_ROLE_FLAGS, PINUnavailable, redeem_pin
+from django.db import IntegrityError
 from django.utils.translation import gettext as _
 from rest_framework import serializers
-from core.utils import generate_unique_pin
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -22,8 +28,8 @@ class AuthTokenSerializer(serializers.Serializer):
         """Validates and authenticated users"""
         email = attrs.get('email')
         password = attrs.get('password')
-        user = authenticate(
-            request=self.context.get('request'),
+        user = authenticate_login(
+            self.context.get('request'),
             email=email,
             password=password
         )
@@ -60,9 +66,12 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class PINGenerateRequestSerializer(serializers.Serializer):
-    pin_count = serializers.IntegerField(min_value=1)
+    pin_count = serializers.IntegerField(
+        min_value=1, default=1,
+        max_value=settings.PIN_GENERATION_MAX
+    )
     pin_type = serializers.ChoiceField(
-        choices=[('teacher', 'Teacher'),('student', 'Student')]
+        choices=models.PIN.PIN_TYPE_CHOICES
     )
 
 
@@ -71,3 +80,311 @@ class PINSerializer(serializers.ModelSerializer):
         model = models.PIN
         fields = ['id', 'pin_code', 'pin_type', 'is_used', 'used_by']
         read_only_fields = ('id',)
+
+
+class PINFilterSerializer(serializers.Serializer):
+    """Query parameters for filtering pins"""
+    school = serializers.IntegerField(required=False)
+    pin_type = serializers.ChoiceField(
+        choices=models.PIN.PIN_TYPE_CHOICES, required=False
+    )
+    is_used = serializers.BooleanField(required=False, allow_null=True)
+    expired = serializers.BooleanField(required=False, allow_null=True)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+
+
+class PINExportRequestSerializer(PINFilterSerializer):
+    output = serializers.ChoiceField(
+        choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')], default='csv'
+    )
+
+
+class PINRedeemSerializer(serializers.Serializer):
+    """Serializer for redeeming a pin into a new user account"""
+    pin_code = serializers.CharField(max_length=10, write_only=True)
+    email = serializers.EmailField(max_length=32)
+    password = serializers.CharField(
+        min_length=5, write_only=True,
+        style={'input_type': 'password'}
+    )
+
+    def validate_email(self, value):
+        # Accounts provisioned without a password are claimed with the pin
+        # issued to them.
+        if get_user_model().objects.filter(email=value).exclude(
+            password__startswith=UNUSABLE_PASSWORD_PREFIX
+        ).exists():
+            raise serializers.ValidationError(
+                _('A user with this email already exists')
+            )
+        return value
+
+    def create(self, validated_data):
+        """Redeem the pin and return the new user"""
+        try:
+            return redeem_pin(**validated_data)
+        except PINUnavailable:
+            raise serializers.ValidationError(
+                {'pin_code': _('Invalid, used or expired pin')},
+                code='unavailable'
+            )
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'email': _('A user with this email already exists')}
+            )
+
+
+class ProvisionAccountSerializer(serializers.Serializer):
+    email = serializers.EmailField(max_length=32)
+    password = serializers.CharField(
+        min_length=5, required=False, write_only=True,
+        style={'input_type': 'password'}
+    )
+
+
+class ProvisionUsersSerializer(serializers.Serializer):
+    """Users of one role to create in bulk"""
+    role = serializers.ChoiceField(
+        choices=[role for role in ROLE_FLAGS if role != 'admin']
+    )
+    accounts = ProvisionAccountSerializer(
+        many=True, allow_empty=False, max_length=settings.USER_PROVISION_MAX
+    )
+    issue_pins = serializers.BooleanField(
+        default=False,
+        help_text=_('Issue each user a pin that sets their password')
+    )
+
+    def validate(self, attrs):
+        if attrs['issue_pins'] and attrs['role'] not in PIN_ROLE_FLAGS:
+            raise serializers.ValidationError({'issue_pins': _(
+                'Pins can only be issued to teachers and students'
+            )})
+        if not attrs['issue_pins'] and any(
+            'password' not in account for account in attrs['accounts']
+        ):
+            raise serializers.ValidationError({'accounts': _(
+                'Every account needs a password unless pins are issued'
+            )})
+        if (
+            not attrs['issue_pins']
+            and len(attrs['accounts']) > settings.USER_PROVISION_MAX_PASSWORDS
+        ):
+            raise serializers.ValidationError({'accounts': _(
+                'At most %d accounts can be given passwords at once, issue '
+                'pins to provision more'
+            ) % settings.USER_PROVISION_MAX_PASSWORDS})
+        emails = Counter(account['email'] for account in attrs['accounts'])
+        unavailable = {email for email, count in emails.items() if count > 1}
+        unavailable.update(get_user_model().objects.filter(
+            email__in=list(emails)
+        ).values_list('email', flat=True))
+        if unavailable:
+            raise serializers.ValidationError({'accounts': _(
+                'Emails repeated or already in use: %s'
+            ) % ', '.join(sorted(unavailable))})
+        return attrs
+
+
+class ProvisionedUserSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    email = serializers.EmailField()
+    pin_code = serializers.CharField(allow_null=True)
+
+
+class GradebookCategorySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    percentage = serializers.FloatField()
+
+
+class GradebookStudentSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    categories = serializers.DictField(
+        child=serializers.FloatField(allow_null=True),
+        help_text=_('Average in percent per assignment type id')
+    )
+    total = serializers.FloatField(allow_null=True)
+
+
+class GradebookSerializer(serializers.Serializer):
+    """Grades of every student of a lesson"""
+    lesson = serializers.IntegerField()
+    categories = GradebookCategorySerializer(many=True)
+    students = GradebookStudentSerializer(many=True)
+
+
+class RankedStudentSerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    name = serializers.CharField()
+    total = serializers.FloatField()
+    position = serializers.IntegerField(
+        help_text=_('Rank, tied students share the better position')
+    )
+    dense_rank = serializers.IntegerField()
+    percentile = serializers.FloatField(
+        help_text=_('Percentage of the class ranked below')
+    )
+    band = serializers.CharField()
+
+
+class TermRankingSerializer(serializers.Serializer):
+    """Positions of a school's students on their average over a term"""
+    term = serializers.CharField()
+    year = serializers.IntegerField()
+    out_of = serializers.IntegerField()
+    students = RankedStudentSerializer(many=True)
+
+
+class LessonRankingSerializer(TermRankingSerializer):
+    """Positions of the students of a lesson on their total"""
+    lesson = serializers.IntegerField()
+
+
+class TermRankingFilterSerializer(serializers.Serializer):
+    term = serializers.CharField(max_length=20)
+    year = serializers.IntegerField()
+
+
+class PersonSearchFilterSerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=100)
+    type = serializers.ChoiceField(
+        choices=['student', 'teacher'], default='student'
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+
+class PersonSearchResultSerializer(serializers.Serializer):
+    """A student or teacher matching a search, best first"""
+    id = serializers.IntegerField()
+    first_name = serializers.CharField()
+    middle_name = serializers.CharField(allow_blank=True)
+    last_name = serializers.CharField()
+    national_id = serializers.CharField(allow_blank=True)
+    phone_number = serializers.CharField(allow_blank=True)
+    rank = serializers.FloatField()
+
+
+class ScoreBatchSerializer(serializers.Serializer):
+    """Scores of one assignment, as a list or an uploaded CSV file"""
+    scores = serializers.ListField(
+        child=serializers.DictField(), required=False,
+        max_length=settings.SCORE_BATCH_MAX,
+        help_text=_('Rows of {"student": id, "score": value}')
+    )
+    file = serializers.FileField(
+        required=False,
+        help_text=_('CSV file with "student" and "score" columns')
+    )
+
+    def validate(self, attrs):
+        if ('scores' in attrs) == ('file' in attrs):
+            raise serializers.ValidationError(
+                _('Provide either scores or a file')
+            )
+        if 'file' in attrs:
+            try:
+                attrs['scores'] = read_csv(attrs.pop('file'))
+            except (UnicodeDecodeError, csv.Error):
+                raise serializers.ValidationError(
+                    {'file': _('File must be a UTF-8 CSV file')}
+                )
+            if len(attrs['scores']) > settings.SCORE_BATCH_MAX:
+                raise serializers.ValidationError(
+                    {'file': _('File has too many rows')}
+                )
+        return attrs
+
+
+class ScoreBatchResultSerializer(serializers.Serializer):
+    saved = serializers.IntegerField()
+    errors = serializers.ListField(child=serializers.DictField())
+
+
+class AttendanceMarkSerializer(serializers.Serializer):
+    """Attendance of a whole class for one period"""
+    date = serializers.DateField()
+    period = serializers.IntegerField(
+        min_value=1, max_value=settings.ATTENDANCE_PERIODS
+    )
+    absent = serializers.ListField(
+        child=serializers.IntegerField(), default=list,
+        help_text=_('Ids of the students absent, the others are present')
+    )
+
+
+class AttendanceMarkResultSerializer(serializers.Serializer):
+    marked = serializers.IntegerField()
+
+
+class AttendanceFilterSerializer(serializers.Serializer):
+    month = serializers.DateField(
+        input_formats=['%Y-%m'], help_text=_('As YYYY-MM')
+    )
+
+
+class AttendanceCountSerializer(serializers.Serializer):
+    marked = serializers.IntegerField(help_text=_('Periods marked'))
+    present = serializers.IntegerField()
+    rate = serializers.FloatField(
+        allow_null=True, help_text=_('Percentage of periods present')
+    )
+
+
+class StudentAttendanceSerializer(AttendanceCountSerializer):
+    student = serializers.IntegerField()
+    name = serializers.CharField()
+
+
+class DayAttendanceSerializer(AttendanceCountSerializer):
+    date = serializers.DateField()
+
+
+class LessonAttendanceSerializer(AttendanceCountSerializer):
+    """Attendance of a lesson over a month, by student and by day"""
+    lesson = serializers.IntegerField()
+    month = serializers.DateField()
+    students = StudentAttendanceSerializer(many=True)
+    days = DayAttendanceSerializer(many=True)
+
+
+class RosterImportRequestSerializer(serializers.Serializer):
+    """A roster file to import into a school"""
+    kind = serializers.ChoiceField(choices=models.RosterImport.KIND_CHOICES)
+    file = serializers.FileField(help_text=_('CSV or XLSX file'))
+    school = serializers.PrimaryKeyRelatedField(
+        queryset=models.School.objects.all(), required=False,
+        help_text=_("Defaults to the requesting user's school")
+    )
+
+
+class RosterImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.RosterImport
+        fields = [
+            'id', 'school', 'kind', 'file_name', 'rows_done',
+            'rows_imported', 'rows_failed', 'created_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class RosterImportResultSerializer(serializers.Serializer):
+    job = RosterImportSerializer()
+    errors = serializers.ListField(child=serializers.DictField())
+    rows_per_second = serializers.FloatField()
+
+
+class ReportCardJobSerializer(serializers.ModelSerializer):
+    """Report cards of a term, queued for a worker to build"""
+    class Meta:
+        model = models.ReportCardJob
+        fields = [
+            'id', 'term', 'year', 'status', 'students_total',
+            'students_done', 'error', 'created_at', 'started_at',
+            'finished_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'students_total', 'students_done', 'error',
+            'created_at', 'started_at', 'finished_at'
+        ]
@@ -0,0 +1,169 @@
+"""Signal handlers of the core app"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core import authentication, grades, versions
+from core.catalog import catalog
+from core.models import (
+    Assignment,
+    AssignmentType,
+    Enrollment,
+    Lesson,
+    School,
+    Score,
+    Student,
+    Subject,
+    Teacher,
+    User
+)
+
+
+@receiver(pre_save, sender=Score)
+def remember_stored_score(sender, instance, raw=False, **kwargs):
+    """Record the stored values of a score about to be updated"""
+    if raw or instance.pk is None or hasattr(instance, '_loaded_values'):
+        return
+    instance._loaded_values = Score.objects.filter(pk=instance.pk).values(
+        'student_id', 'assignment_id', 'score'
+    ).first()
+
+
+@receiver(post_save, sender=Score)
+def add_score_to_totals(sender, instance, created, raw=False, **kwargs):
+    """Apply the change of a saved score to the grade totals"""
+    if raw:
+        return
+    stored = getattr(instance, '_loaded_values', None)
+    if not created and stored:
+        grades.apply_score_delta(
+            stored['student_id'], stored['assignment_id'],
+            stored['score'], -1
+        )
+    grades.apply_score_delta(
+        instance.student_id, instance.assignment_id, instance.score, 1
+    )
+    instance._loaded_values = {
+        'student_id': instance.student_id,
+        'assignment_id': instance.assignment_id,
+        'score': instance.score,
+    }
+
+
+@receiver(post_delete, sender=Score)
+def remove_score_from_totals(sender, instance, **kwargs):
+    """Remove a deleted score from the grade totals"""
+    stored = getattr(instance, '_loaded_values', None) or {
+        'student_id': instance.student_id,
+        'assignment_id': instance.assignment_id,
+        'score': instance.score,
+    }
+    grades.apply_score_delta(
+        stored['student_id'], stored['assignment_id'], stored['score'], -1
+    )
+
+
+# Fields the grade totals are computed from.
+GRADE_FIELDS = {
+    Assignment: ('max_points', 'assignment_type_id'),
+    AssignmentType: ('percentage',),
+}
+
+
+@receiver(pre_save, sender=Assignment)
+@receiver(pre_save, sender=AssignmentType)
+def remember_grade_fields(sender, instance, raw=False, **kwargs):
+    """Record the stored grade fields of a row about to be updated"""
+    if raw or instance.pk is None or hasattr(instance, '_grade_values'):
+        return
+    instance._grade_values = sender.objects.filter(pk=instance.pk).values(
+        *GRADE_FIELDS[sender]
+    ).first()
+
+
+@receiver(post_save, sender=Assignment)
+@receiver(post_save, sender=AssignmentType)
+def rebuild_lesson_totals(sender, instance, created, raw=False, **kwargs):
+    """Recompute a lesson's totals when points or weights change"""
+    if raw:
+        return
+    stored = getattr(instance, '_grade_values', None)
+    instance._grade_values = {
+        field: getattr(instance, field) for field in GRADE_FIELDS[sender]
+    }
+    if created or stored == instance._grade_values:
+        return
+    if sender is AssignmentType:
+        lesson_ids = [instance.lesson_id]
+    else:
+        # A moved assignment changes the totals of its former lesson too.
+        type_ids = {instance.assignment_type_id}
+        if stored:
+            type_ids.add(stored['assignment_type_id'])
+        lesson_ids = set(AssignmentType.objects.filter(
+            pk__in=type_ids
+        ).values_list('lesson_id', flat=True))
+    grades.rebuild(lesson_ids)
+
+
+# Other processes see the bumped tokens version once the change commits.
+# This process drops its cached tokens then too: dropped earlier, a
+# concurrent request could cache the old row again before it does.
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token from the cache"""
+    versions.bump_tokens()
+    transaction.on_commit(
+        partial(authentication.invalidate_token, instance.key)
+    )
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_user_tokens(sender, instance, created=False, **kwargs):
+    """Reload a user's tokens after the user changes or is deleted"""
+    if created:
+        return
+    versions.bump_tokens()
+    transaction.on_commit(
+        partial(authentication.invalidate_user, instance.pk)
+    )
+
+
+@receiver([post_save, post_delete], sender=School)
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=AssignmentType)
+@receiver([post_save, post_delete], sender=Assignment)
+@receiver([post_save, post_delete], sender=Score)
+@receiver([post_save, post_delete], sender=Enrollment)
+@receiver([post_save, post_delete], sender=Student)
+@receiver([post_save, post_delete], sender=Teacher)
+def bump_school_version(sender, instance, **kwargs):
+    """Invalidate cached responses of the school whose data changed"""
+    if sender is School:
+        school_id = instance.pk
+    elif sender in (AssignmentType, Enrollment):
+        school_id = Lesson.objects.filter(
+            pk=instance.lesson_id
+        ).values_list('school_id', flat=True).first()
+        if school_id is None:
+            # The lesson is being deleted and bumps the version itself.
+            return
+    else:
+        school_id = instance.school_id
+    versions.bump(school_id)
+
+
+@receiver([post_save, post_delete], sender=Subject)
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=AssignmentType)
+def refresh_catalog(sender, instance, raw=False, **kwargs):
+    """Reload the catalog in every process once the change commits"""
+    versions.bump_catalog()
+    transaction.on_commit(catalog.invalidate)
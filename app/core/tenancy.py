@@ -0,0 +1,120 @@
+"""
+School (tenant) scoping.
+
+``TenantMiddleware`` makes the requesting user's school the current
+school while a request is served. The ``scoped`` manager of school owned
+models filters by it, so views that read through ``Model.scoped`` never
+see, or scan, another school's rows. Anonymous users and users without a
+school see no rows at all; only superusers without a school see every
+school's. Code running outside a request is not scoped. Use
+``scoped_to`` to scope it, e.g. in commands, and ``unscoped`` to lift
+the scope explicitly.
+
+The user is looked up when a query is built rather than when the request
+starts, as DRF authenticates in the view.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import models
+
+_current_school = ContextVar('current_school', default=None)
+
+# Scope of queries that may read every school's rows.
+UNSCOPED = object()
+
+
+def _scope():
+    """Return the current school id, UNSCOPED, or None for no school"""
+    resolve = _current_school.get()
+    return resolve() if resolve is not None else UNSCOPED
+
+
+def current_school_id():
+    """Return the id of the school queries are scoped to, or None"""
+    scope = _scope()
+    return None if scope is UNSCOPED else scope
+
+
+@contextmanager
+def scoped_to(school):
+    """Scope queries in the block to ``school`` (an instance or id)"""
+    school_id = getattr(school, 'pk', school)
+    token = _current_school.set(lambda: school_id)
+    try:
+        yield
+    finally:
+        _current_school.reset(token)
+
+
+@contextmanager
+def unscoped():
+    """Let queries in the block read every school's rows"""
+    token = _current_school.set(lambda: UNSCOPED)
+    try:
+        yield
+    finally:
+        _current_school.reset(token)
+
+
+def _request_scope(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return None
+    if user.school_id is None and user.is_superuser:
+        return UNSCOPED
+    return user.school_id
+
+
+class SchoolScopedManager(models.Manager):
+    """Manager filtering rows to the current school.
+
+    With ``include_shared`` rows without a school, shared by all schools,
+    are included too.
+    """
+
+    def __init__(self, include_shared=False):
+        super().__init__()
+        self.include_shared = include_shared
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        school_id = _scope()
+        if school_id is UNSCOPED:
+            return queryset
+        if school_id is None:
+            return queryset.none()
+        if self.include_shared:
+            return queryset.filter(
+                models.Q(school_id=school_id) | models.Q(school__isnull=True)
+            )
+        return queryset.filter(school_id=school_id)
+
+
+class TenantMiddleware:
+    """Scope queries of a request to the school of its user"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _current_school.set(lambda: _request_scope(request))
+        try:
+            return self.get_response(request)
+        finally:
+            _current_school.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_school.set(lambda: _request_scope(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_school.reset(token)
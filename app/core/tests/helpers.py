@@ -0,0 +1,74 @@
+"""Helpers creating sample data for tests"""
+from datetime import date
+
+from core import models
+
+
+def create_school(name='Tanga High', **params):
+    """Create and return a school"""
+    defaults = {
+        'address': 'Box 1',
+        'email': 'info@school.com',
+        'phone': '0200000000',
+    }
+    defaults.update(params)
+    return models.School.objects.create(name=name, **defaults)
+
+
+def person_fields(index=0, **params):
+    """Return the fields of a person"""
+    fields = {
+        'first_name': f'First{index}',
+        'last_name': f'Last{index}',
+        'gender': 'f',
+        'date_of_birth': date(2010, 1, 1),
+        'nationality': 'Ghanaian',
+    }
+    fields.update(params)
+    return fields
+
+
+def create_student(school, index=0, **params):
+    """Create and return a student"""
+    return models.Student.objects.create(
+        school=school, grade_level='JHS 1', **person_fields(index, **params)
+    )
+
+
+def create_teacher(school, index=0, **params):
+    """Create and return a teacher"""
+    return models.Teacher.objects.create(
+        school=school, **person_fields(index, **params)
+    )
+
+
+def create_lesson(name='Mathematics', school=None, **params):
+    """Create and return a lesson of a new subject"""
+    subject = models.Subject.objects.create(
+        school=school, name=name, subject_type='core',
+        subect_code=name[:4].upper()
+    )
+    defaults = {'description': name, 'term': 'First', 'year': 2024}
+    defaults.update(params)
+    return models.Lesson.objects.create(subject=subject, **defaults)
+
+
+def create_assignments(lesson, categories):
+    """Create assignment types and their assignments.
+
+    ``categories`` maps a name to ``(percentage, [max_points, ...])``.
+    Returns the assignments of each category by name.
+    """
+    assignments = {}
+    for name, (percentage, max_points) in categories.items():
+        assignment_type = models.AssignmentType.objects.create(
+            lesson=lesson, name=name, percentage=percentage
+        )
+        assignments[name] = [
+            models.Assignment.objects.create(
+                assignment_type=assignment_type,
+                name=f'{name} {index + 1}', max_points=points
+            )
+            for index, points in enumerate(max_points)
+        ]
+    return assignments
@@ -0,0 +1,66 @@
+"""Test for pin code allocators"""
+from django.test import TestCase
+
+from core import models
+from core.allocators import FeistelPINAllocator
+from core.utils import generate_pins
+
+
+class FeistelPINAllocatorTests(TestCase):
+    """Test the keyed permutation allocator"""
+
+    def test_permute_is_collision_free(self):
+        """Test distinct sequence numbers give distinct codes"""
+        allocator = FeistelPINAllocator(key='test')
+        numbers = list(range(5000)) + list(range(2 ** 40 - 5000, 2 ** 40))
+
+        codes = {allocator.permute(number) for number in numbers}
+
+        self.assertEqual(len(codes), len(numbers))
+        self.assertTrue(all(0 <= code < 2 ** 40 for code in codes))
+
+    def test_permute_depends_on_key(self):
+        """Test the same number maps to different codes under another key"""
+        first = FeistelPINAllocator(key='first')
+        second = FeistelPINAllocator(key='second')
+
+        self.assertNotEqual(
+            [first.permute(n) for n in range(10)],
+            [second.permute(n) for n in range(10)]
+        )
+
+    def test_allocate_reserves_consecutive_blocks(self):
+        """Test each allocation continues from the reserved sequence"""
+        allocator = FeistelPINAllocator(key='test')
+
+        first = allocator.allocate(3)
+        second = allocator.allocate(2)
+
+        self.assertEqual(
+            first + second, [f'{allocator.permute(n):010X}' for n in range(5)]
+        )
+        sequence = models.PINSequence.objects.get(name='pin')
+        self.assertEqual(sequence.next_value, 5)
+
+    def test_allocate_does_not_read_pins(self):
+        """Test allocation only touches the sequence row"""
+        allocator = FeistelPINAllocator(key='test')
+        allocator.allocate(1)
+
+        with self.assertNumQueries(4):
+            codes = allocator.allocate(1000)
+
+        self.assertEqual(len(set(codes)), 1000)
+
+    def test_existing_code_is_replaced(self):
+        """Test a code stored by an earlier generator is skipped"""
+        allocator = FeistelPINAllocator()
+        taken = f'{allocator.permute(0):010X}'
+        models.PIN.objects.create(pin_code=taken, pin_type='teacher')
+
+        pins, _ = generate_pins('teacher', 3)
+
+        codes = {pin.pin_code for pin in pins}
+        self.assertEqual(len(codes), 3)
+        self.assertNotIn(taken, codes)
+        self.assertEqual(models.PIN.objects.count(), 4)
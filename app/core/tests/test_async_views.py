@@ -0,0 +1,146 @@
+"""Tests for the async views"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import models
+from core.authentication import token_cache
+from core.tests import helpers
+from core.utils import generate_pins
+
+ME_URL = reverse('core:async-me')
+PINS_URL = reverse('core:async-pins')
+
+
+def gradebook_url(lesson_id):
+    return reverse('core:async-lesson-gradebook', args=[lesson_id])
+
+
+class AsyncViewTests(TestCase):
+    """Test the async read endpoints"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.school = helpers.create_school()
+        other_school = helpers.create_school(
+            'Other High', email='info@other.com'
+        )
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@eg.com', 'test@pass123'
+        )
+        self.admin.school = self.school
+        self.admin.save()
+        self.token = Token.objects.create(user=self.admin)
+        self.headers = {'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+        generate_pins('student', 5, school=self.school)
+        generate_pins('student', 3, school=other_school)
+
+    def test_me(self):
+        """Test the async view returns the authenticated user"""
+        res = self.client.get(ME_URL, **self.headers)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {'email': 'admin@eg.com'})
+
+    def test_me_requires_token(self):
+        """Test requests without a valid token are rejected"""
+        for headers in [{}, {'HTTP_AUTHORIZATION': 'Token invalid'}]:
+            res = self.client.get(ME_URL, **headers)
+
+            self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    def test_me_inactive_user(self):
+        """Test tokens of inactive users are rejected"""
+        self.admin.is_active = False
+        self.admin.save()
+
+        res = self.client.get(ME_URL, **self.headers)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_pin_list_matches_sync_view(self):
+        """Test the async pin list returns the pages of the DRF view"""
+        sync_client = APIClient()
+        sync_client.force_authenticate(user=self.admin)
+        params = {'page_size': 2, 'pin_type': 'student'}
+
+        res = self.client.get(PINS_URL, params, **self.headers)
+        expected = sync_client.get(reverse('core:pins'), params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['results'], expected.json()['results'])
+        self.assertEqual(len(res.json()['results']), 2)
+        self.assertIsNotNone(res.json()['next'])
+
+    def test_pin_list_cursor_pagination(self):
+        """Test walking the async pages returns the school's pins once"""
+        codes = []
+        url = PINS_URL + '?page_size=2'
+        while url:
+            res = self.client.get(url, **self.headers)
+            codes += [pin['pin_code'] for pin in res.json()['results']]
+            url = res.json()['next']
+
+        expected = models.PIN.objects.filter(
+            school=self.school
+        ).order_by('-created_at', '-id').values_list('pin_code', flat=True)
+        self.assertEqual(codes, list(expected))
+
+    def test_pin_list_errors(self):
+        """Test invalid filters and cursors are rejected"""
+        res = self.client.get(PINS_URL, {'pin_type': 'x'}, **self.headers)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pin_type', res.json())
+
+        res = self.client.get(PINS_URL, {'cursor': 'bad'}, **self.headers)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_pin_list_requires_admin(self):
+        """Test users who are not staff cannot list pins"""
+        user = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123', is_teacher=True
+        )
+        token = Token.objects.create(user=user)
+
+        res = self.client.get(
+            PINS_URL, HTTP_AUTHORIZATION=f'Token {token.key}'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_gradebook(self):
+        """Test the async gradebook matches the DRF view"""
+        lesson = helpers.create_lesson(school=self.school)
+        helpers.create_assignments(lesson, {'Exam': (100, [50])})
+        student = helpers.create_student(self.school)
+        models.Enrollment.objects.create(student=student, lesson=lesson)
+        sync_client = APIClient()
+        sync_client.force_authenticate(user=self.admin)
+
+        res = self.client.get(gradebook_url(lesson.pk), **self.headers)
+        expected = sync_client.get(
+            reverse('core:lesson-gradebook', args=[lesson.pk])
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), expected.json())
+
+    def test_gradebook_missing_lesson(self):
+        """Test an unknown lesson returns 404"""
+        res = self.client.get(gradebook_url(0), **self.headers)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_request_metrics(self):
+        """Test queries of requests served in async mode are recorded"""
+        res = await self.async_client.get(
+            ME_URL, headers={'Authorization': f'Token {self.token.key}'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # The tokens version and the token.
+        self.assertIn('desc="2 queries"', res['Server-Timing'])
@@ -0,0 +1,179 @@
+"""Tests for attendance"""
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models
+from core.attendance import (
+    AttendanceError,
+    lesson_attendance,
+    mark_class,
+    month_bytes
+)
+from core.tests import helpers
+
+
+def attendance_url(lesson_id):
+    return reverse('core:lesson-attendance', args=[lesson_id])
+
+
+class AttendanceTests(TestCase):
+    """Test marking classes and reporting their attendance"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+        self.lesson = helpers.create_lesson(school=self.school)
+        self.students = [
+            helpers.create_student(self.school, index) for index in range(3)
+        ]
+        for student in self.students:
+            models.Enrollment.objects.create(
+                student=student, lesson=self.lesson
+            )
+
+    def test_mark_class(self):
+        """Test one row a month holds every period of each student"""
+        first, second, third = self.students
+
+        marked = mark_class(self.lesson, date(2024, 9, 2), 1, [second.pk])
+        mark_class(self.lesson, date(2024, 9, 2), 2)
+        mark_class(self.lesson, date(2024, 9, 3), 1, [second.pk, third.pk])
+        mark_class(self.lesson, date(2024, 10, 1), 1)
+
+        self.assertEqual(marked, 3)
+        rows = models.Attendance.objects.filter(month=date(2024, 9, 1))
+        self.assertEqual(rows.count(), 3)
+        row = rows.get(enrollment__student=second)
+        self.assertEqual(row.school, self.school)
+        self.assertEqual(len(row.marked), month_bytes())
+        # Day 2 is bits 8 and 9, day 3 bit 16 with 8 periods a day, bits
+        # counted from the right of each byte.
+        self.assertEqual(bytes(row.marked[1:3]), b'\x03\x01')
+        self.assertEqual(bytes(row.present[1:3]), b'\x02\x00')
+
+    def test_mark_again(self):
+        """Test marking a period again replaces its attendance"""
+        second = self.students[1]
+        mark_class(self.lesson, date(2024, 9, 2), 1, [second.pk])
+
+        mark_class(self.lesson, date(2024, 9, 2), 1)
+
+        report = lesson_attendance(self.lesson, date(2024, 9, 1))
+        self.assertEqual((report['marked'], report['present']), (3, 3))
+
+    def test_not_enrolled(self):
+        """Test absent students must be enrolled in the lesson"""
+        other = helpers.create_student(self.school, 9)
+
+        with self.assertRaises(AttendanceError):
+            mark_class(self.lesson, date(2024, 9, 2), 1, [other.pk])
+        with self.assertRaises(AttendanceError):
+            mark_class(self.lesson, date(2024, 9, 2), 9)
+        self.assertFalse(models.Attendance.objects.exists())
+
+    def test_lesson_attendance(self):
+        """Test the rates of each student, day and the class"""
+        first, second, third = self.students
+        mark_class(self.lesson, date(2024, 9, 2), 1, [second.pk])
+        mark_class(self.lesson, date(2024, 9, 2), 2)
+        mark_class(self.lesson, date(2024, 9, 30), 1, [second.pk, third.pk])
+        mark_class(self.lesson, date(2024, 10, 1), 1, [first.pk])
+
+        report = lesson_attendance(self.lesson, date(2024, 9, 15))
+
+        self.assertEqual(report['month'], date(2024, 9, 1))
+        self.assertEqual((report['marked'], report['present']), (9, 6))
+        self.assertEqual(report['rate'], 66.7)
+        self.assertEqual(
+            [(row['student'], row['present'], row['rate'])
+             for row in report['students']],
+            [(first.pk, 3, 100.0), (second.pk, 1, 33.3),
+             (third.pk, 2, 66.7)]
+        )
+        self.assertEqual(
+            [(row['date'], row['marked'], row['present'])
+             for row in report['days']],
+            [(date(2024, 9, 2), 6, 5), (date(2024, 9, 30), 3, 1)]
+        )
+
+    @override_settings(ATTENDANCE_PERIODS=3)
+    def test_periods_setting(self):
+        """Test bitmaps are sized by the number of periods a day"""
+        mark_class(self.lesson, date(2024, 9, 1), 3)
+
+        row = models.Attendance.objects.first()
+        self.assertEqual(len(row.marked), 12)
+        self.assertEqual(
+            lesson_attendance(self.lesson, date(2024, 9, 1))['present'], 3
+        )
+
+    def test_no_attendance(self):
+        """Test months without attendance have no rates"""
+        report = lesson_attendance(self.lesson, date(2024, 9, 1))
+
+        self.assertIsNone(report['rate'])
+        self.assertEqual(report['students'], [])
+
+
+class AttendanceAPITests(TestCase):
+    """Test the attendance endpoint"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+        self.lesson = helpers.create_lesson(school=self.school)
+        self.student = helpers.create_student(self.school)
+        models.Enrollment.objects.create(
+            student=self.student, lesson=self.lesson
+        )
+        self.teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123',
+            is_teacher=True, school=self.school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+
+    def test_mark_and_report(self):
+        """Test teachers mark a class and read its monthly attendance"""
+        url = attendance_url(self.lesson.pk)
+        res = self.client.post(
+            url, {'date': '2024-09-02', 'period': 1, 'absent': []},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['marked'], 1)
+
+        res = self.client.get(url, {'month': '2024-09'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['rate'], 100.0)
+        self.assertEqual(res.data['days'][0]['date'], '2024-09-02')
+
+    def test_invalid(self):
+        """Test unenrolled students and bad months are rejected"""
+        other = helpers.create_student(self.school, 1)
+        url = attendance_url(self.lesson.pk)
+
+        res = self.client.post(
+            url, {'date': '2024-09-02', 'period': 1, 'absent': [other.pk]},
+            format='json'
+        )
+        bad_month = self.client.get(url, {'month': '2024-09-02'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(bad_month.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_school_lesson_not_found(self):
+        """Test lessons of other schools cannot be marked"""
+        other = helpers.create_school('Other High', email='info@other.com')
+        lesson = helpers.create_lesson('Science', school=other)
+
+        res = self.client.post(
+            attendance_url(lesson.pk), {'date': '2024-09-02', 'period': 1},
+            format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,190 @@
+"""Test for cached token authentication"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import versions
+from core.authentication import TokenCache, token_cache
+
+ME_URL = reverse('core:me')
+PINS_URL = reverse('core:pins')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test token lookups are cached and invalidated"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@eg.com', password='test@pass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    @patch.object(token_cache, 'check_interval', 60)
+    def test_token_lookup_is_cached(self):
+        """Test only the first request looks the token up"""
+        # The tokens version, then the token.
+        with self.assertNumQueries(2):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops authenticating"""
+        self.client.get(ME_URL)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test a deactivated user stops authenticating"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalidated_on_commit(self):
+        """Test cached tokens are kept until the change commits"""
+        self.client.get(ME_URL)
+        key = self.token.key
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.token.delete()
+        self.assertEqual(token_cache.get(key).key, key)
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(token_cache.get(key))
+
+    def test_cached_inactive_user_rejected(self):
+        """Test a cached token of an inactive user does not authenticate"""
+        self.client.get(ME_URL)
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False
+        )
+        token_cache.get(self.token.key).user.is_active = False
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_role_change_applies(self):
+        """Test changed role flags are used by the next request"""
+        res = self.client.get(PINS_URL)
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        res = self.client.get(PINS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    @override_settings(TOKEN_AUTH_CACHE={
+        'MAX_SIZE': 10, 'TTL': 60, 'SHARED_CACHE': 'default',
+        'SHARED_TTL': 60,
+    })
+    def test_shared_cache(self):
+        """Test a token cached by another worker needs no lookup"""
+        cache.clear()
+        self.client.get(ME_URL)
+        token_cache.clear()
+
+        # Only the tokens version is read.
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.token.delete()
+        token_cache.clear()
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenCacheTests(TestCase):
+    """Test the token LRU"""
+
+    def _token(self, key, user_id):
+        return Token(key=key, user_id=user_id)
+
+    def test_least_recently_used_evicted(self):
+        """Test the cache keeps at most max_size entries"""
+        tokens = TokenCache(max_size=2, ttl=60)
+        tokens.set('a', self._token('a', 1))
+        tokens.set('b', self._token('b', 2))
+        tokens.get('a')
+        tokens.set('c', self._token('c', 3))
+
+        self.assertIsNotNone(tokens.get('a'))
+        self.assertIsNone(tokens.get('b'))
+        self.assertIsNotNone(tokens.get('c'))
+
+    def test_entries_expire(self):
+        """Test entries are not returned after their TTL"""
+        tokens = TokenCache(max_size=2, ttl=60)
+        with patch('core.authentication.time.monotonic', return_value=0):
+            tokens.set('a', self._token('a', 1))
+
+        with patch('core.authentication.time.monotonic', return_value=61):
+            self.assertIsNone(tokens.get('a'))
+
+    def test_changes_reach_other_processes(self):
+        """Test a process drops its tokens once another changes a user"""
+        user = get_user_model().objects.create_user(
+            email='user@eg.com', password='test@pass123'
+        )
+        token = Token.objects.create(user=user)
+        workers = [TokenCache(max_size=2, ttl=60) for _ in range(2)]
+        for worker in workers:
+            worker.set(token.key, token, worker.check())
+
+        user.is_active = False
+        user.save()
+
+        self.assertIsNotNone(workers[1].get(token.key))
+        workers[1].check()
+        self.assertIsNone(workers[1].get(token.key))
+
+    def test_token_read_before_change_not_cached(self):
+        """Test a token read under an older version is not cached"""
+        token = self._token('a', 1)
+        tokens = TokenCache(max_size=2, ttl=60)
+        stamp = tokens.check()
+        versions.bump_tokens()
+        tokens.check()
+
+        tokens.set('a', token, stamp)
+
+        self.assertIsNone(tokens.get('a'))
+
+    def test_version_checked_every_interval(self):
+        """Test the version is read at most every check_interval"""
+        tokens = TokenCache(max_size=2, ttl=60, check_interval=5)
+        with patch('core.authentication.time.monotonic', return_value=0):
+            tokens.check()
+        with patch('core.authentication.time.monotonic', return_value=4), \
+                self.assertNumQueries(0):
+            tokens.check()
+        with patch('core.authentication.time.monotonic', return_value=5), \
+                self.assertNumQueries(1):
+            tokens.check()
@@ -0,0 +1,109 @@
+"""Tests for the catalog cache"""
+from django.test import TestCase
+
+from core import models, versions
+from core.catalog import Catalog, catalog
+from core.tests import helpers
+
+
+class CatalogTests(TestCase):
+    """Test names are resolved from the in-process catalog"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+        self.lesson = helpers.create_lesson(school=self.school)
+        self.assignment = helpers.create_assignments(
+            self.lesson, {'Exam': (100, [50])}
+        )['Exam'][0]
+        self.student = helpers.create_student(self.school)
+        catalog.invalidate()
+
+    def test_str_without_queries(self):
+        """Test lessons, assignments and enrollments print from the
+        catalog once it is loaded"""
+        enrollment = models.Enrollment.objects.create(
+            student=self.student, lesson=self.lesson
+        )
+        catalog.lesson(self.lesson.pk)
+        lesson = models.Lesson.objects.get()
+        assignment = models.Assignment.objects.get()
+        enrollment = models.Enrollment.objects.select_related(
+            'student'
+        ).get()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(str(lesson), 'Mathematics - (First 2024)')
+            self.assertEqual(str(assignment), 'Exam 1 (Exam)')
+            self.assertEqual(
+                str(enrollment),
+                'First0  Last0 enrolled in Mathematics - (First 2024)'
+            )
+
+    def test_reloaded_after_commit(self):
+        """Test a change drops the catalog once it commits"""
+        catalog.subject(self.lesson.subject_id)
+        subject = self.lesson.subject
+        subject.name = 'Maths'
+
+        with self.captureOnCommitCallbacks(execute=True):
+            subject.save()
+
+        self.assertEqual(catalog.subject(subject.pk).name, 'Maths')
+        self.assertEqual(
+            str(models.Lesson.objects.get()), 'Maths - (First 2024)'
+        )
+
+    def test_other_process_changes(self):
+        """Test a catalog reloads when the version stamp moves"""
+        local = Catalog(max_bytes=2**20, check_interval=0)
+        self.assertEqual(
+            local.subject(self.lesson.subject_id).name, 'Mathematics'
+        )
+
+        models.Subject.objects.filter(pk=self.lesson.subject_id).update(
+            name='Maths'
+        )
+        versions.bump_catalog()
+
+        self.assertEqual(local.subject(self.lesson.subject_id).name, 'Maths')
+        self.assertEqual(local.stats()['loads'], 2)
+
+    def test_subject_by_code(self):
+        """Test codes resolve to the school's subject, then shared ones"""
+        shared = models.Subject.objects.create(
+            name='French', subject_type='core', subect_code='FREN'
+        )
+
+        self.assertEqual(
+            catalog.subject_by_code(self.school.pk, 'MATH').id,
+            self.lesson.subject_id
+        )
+        self.assertEqual(
+            catalog.subject_by_code(self.school.pk, 'FREN').id, shared.pk
+        )
+        self.assertIsNone(catalog.subject_by_code(self.school.pk, 'NONE'))
+
+    def test_memory_budget(self):
+        """Test a catalog over its budget misses and names use the
+        database"""
+        local = Catalog(max_bytes=100, check_interval=60)
+
+        with self.assertLogs('core.catalog', 'WARNING'):
+            self.assertIsNone(local.lesson(self.lesson.pk))
+        self.assertIsNone(local.lesson(self.lesson.pk))
+
+        stats = local.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (0, 2))
+        self.assertEqual(stats['entries'], 0)
+        self.assertGreater(stats['bytes'], 100)
+        self.assertEqual(stats['loads'], 1)
+
+    def test_hit_rate(self):
+        """Test lookups count towards the hit rate"""
+        local = Catalog(max_bytes=2**20, check_interval=60)
+
+        local.lesson(self.lesson.pk)
+        local.assignment_type(self.assignment.assignment_type_id)
+        local.lesson(0)
+
+        self.assertAlmostEqual(local.stats()['hit_rate'], 2 / 3)
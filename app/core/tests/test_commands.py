@@ -1,11 +1,16 @@
 """Test custom Django managements"""
 
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Pyscopg2Error
-from django.core.management import call_command
+from django.core.management import CommandError, call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core import models
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -30,3 +35,73 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """Test the wait between attempts doubles up to the maximum"""
+        patched_check.side_effect = [OperationalError] * 5 + [True]
+
+        call_command('wait_for_db', '--max-delay', '3', stdout=StringIO())
+
+        self.assertEqual(
+            [call.args[0] for call in patched_sleep.call_args_list],
+            [0.5, 1, 2, 3, 3]
+        )
+
+    @patch('time.monotonic')
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_monotonic,
+                                 patched_check):
+        """Test waiting gives up once the timeout has passed"""
+        patched_check.side_effect = OperationalError
+        patched_monotonic.side_effect = [0, 0, 0.5, 1.5, 3.5]
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', '--timeout', '5', stdout=StringIO())
+
+        self.assertEqual(patched_sleep.call_count, 3)
+
+
+class ExpirePinsCommandTests(TestCase):
+    """Test the expire_pins command"""
+
+    def setUp(self):
+        now = timezone.now()
+        self.valid = models.PIN.objects.create(
+            pin_code='VALID00001', pin_type='student'
+        )
+        self.used = models.PIN.objects.create(
+            pin_code='USED000001', pin_type='student', is_used=True,
+            expire=now - timedelta(days=1)
+        )
+        self.stale = [
+            models.PIN.objects.create(
+                pin_code=f'STALE0000{index}', pin_type='teacher',
+                expire=now - timedelta(days=index * 2 + 1)
+            )
+            for index in range(5)
+        ]
+
+    def test_expire_pins_in_batches(self):
+        """Test stale pins are marked expired, others are untouched"""
+        out = StringIO()
+        call_command('expire_pins', batch_size=2, stdout=out)
+
+        self.assertIn('Marked 5 pins expired', out.getvalue())
+        self.assertEqual(
+            set(models.PIN.objects.filter(is_expired=True)),
+            set(self.stale)
+        )
+        self.assertEqual(models.PIN.objects.available().get(), self.valid)
+
+    def test_purge_old_expired_pins(self):
+        """Test unused pins expired beyond the cutoff are deleted"""
+        call_command(
+            'expire_pins', purge_after_days=4, stdout=StringIO()
+        )
+
+        self.assertEqual(
+            models.PIN.objects.filter(pin_code__startswith='STALE').count(),
+            2
+        )
+        self.assertTrue(models.PIN.objects.filter(pk=self.used.pk).exists())
@@ -0,0 +1,145 @@
+"""Test for the gradebook"""
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import models
+from core.gradebook import GradebookError, compute, compute_gradebook
+from core.tests import helpers
+
+
+def gradebook_url(lesson_id):
+    return reverse('core:lesson-gradebook', args=[lesson_id])
+
+
+class ComputeTests(SimpleTestCase):
+    """Test the gradebook arithmetic"""
+
+    def setUp(self):
+        nan = np.nan
+        # Tests: 10 and 20 points, worth 60%. Exam: 50 points, worth 40%.
+        self.scores = np.array([
+            [10, 10, 25],
+            [5, nan, nan],
+            [nan, nan, nan],
+        ])
+        self.max_points = np.array([10., 20., 50.])
+        self.categories = np.array([0, 0, 1])
+        self.weights = np.array([60., 40.])
+
+    def test_compute_excluding_missing_scores(self):
+        """Test averages only count scored assignments"""
+        averages, totals = compute(
+            self.scores, self.max_points, self.categories, self.weights
+        )
+
+        np.testing.assert_allclose(
+            averages[:2], [[200 / 3, 50], [50, np.nan]]
+        )
+        np.testing.assert_allclose(totals, [60, 50, np.nan])
+
+    def test_compute_missing_scores_as_zero(self):
+        """Test missing scores can count as zero"""
+        averages, totals = compute(
+            self.scores, self.max_points, self.categories, self.weights,
+            missing='zero'
+        )
+
+        np.testing.assert_allclose(averages[1], [50 / 3, 0])
+        np.testing.assert_allclose(totals, [60, 10, 0])
+
+    def test_weights_must_sum_to_100(self):
+        """Test category percentages not summing to 100 are rejected"""
+        with self.assertRaises(GradebookError):
+            compute(
+                self.scores, self.max_points, self.categories,
+                np.array([60., 30.])
+            )
+
+
+class GradebookTests(TestCase):
+    """Test computing the gradebook of a lesson"""
+
+    def setUp(self):
+        school = helpers.create_school()
+        self.lesson = helpers.create_lesson(school=school)
+        self.assignments = helpers.create_assignments(self.lesson, {
+            'Tests': (60, [10, 20]),
+            'Exam': (40, [50]),
+        })
+        self.students = [
+            helpers.create_student(school, index) for index in range(3)
+        ]
+        for student in self.students:
+            models.Enrollment.objects.create(
+                student=student, lesson=self.lesson
+            )
+        tests, exam = self.assignments['Tests'], self.assignments['Exam']
+        for student, assignment, score in [
+            (self.students[0], tests[0], 10),
+            (self.students[0], tests[1], 10),
+            (self.students[0], exam[0], 25),
+            (self.students[1], tests[0], 5),
+        ]:
+            models.Score.objects.create(
+                student=student, assignment=assignment, score=score
+            )
+        self.teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123', is_teacher=True,
+            school=school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+
+    def test_compute_gradebook_query_count(self):
+        """Test the gradebook is loaded with a fixed number of queries"""
+        with self.assertNumQueries(4):
+            gradebook = compute_gradebook(self.lesson)
+
+        self.assertEqual(
+            gradebook.student_ids.tolist(),
+            [student.pk for student in self.students]
+        )
+        totals = {row['student']: row['total'] for row in gradebook.rows()}
+        self.assertEqual(totals, {
+            self.students[0].pk: 60.0,
+            self.students[1].pk: 50.0,
+            self.students[2].pk: None,
+        })
+
+    def test_retrieve_gradebook(self):
+        """Test a teacher can retrieve a lesson's gradebook"""
+        res = self.client.get(gradebook_url(self.lesson.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [category['name'] for category in res.data['categories']],
+            ['Tests', 'Exam']
+        )
+        self.assertEqual(len(res.data['students']), 3)
+        self.assertEqual(res.data['students'][0]['total'], 60.0)
+
+    def test_retrieve_gradebook_invalid_weights(self):
+        """Test a lesson whose percentages do not sum to 100 fails"""
+        models.AssignmentType.objects.filter(name='Exam').update(
+            percentage=30
+        )
+
+        res = self.client.get(gradebook_url(self.lesson.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_retrieve_gradebook_requires_teacher(self):
+        """Test users who are not teachers cannot see the gradebook"""
+        user = get_user_model().objects.create_user(
+            email='student@eg.com', password='test@pass123', is_student=True
+        )
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(gradebook_url(self.lesson.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
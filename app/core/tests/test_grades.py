@@ -0,0 +1,146 @@
+"""Test for materialised grade totals"""
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core import grades, models
+from core.tests import helpers
+
+
+class GradeTotalsTests(TestCase):
+    """Test grade totals follow score writes"""
+
+    def setUp(self):
+        school = self.school = helpers.create_school()
+        self.lesson = helpers.create_lesson(school=school)
+        assignments = helpers.create_assignments(self.lesson, {
+            'Tests': (60, [10, 20]),
+            'Exam': (40, [50]),
+        })
+        self.test1, self.test2 = assignments['Tests']
+        self.exam = assignments['Exam'][0]
+        self.student = helpers.create_student(school)
+
+    def _total(self):
+        return models.LessonGrade.objects.get(
+            student=self.student, lesson=self.lesson
+        ).total
+
+    def _score(self, assignment, score):
+        return models.Score.objects.create(
+            student=self.student, assignment=assignment, score=score
+        )
+
+    def test_scores_update_totals(self):
+        """Test creating scores updates category points and the total"""
+        self._score(self.test1, 10)
+        self._score(self.test2, 10)
+        self._score(self.exam, 25)
+
+        category = models.CategoryGrade.objects.get(
+            student=self.student, assignment_type=self.test1.assignment_type
+        )
+        self.assertEqual(category.points_earned, Decimal('20'))
+        self.assertEqual(category.points_possible, 30)
+        self.assertEqual(category.scored_count, 2)
+        self.assertAlmostEqual(self._total(), 60)
+        self.assertEqual(grades.check(self.lesson), [])
+
+    def test_updating_score_applies_delta(self):
+        """Test changing a score replaces its old value"""
+        self._score(self.test1, 10)
+        score = models.Score.objects.get()
+        score.score = 5
+        score.save()
+
+        self.assertAlmostEqual(self._total(), 50)
+        score.assignment = self.exam
+        score.save()
+
+        self.assertAlmostEqual(self._total(), 10)
+        self.assertEqual(grades.check(self.lesson), [])
+
+    def test_deleting_score_removes_it(self):
+        """Test deleting a score removes it from the totals"""
+        self._score(self.test1, 10)
+        self._score(self.exam, 0).delete()
+
+        self.assertAlmostEqual(self._total(), 100)
+        self.assertEqual(grades.check(self.lesson), [])
+
+    def test_changing_weights_rebuilds_totals(self):
+        """Test changing a percentage recomputes the lesson totals"""
+        self._score(self.test1, 10)
+        self._score(self.exam, 0)
+        tests = self.test1.assignment_type
+        tests.percentage = 80
+        tests.save()
+        exam = self.exam.assignment_type
+        exam.percentage = 20
+        exam.save()
+
+        self.assertAlmostEqual(self._total(), 80)
+
+    def test_other_changes_keep_totals(self):
+        """Test only changes to points or weights rebuild the totals"""
+        self._score(self.test1, 10)
+        tests = self.test1.assignment_type
+
+        with patch.object(grades, 'rebuild') as rebuild:
+            tests.name = 'Quizzes'
+            tests.save()
+            self.test1.name = 'Quiz 1'
+            self.test1.save()
+            tests.percentage = 60.0
+            tests.save()
+        self.assertEqual(rebuild.call_count, 0)
+
+        self.assertAlmostEqual(self._total(), 100)
+        self.test1.max_points = 20
+        self.test1.save()
+        self.assertAlmostEqual(self._total(), 50)
+
+    def test_moving_assignment_rebuilds_both_lessons(self):
+        """Test moving an assignment to another lesson updates both"""
+        self._score(self.test1, 10)
+        other = helpers.create_lesson('Science', school=self.school)
+        quizzes = models.AssignmentType.objects.create(
+            lesson=other, name='Quizzes', percentage=100
+        )
+
+        self.test1.assignment_type = quizzes
+        self.test1.save()
+
+        self.assertEqual(grades.check(self.lesson), [])
+        self.assertEqual(grades.check(other), [])
+        self.assertAlmostEqual(models.LessonGrade.objects.get(
+            student=self.student, lesson=other
+        ).total, 100)
+
+    def test_deleting_lesson(self):
+        """Test a lesson with totals can be deleted"""
+        self._score(self.test1, 10)
+
+        self.lesson.delete()
+
+        self.assertFalse(models.LessonGrade.objects.exists())
+        self.assertFalse(models.CategoryGrade.objects.exists())
+
+    def test_check_and_rebuild_commands(self):
+        """Test the checker reports drift and rebuild repairs it"""
+        self._score(self.test1, 10)
+        models.LessonGrade.objects.update(total=1)
+
+        with self.assertRaises(CommandError):
+            call_command('check_grade_totals', stdout=StringIO())
+
+        call_command('rebuild_grade_totals', stdout=StringIO())
+
+        self.assertAlmostEqual(self._total(), 100)
+        out = StringIO()
+        call_command('check_grade_totals', stdout=out)
+        self.assertIn('consistent', out.getvalue())
@@ -0,0 +1,200 @@
+"""Tests for password hashing and throttling of logins"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle
+
+from core import authentication
+from core.throttles import LoginIPRateThrottle
+
+TOKEN_URL = reverse('core:token')
+
+HASHING = {
+    'ALGORITHM': 'scrypt',
+    'ARGON2_TIME_COST': 1,
+    'ARGON2_MEMORY_COST': 1024,
+    'ARGON2_PARALLELISM': 1,
+    'SCRYPT_WORK_FACTOR': 2 ** 12,
+    'SCRYPT_BLOCK_SIZE': 8,
+    'SCRYPT_PARALLELISM': 1,
+}
+SCRYPT_FIRST = [
+    'core.hashers.TunedScryptPasswordHasher',
+    'core.hashers.TunedArgon2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+]
+
+
+@override_settings(PASSWORD_HASHING=HASHING)
+class LoginTests(TestCase):
+    """Test the login endpoint"""
+
+    def setUp(self):
+        for alias in ('default', 'shared'):
+            caches[alias].clear()
+            self.addCleanup(caches[alias].clear)
+        self.client = APIClient()
+        self.credentials = {'email': 'login@eg.com', 'password': 'pass@123'}
+
+    def create_user(self):
+        return get_user_model().objects.create_user(**self.credentials)
+
+    def login(self, **extra):
+        return self.client.post(TOKEN_URL, self.credentials, **extra)
+
+    def test_login_rehashes_with_preferred_hasher(self):
+        """Test a login rehashes a PBKDF2 password with scrypt"""
+        with override_settings(PASSWORD_HASHERS=SCRYPT_FIRST[::-1]):
+            user = self.create_user()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+
+        with override_settings(PASSWORD_HASHERS=SCRYPT_FIRST):
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+        self.assertIn(f'${2 ** 12}$', user.password)
+
+    def test_login_rehashes_changed_parameters(self):
+        """Test a login rehashes a password made with old parameters"""
+        with override_settings(PASSWORD_HASHERS=SCRYPT_FIRST):
+            user = self.create_user()
+            with override_settings(
+                PASSWORD_HASHING={**HASHING, 'SCRYPT_WORK_FACTOR': 2 ** 13}
+            ):
+                res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertIn(f'${2 ** 13}$', user.password)
+
+    def test_argon2_parameters(self):
+        """Test argon2 hashes use the configured parameters"""
+        with override_settings(PASSWORD_HASHERS=SCRYPT_FIRST[1:]):
+            user = self.create_user()
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('$m=1024,t=1,p=1$', user.password)
+
+    def test_email_throttle(self):
+        """Test attempts on one email are limited across client IPs"""
+        self.create_user()
+        with patch.dict(
+            SimpleRateThrottle.THROTTLE_RATES, {'login_email': '2/minute'}
+        ):
+            codes = [
+                self.login(REMOTE_ADDR=f'10.0.0.{index}').status_code
+                for index in range(3)
+            ]
+
+        self.assertEqual(codes[:2], [status.HTTP_200_OK] * 2)
+        self.assertEqual(codes[2], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_ip_throttle_skips_hashing(self):
+        """Test throttled attempts never reach authentication"""
+        with patch.dict(
+            SimpleRateThrottle.THROTTLE_RATES, {'login_ip': '1/minute'}
+        ), patch(
+            'core.serializers.authenticate_login', return_value=None
+        ) as authenticate:
+            first = self.client.post(
+                TOKEN_URL, {'email': 'a@eg.com', 'password': 'x'}
+            )
+            second = self.client.post(
+                TOKEN_URL, {'email': 'b@eg.com', 'password': 'x'}
+            )
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            second.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertEqual(authenticate.call_count, 1)
+
+    def test_body_not_an_object(self):
+        """Test logins with a JSON list or scalar body are rejected"""
+        for body in (['login@eg.com'], 'login@eg.com'):
+            res = self.client.post(TOKEN_URL, body, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ip_throttle_shared_by_workers(self):
+        """Test attempts counted by one worker limit the others"""
+        with patch.dict(
+            SimpleRateThrottle.THROTTLE_RATES, {'login_ip': '2/minute'}
+        ):
+            for _ in range(2):
+                self.login()
+            # Another worker reads the shared cache with its own client.
+            other_worker = LoginIPRateThrottle()
+            other_worker.cache = DatabaseCache('django_cache', {})
+            request = APIClient().post(TOKEN_URL).wsgi_request
+
+            self.assertFalse(other_worker.allow_request(request, None))
+
+    @override_settings(LOGIN_HASH_CONCURRENCY=1, LOGIN_HASH_TIMEOUT=0.01)
+    def test_login_busy(self):
+        """Test logins fail fast when another worker holds every slot"""
+        self.create_user()
+        other_worker = authentication.SharedSemaphore(
+            DatabaseCache('django_cache', {}), 'login-hash', 1, 30
+        )
+        slot = other_worker.acquire(timeout=0)
+
+        res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertNotIn('token', res.data)
+
+        other_worker.release(slot)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+
+class SharedSemaphoreTests(TestCase):
+    """Test the semaphore bounding work across processes"""
+
+    def setUp(self):
+        self.clients = [DatabaseCache('django_cache', {}) for _ in range(2)]
+
+    def semaphore(self, client, size=2, lease=30):
+        return authentication.SharedSemaphore(client, 'test', size, lease)
+
+    def test_slots_shared_by_cache_clients(self):
+        """Test slots taken through one client are taken for the other"""
+        first, second = (self.semaphore(client) for client in self.clients)
+
+        slots = [first.acquire(timeout=0), second.acquire(timeout=0)]
+
+        self.assertNotIn(None, slots)
+        self.assertIsNone(second.acquire(timeout=0.1))
+        first.release(slots[0])
+        self.assertIsNotNone(second.acquire(timeout=0))
+
+    def test_release_only_own_slot(self):
+        """Test a slot re-leased by another holder is not released"""
+        first, second = (
+            self.semaphore(client, size=1) for client in self.clients
+        )
+        key, _ = first.acquire(timeout=0)
+        self.clients[0].set(key, 'other holder')
+
+        first.release((key, 'first holder'))
+
+        self.assertIsNone(second.acquire(timeout=0))
+
+    def test_lease_expires(self):
+        """Test slots of a worker that died free themselves"""
+        first, second = (
+            self.semaphore(client, size=1, lease=1)
+            for client in self.clients
+        )
+        self.assertIsNotNone(first.acquire(timeout=0))
+
+        self.assertIsNotNone(second.acquire(timeout=2.5))
@@ -0,0 +1,93 @@
+"""Test for the request metrics middleware"""
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from app import metrics
+
+ME_URL = reverse('core:me')
+METRICS_URL = reverse('metrics')
+
+
+class RequestMetricsTests(TestCase):
+    """Test per-request metrics"""
+
+    def setUp(self):
+        for histogram in metrics.HISTOGRAMS:
+            histogram.reset()
+        self.user = get_user_model().objects.create_user(
+            email='user@eg.com', password='test@pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        """Test responses carry their database and render timings"""
+        res = self.client.get(ME_URL)
+
+        timing = res['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    @override_settings(METRICS_TOKEN='scrape')
+    def test_metrics_endpoint(self):
+        """Test histograms are served by URL name"""
+        self.client.get(ME_URL)
+        self.client.get(ME_URL)
+
+        res = Client().get(
+            METRICS_URL, headers={'Authorization': 'Bearer scrape'}
+        )
+
+        content = res.content.decode()
+        self.assertIn(
+            '# TYPE http_request_duration_seconds histogram', content
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{view="core:me"} 2', content
+        )
+        self.assertIn('http_request_db_queries_bucket{view="core:me"', content)
+        self.assertIn('catalog_cache_lookups_total{result="hit"}', content)
+
+    @override_settings(METRICS_TOKEN='scrape')
+    def test_metrics_endpoint_requires_token_or_staff(self):
+        """Test other clients, local ones included, get no metrics"""
+        anonymous = Client(REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(anonymous.get(METRICS_URL).status_code, 403)
+        self.assertEqual(anonymous.get(
+            METRICS_URL, headers={'Authorization': 'Bearer wrong'}
+        ).status_code, 403)
+
+        staff = get_user_model().objects.create_user(
+            email='staff@eg.com', password='test@pass123', is_staff=True
+        )
+        anonymous.force_login(staff)
+        self.assertEqual(anonymous.get(METRICS_URL).status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_metrics_endpoint_allowed_ips(self):
+        """Test addresses can be allowed explicitly"""
+        res = Client(REMOTE_ADDR='10.0.0.5').get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(QUERY_BUDGETS={'core:me': 0}, QUERY_BUDGET_RAISE=True)
+    def test_query_budget_raises(self):
+        """Test exceeding a query budget fails when configured to"""
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+
+        with self.assertRaises(metrics.QueryBudgetExceeded):
+            self.client.get(ME_URL)
+
+    @override_settings(QUERY_BUDGETS={'core:me': 0}, QUERY_BUDGET_RAISE=False)
+    def test_query_budget_logs(self):
+        """Test exceeding a query budget is logged otherwise"""
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION='Token nope')
+
+        with self.assertLogs('app.metrics', level='WARNING'):
+            self.client.get(ME_URL)
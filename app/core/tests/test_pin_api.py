@@ -0,0 +1,428 @@
+"""Test for the PIN API"""
+import json
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import (
+    TestCase,
+    TransactionTestCase,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework.throttling import SimpleRateThrottle
+
+from core import models
+from core.utils import PINUnavailable, generate_pins, redeem_pin
+
+PINS_URL = reverse('core:pins')
+EXPORT_URL = reverse('core:pins-export')
+REDEEM_URL = reverse('core:pins-redeem')
+
+
+class PINGenerationTests(TestCase):
+    """Test bulk pin generation"""
+
+    def setUp(self):
+        self.school = models.School.objects.create(
+            name='Tanga High', address='Box 1',
+            email='info@tanga.com', phone='0200000000'
+        )
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@eg.com', 'test@pass123'
+        )
+        self.admin.school = self.school
+        self.admin.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_generate_pins(self):
+        """Test generating pins for the admin's school"""
+        payload = {'pin_type': 'student', 'pin_count': 25}
+        res = self.client.post(PINS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 25)
+        pins = models.PIN.objects.filter(school=self.school)
+        self.assertEqual(pins.count(), 25)
+        self.assertFalse(pins.filter(expire__isnull=True).exists())
+        self.assertIn('pin-batch-0', res['Server-Timing'])
+
+    def test_generate_pins_query_count_is_per_batch(self):
+        """Test the number of queries depends on batches, not pins"""
+        generate_pins('teacher', 1)
+
+        with self.assertNumQueries(9):
+            pins, timings = generate_pins('teacher', 500, batch_size=1000)
+
+        self.assertEqual(len(pins), 500)
+        self.assertEqual(len(timings), 1)
+
+    def test_generate_pins_in_batches(self):
+        """Test pins are written in chunks of the batch size"""
+        pins, timings = generate_pins('teacher', 25, batch_size=10)
+
+        self.assertEqual(len(timings), 3)
+        self.assertEqual(len({pin.pin_code for pin in pins}), 25)
+
+    @override_settings(PIN_ALLOCATOR='core.allocators.RandomPINAllocator')
+    def test_colliding_codes_are_replaced(self):
+        """Test codes that already exist are drawn again"""
+        models.PIN.objects.create(pin_code='AAAAAAAAAA', pin_type='student')
+        codes = iter(['AAAAAAAAAA', 'BBBBBBBBBB', 'CCCCCCCCCC'])
+
+        with patch(
+            'core.allocators._random_pin', side_effect=lambda: next(codes)
+        ):
+            pins, _ = generate_pins('student', 2)
+
+        self.assertEqual(
+            sorted(pin.pin_code for pin in pins),
+            ['BBBBBBBBBB', 'CCCCCCCCCC']
+        )
+
+    def test_pin_count_above_cap_rejected(self):
+        """Test requesting more pins than the server cap fails"""
+        payload = {
+            'pin_type': 'student',
+            'pin_count': settings.PIN_GENERATION_MAX + 1
+        }
+        res = self.client.post(PINS_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pin_count', res.data)
+        self.assertFalse(models.PIN.objects.exists())
+
+    def test_pin_type_required(self):
+        """Test pin_type is required to generate pins"""
+        res = self.client.post(PINS_URL, {'pin_count': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(models.PIN.objects.exists())
+
+
+class PINExportTests(TestCase):
+    """Test streaming pin exports"""
+
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@eg.com', 'test@pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        self.student_pin = models.PIN.objects.create(
+            pin_code='STUDENT001', pin_type='student'
+        )
+        self.teacher_pin = models.PIN.objects.create(
+            pin_code='TEACHER001', pin_type='teacher', is_used=True
+        )
+        self.expired_pin = models.PIN.objects.create(
+            pin_code='EXPIRED001', pin_type='student',
+            expire=timezone.now() - timedelta(days=1)
+        )
+
+    def _content(self, res):
+        self.assertTrue(res.streaming)
+        return b''.join(res.streaming_content).decode()
+
+    def test_export_csv(self):
+        """Test exporting all pins as CSV"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        lines = self._content(res).splitlines()
+        self.assertTrue(lines[0].startswith('id,pin_code,pin_type'))
+        self.assertEqual(len(lines), 4)
+
+    def test_export_ndjson_filtered(self):
+        """Test exporting unused student pins as NDJSON"""
+        res = self.client.get(
+            EXPORT_URL,
+            {'output': 'ndjson', 'pin_type': 'student', 'is_used': 'false'}
+        )
+
+        rows = [json.loads(line) for line in self._content(res).splitlines()]
+        self.assertEqual(
+            {row['pin_code'] for row in rows}, {'STUDENT001', 'EXPIRED001'}
+        )
+
+    def test_export_names_issued_accounts(self):
+        """Test exported pins name the account they were issued to"""
+        self.student_pin.issued_to = self.admin
+        self.student_pin.save()
+
+        res = self.client.get(EXPORT_URL, {'output': 'ndjson'})
+
+        rows = {
+            row['pin_code']: row['issued_to__email']
+            for row in map(json.loads, self._content(res).splitlines())
+        }
+        self.assertEqual(rows['STUDENT001'], 'admin@eg.com')
+        self.assertIsNone(rows['TEACHER001'])
+
+    def test_export_expired_filter(self):
+        """Test filtering pins by expiry"""
+        res = self.client.get(
+            EXPORT_URL, {'output': 'ndjson', 'expired': 'true'}
+        )
+
+        rows = [json.loads(line) for line in self._content(res).splitlines()]
+        self.assertEqual([row['pin_code'] for row in rows], ['EXPIRED001'])
+
+    @override_settings(PIN_EXPORT_CHUNK_SIZE=2)
+    def test_export_without_server_side_cursors(self):
+        """Test exports read bounded chunks when cursors are client-side,
+        as behind PgBouncer"""
+        with patch.dict(
+            connection.settings_dict, {'DISABLE_SERVER_SIDE_CURSORS': True}
+        ), CaptureQueriesContext(connection) as queries:
+            res = self.client.get(EXPORT_URL)
+            lines = self._content(res).splitlines()
+
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(
+            [row.split(',')[0] for row in lines[1:]],
+            [str(pin.pk) for pin in (
+                self.student_pin, self.teacher_pin, self.expired_pin
+            )]
+        )
+        chunks = [
+            query['sql'] for query in queries
+            if 'FROM "core_pin"' in query['sql']
+        ]
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(all('LIMIT 2' in sql for sql in chunks))
+        self.assertNotIn('DECLARE', ' '.join(chunks))
+
+    def test_export_invalid_output(self):
+        """Test an unknown output format is rejected"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_requires_admin(self):
+        """Test non staff users cannot export pins"""
+        user = get_user_model().objects.create_user(
+            email='user@eg.com', password='test@pass123'
+        )
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PINListTests(TestCase):
+    """Test listing pins"""
+
+    def setUp(self):
+        self.school = models.School.objects.create(
+            name='Tanga High', address='Box 1',
+            email='info@tanga.com', phone='0200000000'
+        )
+        self.other_school = models.School.objects.create(
+            name='Other High', address='Box 2',
+            email='info@other.com', phone='0200000001'
+        )
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@eg.com', 'test@pass123'
+        )
+        self.admin.school = self.school
+        self.admin.save()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+        generate_pins('student', 5, school=self.school)
+        generate_pins('teacher', 2, school=self.school)
+        generate_pins('student', 3, school=self.other_school)
+
+    def test_list_is_scoped_to_school(self):
+        """Test only pins of the admin's school are listed"""
+        res = self.client.get(PINS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 7)
+        self.assertIsNone(res.data['next'])
+
+    def test_list_filter_pin_type(self):
+        """Test filtering the list by pin type"""
+        res = self.client.get(PINS_URL, {'pin_type': 'teacher'})
+
+        self.assertEqual(len(res.data['results']), 2)
+
+    def test_list_cursor_pagination(self):
+        """Test walking all pages returns every pin once, newest first"""
+        codes = []
+        url = PINS_URL + '?page_size=3'
+        while url:
+            res = self.client.get(url)
+            codes += [pin['pin_code'] for pin in res.data['results']]
+            url = res.data['next']
+
+        expected = models.PIN.objects.filter(
+            school=self.school
+        ).order_by('-created_at', '-id').values_list('pin_code', flat=True)
+        self.assertEqual(codes, list(expected))
+
+    def test_list_page_query_count(self):
+        """Test a page costs the same queries whatever its size"""
+        with self.assertNumQueries(1):
+            self.client.get(PINS_URL, {'page_size': 6})
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        res = self.client.get(PINS_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_admin_without_school_lists_nothing(self):
+        """Test admins without a school see no school's pins"""
+        admin = get_user_model().objects.create_adminuser(
+            'other@eg.com', 'test@pass123'
+        )
+        self.client.force_authenticate(user=admin)
+
+        res = self.client.get(PINS_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+
+class PINRedeemTests(TestCase):
+    """Test redeeming pins"""
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = APIClient()
+        self.school = models.School.objects.create(
+            name='Tanga High', address='Box 1',
+            email='info@tanga.com', phone='0200000000'
+        )
+        self.pin = models.PIN.objects.create(
+            pin_code='TEACHER001', pin_type='teacher', school=self.school
+        )
+
+    def test_redeem_pin(self):
+        """Test redeeming a pin creates a teacher of the pin's school"""
+        payload = {
+            'pin_code': 'teacher001',
+            'email': 'teacher@eg.com',
+            'password': 'test@pass123'
+        }
+        res = self.client.post(REDEEM_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data, {'email': 'teacher@eg.com'})
+        user = get_user_model().objects.get(email='teacher@eg.com')
+        self.assertTrue(user.is_teacher)
+        self.assertFalse(user.is_student)
+        self.assertEqual(user.school, self.school)
+        self.assertTrue(user.check_password('test@pass123'))
+        self.pin.refresh_from_db()
+        self.assertTrue(self.pin.is_used)
+        self.assertEqual(self.pin.used_by, user)
+
+    def test_redeem_used_pin(self):
+        """Test a pin can only be redeemed once"""
+        redeem_pin('TEACHER001', 'first@eg.com', 'test@pass123')
+
+        payload = {
+            'pin_code': 'TEACHER001',
+            'email': 'second@eg.com',
+            'password': 'test@pass123'
+        }
+        res = self.client.post(REDEEM_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pin_code', res.data)
+        self.assertFalse(
+            get_user_model().objects.filter(email='second@eg.com').exists()
+        )
+
+    def test_redeem_expired_pin(self):
+        """Test an expired pin cannot be redeemed"""
+        self.pin.expire = timezone.now() - timedelta(minutes=1)
+        self.pin.save()
+
+        with self.assertRaises(PINUnavailable):
+            redeem_pin('TEACHER001', 'teacher@eg.com', 'test@pass123')
+
+    def test_redeem_existing_email(self):
+        """Test redeeming with a taken email leaves the pin unused"""
+        get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123'
+        )
+        payload = {
+            'pin_code': 'TEACHER001',
+            'email': 'teacher@eg.com',
+            'password': 'test@pass123'
+        }
+        res = self.client.post(REDEEM_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.pin.refresh_from_db()
+        self.assertFalse(self.pin.is_used)
+
+    def test_redeem_throttled(self):
+        """Test guesses from one client IP are limited"""
+        payload = {
+            'pin_code': 'GUESS00001',
+            'email': 'teacher@eg.com',
+            'password': 'test@pass123'
+        }
+        with patch.dict(
+            SimpleRateThrottle.THROTTLE_RATES, {'pin_redeem_ip': '2/minute'}
+        ):
+            codes = [
+                self.client.post(REDEEM_URL, payload).status_code
+                for _ in range(3)
+            ]
+
+        self.assertEqual(codes[:2], [status.HTTP_400_BAD_REQUEST] * 2)
+        self.assertEqual(codes[2], status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class PINRedeemConcurrencyTests(TransactionTestCase):
+    """Test concurrent redemptions of one pin"""
+
+    def test_one_of_parallel_redemptions_wins(self):
+        """Test exactly one of many parallel redemptions succeeds"""
+        models.PIN.objects.create(pin_code='STUDENT001', pin_type='student')
+        attempts = 10
+        barrier = threading.Barrier(attempts)
+        results = []
+
+        def redeem(index):
+            try:
+                barrier.wait()
+                redeem_pin('STUDENT001', f'user{index}@eg.com', 'pass123')
+                results.append(True)
+            except PINUnavailable:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=redeem, args=(index,))
+            for index in range(attempts)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(results.count(False), attempts - 1)
+        self.assertEqual(get_user_model().objects.count(), 1)
+        pin = models.PIN.objects.get(pin_code='STUDENT001')
+        self.assertTrue(pin.is_used)
+        self.assertTrue(pin.used_by.is_student)
@@ -0,0 +1,178 @@
+"""Tests for bulk user provisioning"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models, provisioning
+from core.provisioning import hash_passwords, provision_users
+from core.tests import helpers
+
+BULK_URL = reverse('core:users-bulk')
+REDEEM_URL = reverse('core:pins-redeem')
+
+
+def accounts(count, password=None):
+    return [
+        {'email': f'user{index}@eg.com', 'password': password}
+        if password else {'email': f'user{index}@eg.com'}
+        for index in range(count)
+    ]
+
+
+class ProvisioningTests(TestCase):
+    """Test creating users in bulk"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+
+    def test_hash_passwords_in_processes(self):
+        """Test passwords hashed in a process pool verify"""
+        hashes = hash_passwords(['first@pass', 'second@pass'], processes=2)
+
+        user = get_user_model()(password=hashes[1])
+        self.assertTrue(user.check_password('second@pass'))
+        self.assertNotEqual(hashes[0], hashes[1])
+
+    def test_hash_pool_reused(self):
+        """Test later batches reuse the worker's hashing processes"""
+        hash_passwords(['first@pass', 'second@pass'], processes=2)
+        pool = provisioning._pool(2)
+
+        hash_passwords(['third@pass', 'fourth@pass'], processes=2)
+
+        self.assertIs(provisioning._pool(2), pool)
+
+    def test_provision_users(self):
+        """Test users are inserted together with their role and school"""
+        with self.assertNumQueries(3):
+            users, pins = provision_users(
+                accounts(3, 'test@pass'), 'student', school=self.school,
+                processes=1
+            )
+
+        self.assertEqual(pins, [])
+        self.assertEqual(len(users), 3)
+        user = get_user_model().objects.get(email='user2@eg.com')
+        self.assertTrue(user.is_student)
+        self.assertFalse(user.is_teacher)
+        self.assertEqual(user.school, self.school)
+        self.assertTrue(user.check_password('test@pass'))
+
+    def test_provision_users_with_pins(self):
+        """Test users issued pins get no password until they redeem"""
+        users, pins = provision_users(
+            accounts(2), 'teacher', school=self.school, issue_pins=True
+        )
+
+        self.assertEqual([pin.issued_to for pin in pins], users)
+        self.assertFalse(users[0].has_usable_password())
+        self.assertEqual(
+            {pin.pin_type for pin in pins}, {'teacher'}
+        )
+        with self.assertRaises(ValueError):
+            provision_users(accounts(1), 'guardian', issue_pins=True)
+
+    def test_redeem_issued_pin(self):
+        """Test an issued pin sets the password of its own account only"""
+        users, pins = provision_users(
+            accounts(2), 'student', school=self.school, issue_pins=True
+        )
+        client = APIClient()
+
+        res = client.post(REDEEM_URL, {
+            'pin_code': pins[0].pin_code, 'email': 'user1@eg.com',
+            'password': 'new@pass1'
+        })
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = client.post(REDEEM_URL, {
+            'pin_code': pins[0].pin_code, 'email': 'user0@eg.com',
+            'password': 'new@pass1'
+        })
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        users[0].refresh_from_db()
+        self.assertTrue(users[0].check_password('new@pass1'))
+        self.assertEqual(get_user_model().objects.count(), 2)
+        self.assertTrue(models.PIN.objects.get(pk=pins[0].pk).is_used)
+
+
+class ProvisioningAPITests(TestCase):
+    """Test the bulk provisioning endpoint"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+        self.admin = get_user_model().objects.create_user(
+            email='admin@eg.com', password='test@pass123', is_staff=True,
+            school=self.school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_provision_with_pins(self):
+        """Test admins provision users of their school with pins"""
+        res = self.client.post(BULK_URL, {
+            'role': 'student', 'accounts': accounts(2), 'issue_pins': True
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [user['email'] for user in res.data],
+            ['user0@eg.com', 'user1@eg.com']
+        )
+        pin = models.PIN.objects.get(pin_code=res.data[0]['pin_code'])
+        self.assertEqual(pin.issued_to_id, res.data[0]['id'])
+        self.assertEqual(pin.school, self.school)
+
+    def test_provision_with_passwords(self):
+        """Test accounts need passwords unless pins are issued"""
+        res = self.client.post(BULK_URL, {
+            'role': 'guardian', 'accounts': accounts(1)
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(BULK_URL, {
+            'role': 'guardian', 'accounts': accounts(1, 'test@pass')
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(res.data[0]['pin_code'])
+        self.assertTrue(
+            get_user_model().objects.get(email='user0@eg.com').is_guardian
+        )
+
+    @override_settings(USER_PROVISION_MAX_PASSWORDS=1)
+    def test_passwords_capped(self):
+        """Test batches too large to hash within a request need pins"""
+        res = self.client.post(BULK_URL, {
+            'role': 'student', 'accounts': accounts(2, 'test@pass')
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('issue pins', str(res.data['accounts']))
+
+        res = self.client.post(BULK_URL, {
+            'role': 'student', 'accounts': accounts(2), 'issue_pins': True
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+
+    def test_taken_and_repeated_emails_rejected(self):
+        """Test no user is created when any email is unavailable"""
+        payload = accounts(2) + [
+            {'email': 'user0@eg.com'}, {'email': 'admin@eg.com'}
+        ]
+
+        res = self.client.post(BULK_URL, {
+            'role': 'student', 'accounts': payload, 'issue_pins': True
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('admin@eg.com, user0@eg.com', str(res.data['accounts']))
+        self.assertEqual(get_user_model().objects.count(), 1)
+
+    def test_admin_role_not_offered(self):
+        """Test admins cannot be provisioned in bulk"""
+        res = self.client.post(BULK_URL, {
+            'role': 'admin', 'accounts': accounts(1, 'test@pass')
+        }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,168 @@
+"""Tests for class rankings"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models
+from core.rankings import lesson_ranking, term_ranking
+from core.scores import save_scores
+from core.tests import helpers
+
+RANKINGS_URL = reverse('core:rankings')
+
+
+def lesson_rankings_url(lesson_id):
+    return reverse('core:lesson-rankings', args=[lesson_id])
+
+
+class RankingTests(TestCase):
+    """Test positions, percentiles and bands of students"""
+
+    def setUp(self):
+        caches[settings.RANKING_CACHE['ALIAS']].clear()
+        self.school = helpers.create_school()
+        self.lesson = helpers.create_lesson(school=self.school)
+        self.english = helpers.create_lesson('English', school=self.school)
+        self.exam = helpers.create_assignments(
+            self.lesson, {'Exam': (100, [100])}
+        )['Exam'][0]
+        self.english_exam = helpers.create_assignments(
+            self.english, {'Exam': (100, [100])}
+        )['Exam'][0]
+        self.students = [
+            helpers.create_student(self.school, index) for index in range(5)
+        ]
+
+    def score(self, assignment, scores):
+        models.Enrollment.objects.bulk_create([
+            models.Enrollment(
+                student=student, lesson=assignment.assignment_type.lesson
+            )
+            for student, score in zip(self.students, scores)
+            if score is not None
+        ], ignore_conflicts=True)
+        save_scores(assignment, [
+            {'student': student.pk, 'score': str(score)}
+            for student, score in zip(self.students, scores)
+            if score is not None
+        ])
+
+    def test_lesson_ranking(self):
+        """Test ties share a position and percentiles count those below"""
+        self.score(self.exam, [90, 75, 75, 40, None])
+
+        ranking = lesson_ranking(self.lesson)
+
+        self.assertEqual(ranking['out_of'], 4)
+        self.assertEqual(
+            [(row['student'], row['position'], row['dense_rank'])
+             for row in ranking['students']],
+            [(self.students[0].pk, 1, 1), (self.students[1].pk, 2, 2),
+             (self.students[2].pk, 2, 2), (self.students[3].pk, 4, 3)]
+        )
+        self.assertEqual(
+            [row['percentile'] for row in ranking['students']],
+            [100.0, 33.3, 33.3, 0.0]
+        )
+        self.assertEqual(
+            [row['band'] for row in ranking['students']],
+            ['A', 'B', 'B', 'E']
+        )
+        self.assertEqual(ranking['students'][0]['name'], 'First0 Last0')
+
+    def test_lesson_ranking_cached_until_scores_change(self):
+        """Test rankings are cached until a score of the lesson changes"""
+        self.score(self.exam, [90, 75])
+        lesson_ranking(self.lesson)
+
+        with self.assertNumQueries(1):
+            lesson_ranking(self.lesson)
+
+        self.score(self.english_exam, [10, 20])
+        with self.assertNumQueries(1):
+            lesson_ranking(self.lesson)
+
+        score = models.Score.objects.get(
+            student=self.students[1], assignment=self.exam
+        )
+        score.score = 95
+        score.save()
+        ranking = lesson_ranking(self.lesson)
+        self.assertEqual(
+            ranking['students'][0]['student'], self.students[1].pk
+        )
+
+    def test_term_ranking(self):
+        """Test students are ranked on their average over the term"""
+        self.score(self.exam, [90, 60, 70])
+        self.score(self.english_exam, [50, 100, None])
+        other = helpers.create_lesson(
+            'History', school=self.school, year=2023
+        )
+        history = helpers.create_assignments(
+            other, {'Exam': (100, [100])}
+        )['Exam'][0]
+        self.score(history, [0, 0, 100])
+
+        ranking = term_ranking(self.school.pk, 'First', 2024)
+
+        self.assertEqual(
+            [(row['student'], row['total'], row['position'])
+             for row in ranking['students']],
+            [(self.students[1].pk, 80.0, 1), (self.students[0].pk, 70.0, 2),
+             (self.students[2].pk, 70.0, 2)]
+        )
+
+        with self.assertNumQueries(1):
+            term_ranking(self.school.pk, 'First', 2024)
+
+
+class RankingAPITests(TestCase):
+    """Test the ranking endpoints"""
+
+    def setUp(self):
+        caches[settings.RANKING_CACHE['ALIAS']].clear()
+        self.school = helpers.create_school()
+        self.lesson = helpers.create_lesson(school=self.school)
+        exam = helpers.create_assignments(
+            self.lesson, {'Exam': (100, [100])}
+        )['Exam'][0]
+        student = helpers.create_student(self.school)
+        models.Enrollment.objects.create(student=student, lesson=self.lesson)
+        save_scores(exam, [{'student': student.pk, 'score': '55'}])
+        self.teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123',
+            is_teacher=True, school=self.school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+
+    def test_lesson_rankings(self):
+        """Test teachers read the positions of a lesson of their school"""
+        res = self.client.get(lesson_rankings_url(self.lesson.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['out_of'], 1)
+        self.assertEqual(res.data['students'][0]['band'], 'D')
+
+    def test_other_school_lesson_not_found(self):
+        """Test lessons of other schools are not ranked for teachers"""
+        other = helpers.create_school('Other High', email='info@other.com')
+        lesson = helpers.create_lesson('Science', school=other)
+
+        res = self.client.get(lesson_rankings_url(lesson.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_term_rankings(self):
+        """Test the term is required and ranks the school's students"""
+        res = self.client.get(RANKINGS_URL, {'term': 'First', 'year': 2024})
+        missing = self.client.get(RANKINGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['students'][0]['total'], 55.0)
+        self.assertEqual(missing.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,135 @@
+"""Tests for read replica routing"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connections, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from app.replicas import ReplicaRouter, _use_replica
+from core import models
+from core.authentication import token_cache
+from core.utils import generate_pins
+
+PINS_URL = reverse('core:pins')
+ME_URL = reverse('core:me')
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Test which database requests read from"""
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        caches['shared'].clear()
+        token_cache.clear()
+        self.admin = get_user_model().objects.create_superuser(
+            'admin@eg.com', 'test@pass123'
+        )
+        self.token = Token.objects.create(user=self.admin)
+        generate_pins('student', 3)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get(self, url):
+        """Return a response and the queries run on each database"""
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica1']) as replica:
+            res = self.client.get(url)
+        return res, len(primary), len(replica)
+
+    def test_marked_view_reads_from_replica(self):
+        """Test pin listing reads from the replica"""
+        res, primary, replica = self.get(PINS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 3)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_async_view_reads_from_replica(self):
+        """Test the async pin list reads from the replica"""
+        res, primary, replica = self.get(reverse('core:async-pins'))
+
+        self.assertEqual(len(res.json()['results']), 3)
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_unmarked_view_reads_from_primary(self):
+        """Test views that are not marked read from the primary"""
+        res, primary, replica = self.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_client_reads_from_primary_after_write(self):
+        """Test a client that wrote keeps reading from the primary"""
+        res = self.client.patch(ME_URL, {'password': 'new@pass123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res, primary, replica = self.get(PINS_URL)
+
+        self.assertEqual(len(res.data['results']), 3)
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_writers_remembered_by_cookie(self):
+        """Test every worker sees a write, without a lookup in any cache"""
+        res = self.client.patch(ME_URL, {'password': 'new@pass123'})
+        cookie = res.cookies['replica_sticky']
+        self.assertEqual(cookie['max-age'], 5)
+        # Another worker has its own default cache.
+        cache.clear()
+
+        with CaptureQueriesContext(connections['default']) as primary:
+            self.client.get(PINS_URL)
+
+        self.assertTrue(primary.captured_queries)
+        self.assertFalse([
+            query for query in primary.captured_queries
+            if 'django_cache' in query['sql']
+        ])
+
+        self.client.cookies.pop('replica_sticky')
+        res, primary, replica = self.get(PINS_URL)
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_forged_cookie_ignored(self):
+        """Test an unsigned sticky cookie does not pin a client"""
+        self.client.cookies['replica_sticky'] = '1'
+
+        res, primary, replica = self.get(PINS_URL)
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    @override_settings(REPLICA_STICKY_CACHE='default')
+    def test_writers_remembered_in_sticky_cache(self):
+        """Test clients that drop cookies are remembered in the sticky
+        cache, if one is set"""
+        self.client.patch(ME_URL, {'password': 'new@pass123'})
+        self.client.cookies.clear()
+
+        res, primary, replica = self.get(PINS_URL)
+
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_writes_and_transactions_use_primary(self):
+        """Test writes, and reads inside transactions, use the primary"""
+        router = ReplicaRouter()
+        token = _use_replica.set('replica1')
+        try:
+            self.assertEqual(router.db_for_read(models.PIN), 'replica1')
+            self.assertEqual(router.db_for_write(models.PIN), 'default')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(models.PIN), 'default')
+        finally:
+            _use_replica.reset(token)
+        self.assertEqual(router.db_for_read(models.PIN), 'default')
@@ -0,0 +1,330 @@
+"""Tests for report card jobs"""
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models, report_cards
+from core.pdf import text_pdf
+from core.report_cards import claim_job, collect_cards, run_job
+from core.scores import save_scores
+from core.tests import helpers
+
+JOBS_URL = reverse('core:report-cards')
+
+
+def job_url(job_id):
+    return reverse('core:report-card', args=[job_id])
+
+
+def archive_url(job_id):
+    return reverse('core:report-card-archive', args=[job_id])
+
+
+class ReportCardTestCase(TestCase):
+    """Set up a school with graded students and a report card directory"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(
+            REPORT_CARD_DIR=directory, REPORT_CARD_BATCH_SIZE=2
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.directory = Path(directory)
+
+        self.school = helpers.create_school()
+        self.lesson = helpers.create_lesson(school=self.school)
+        exams = helpers.create_assignments(
+            self.lesson, {'Exam': (100, [50])}
+        )['Exam']
+        self.students = [
+            helpers.create_student(self.school, index) for index in range(5)
+        ]
+        for student in self.students:
+            models.Enrollment.objects.create(
+                student=student, lesson=self.lesson
+            )
+        save_scores(exams[0], [
+            {'student': student.pk, 'score': str(10 * index)}
+            for index, student in enumerate(self.students)
+        ])
+
+    def create_job(self, **params):
+        defaults = {'term': 'First', 'year': 2024}
+        defaults.update(params)
+        return models.ReportCardJob.objects.create(
+            school=self.school, **defaults
+        )
+
+    def archive_names(self, job):
+        with zipfile.ZipFile(self.directory / job.archive) as archive:
+            return sorted(archive.namelist())
+
+
+class PDFTests(TestCase):
+    """Test the PDF writer"""
+
+    def test_text_pdf(self):
+        """Test lines become a PDF with one page per page of text"""
+        document = text_pdf(
+            [('Title (draft)', 16, True)] + [('Line', 10, False)] * 80
+        )
+
+        self.assertTrue(document.startswith(b'%PDF-1.4'))
+        self.assertTrue(document.endswith(b'%%EOF\n'))
+        self.assertIn(b'(Title \\(draft\\)) Tj', document)
+        self.assertIn(b'/Count 2', document)
+
+
+class ReportCardJobTests(ReportCardTestCase):
+    """Test building report card archives"""
+
+    def test_collect_cards(self):
+        """Test every student of the school gets a card with grades"""
+        helpers.create_student(self.school, 9)
+        job = self.create_job()
+
+        cards = collect_cards(job)
+
+        self.assertEqual(len(cards), 6)
+        self.assertEqual(cards[-1]['lessons'], [])
+        lesson = cards[1]['lessons'][0]
+        self.assertEqual(lesson['subject'], 'Mathematics')
+        self.assertEqual(lesson['total'], 20.0)
+        self.assertEqual(lesson['categories'], [('Exam', 100.0, 20.0)])
+        self.assertEqual(lesson['scores'], [('Exam 1', 50, 10.0)])
+
+    def test_run_job(self):
+        """Test a job writes one PDF per student into its archive"""
+        job = self.create_job()
+        progress = mock.Mock()
+
+        run_job(claim_job(), processes=1, progress=progress)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual((job.students_done, job.students_total), (5, 5))
+        self.assertEqual(progress.call_count, 3)
+        self.assertEqual(self.archive_names(job), sorted(
+            f'{student.pk}-first{index}-last{index}.pdf'
+            for index, student in enumerate(self.students)
+        ))
+        with zipfile.ZipFile(self.directory / job.archive) as archive:
+            document = archive.read(self.archive_names(job)[1])
+        self.assertIn(b'(Mathematics: 20.0%) Tj', document)
+        self.assertFalse((self.directory / f'job-{job.pk}').exists())
+
+    def test_run_job_in_processes(self):
+        """Test cards rendered in a process pool are archived"""
+        job = self.create_job()
+
+        run_job(claim_job(), processes=2)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(len(self.archive_names(job)), 5)
+
+    def test_resume(self):
+        """Test a job stopped mid-way only renders the remaining cards"""
+        self.create_job()
+        job = claim_job()
+        rendered = []
+
+        def stop_after_first_batch(progress_job):
+            rendered.append(progress_job.students_done)
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            report_cards.build_archive(
+                job, processes=1, progress=stop_after_first_batch
+            )
+        # A batch being written when the worker stopped.
+        (self.directory / f'job-{job.pk}' / 'part-00001.tmp').write_bytes(
+            b'partial'
+        )
+
+        with mock.patch.object(
+            report_cards, 'render_report_card',
+            wraps=report_cards.render_report_card
+        ) as render:
+            run_job(job, processes=1)
+
+        job.refresh_from_db()
+        self.assertEqual(rendered, [2])
+        self.assertEqual(render.call_count, 3)
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(len(self.archive_names(job)), 5)
+
+    def test_claim_stale_jobs(self):
+        """Test running jobs are only claimed again once stale"""
+        job = self.create_job(status='running', heartbeat_at=timezone.now())
+
+        self.assertIsNone(claim_job())
+
+        job.heartbeat_at = timezone.now() - timedelta(hours=1)
+        job.save()
+        self.assertEqual(claim_job(), job)
+
+    def test_claimed_again(self):
+        """Test a stalled worker stops once its job is claimed again"""
+        self.create_job()
+        first = claim_job()
+        claims = []
+
+        def stall(progress_job):
+            if not claims:
+                models.ReportCardJob.objects.filter(pk=first.pk).update(
+                    heartbeat_at=timezone.now() - timedelta(hours=1)
+                )
+                claims.append(claim_job())
+
+        with self.assertLogs('core.report_cards', 'WARNING'):
+            run_job(first, processes=1, progress=stall)
+
+        second, = claims
+        job = models.ReportCardJob.objects.get(pk=first.pk)
+        self.assertEqual((first.attempt, second.attempt), (1, 2))
+        self.assertEqual(job.status, 'running')
+        self.assertEqual(job.students_done, 2)
+
+        run_job(second, processes=1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.archive, f'report-cards-{job.pk}-2.zip')
+        self.assertEqual(len(self.archive_names(job)), 5)
+        self.assertEqual(
+            [path.name for path in self.directory.iterdir()], [job.archive]
+        )
+
+    def test_failed_job(self):
+        """Test errors while building are recorded on the job"""
+        job = self.create_job()
+
+        with mock.patch.object(
+            report_cards, 'collect_cards', side_effect=OSError('Disk full')
+        ), self.assertLogs('core.report_cards', 'ERROR'):
+            run_job(claim_job(), processes=1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error, 'Disk full')
+
+    def test_worker_command(self):
+        """Test the worker empties the queue and exits with --once"""
+        jobs = [self.create_job(), self.create_job(term='Second')]
+        out = io.StringIO()
+
+        call_command(
+            'report_card_worker', '--once', '--processes', '1', stdout=out
+        )
+
+        statuses = models.ReportCardJob.objects.values_list(
+            'status', flat=True
+        )
+        self.assertEqual(set(statuses), {'done'})
+        self.assertIn(f'Job {jobs[0].pk}: 2/5 cards', out.getvalue())
+
+
+class ReportCardAPITests(ReportCardTestCase):
+    """Test the report card endpoints"""
+
+    def setUp(self):
+        super().setUp()
+        self.admin = get_user_model().objects.create_user(
+            email='admin@eg.com', password='test@pass123', is_staff=True,
+            school=self.school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_queue_and_download(self):
+        """Test a queued job is built by a worker and downloaded"""
+        res = self.client.post(
+            JOBS_URL, {'term': 'First', 'year': 2024}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], 'queued')
+        job = models.ReportCardJob.objects.get()
+        self.assertEqual(job.school, self.school)
+        self.assertEqual(job.requested_by, self.admin)
+        self.assertEqual(
+            self.client.get(archive_url(job.pk)).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+
+        run_job(claim_job(), processes=1)
+        res = self.client.get(job_url(job.pk))
+        self.assertEqual(res.data['status'], 'done')
+        self.assertEqual(res.data['students_done'], 5)
+
+        res = self.client.get(archive_url(job.pk))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/zip')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(res.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 5)
+
+    def test_missing_archive_rebuilt(self):
+        """Test a job whose archive is gone is queued to be built again"""
+        job = self.create_job()
+        run_job(claim_job(), processes=1)
+        job.refresh_from_db()
+        (self.directory / job.archive).unlink()
+
+        res = self.client.get(archive_url(job.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.archive), ('queued', ''))
+
+        run_job(claim_job(), processes=1)
+        res = self.client.get(archive_url(job.pk))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(res.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 5)
+
+    def test_list_own_school(self):
+        """Test admins only see the jobs of their school"""
+        job = self.create_job()
+        other = helpers.create_school('Other High', email='info@other.com')
+        other_job = models.ReportCardJob.objects.create(
+            school=other, term='First', year=2024
+        )
+
+        res = self.client.get(JOBS_URL)
+
+        self.assertEqual(
+            [row['id'] for row in res.data['results']], [job.pk]
+        )
+        self.assertEqual(
+            self.client.get(job_url(other_job.pk)).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+
+    def test_requires_admin(self):
+        """Test teachers cannot queue report cards"""
+        teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123',
+            is_teacher=True, school=self.school
+        )
+        self.client.force_authenticate(user=teacher)
+
+        res = self.client.post(
+            JOBS_URL, {'term': 'First', 'year': 2024}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,333 @@
+"""Tests for roster imports"""
+import io
+import os
+import tempfile
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models, roster
+from core.catalog import catalog
+from core.roster import RosterError, import_roster
+from core.tests import helpers
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+IMPORT_URL = reverse('core:roster-import')
+STUDENT_HEADER = (
+    'first_name,last_name,gender,date_of_birth,nationality,grade_level,'
+    'national_id,account_email\n'
+)
+
+
+def student_rows(count, start=0):
+    return ''.join(
+        f'First{index},Last{index},f,2010-01-01,Ghanaian,JHS 1,'
+        f'GH-{index},\n'
+        for index in range(start, start + count)
+    )
+
+
+def csv_file(content):
+    return io.BytesIO(content.encode())
+
+
+class RosterImportTests(TestCase):
+    """Test importing roster files"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+
+    def test_import_students(self):
+        """Test valid rows are written and invalid ones reported"""
+        content = STUDENT_HEADER + student_rows(3) + (
+            'Bad,Row,x,not a date,Ghanaian,JHS 1,,\n'
+        )
+
+        job, errors, rows_per_second = import_roster(
+            csv_file(content), 'students.csv', 'students', self.school,
+            chunk_size=2
+        )
+
+        self.assertEqual(
+            (job.rows_done, job.rows_imported, job.rows_failed), (4, 3, 1)
+        )
+        self.assertIsNotNone(job.finished_at)
+        self.assertGreater(rows_per_second, 0)
+        self.assertEqual(errors[0]['row'], 4)
+        self.assertEqual(len(errors[0]['errors']), 2)
+        self.assertEqual(
+            list(models.Student.objects.filter(
+                school=self.school
+            ).order_by('national_id').values_list('national_id', flat=True)),
+            ['GH-0', 'GH-1', 'GH-2']
+        )
+
+    def test_import_students_with_logins(self):
+        """Test rows with an email get a login without a usable password"""
+        get_user_model().objects.create_user(
+            email='taken@eg.com', password='test@pass123'
+        )
+        content = STUDENT_HEADER + (
+            'Ama,Mensah,f,2010-01-01,Ghanaian,JHS 1,,ama@eg.com\n'
+            'Kofi,Owusu,m,2010-01-01,Ghanaian,JHS 1,,taken@eg.com\n'
+            'Esi,Boateng,f,2010-01-01,Ghanaian,JHS 1,,\n'
+        )
+
+        job, errors, _ = import_roster(
+            csv_file(content), 'students.csv', 'students', self.school
+        )
+
+        self.assertEqual(job.rows_imported, 2)
+        self.assertEqual(
+            errors, [{'row': 2, 'errors': ['account_email: Already in use']}]
+        )
+        student = models.Student.objects.get(first_name='Ama')
+        self.assertEqual(student.user.email, 'ama@eg.com')
+        self.assertTrue(student.user.is_student)
+        self.assertEqual(student.user.school, self.school)
+        self.assertFalse(student.user.has_usable_password())
+        self.assertIsNone(
+            models.Student.objects.get(first_name='Esi').user
+        )
+        pin = models.PIN.objects.get()
+        self.assertEqual(
+            (pin.issued_to, pin.pin_type, pin.school),
+            (student.user, 'student', self.school)
+        )
+
+    def test_queries_per_chunk_not_per_row(self):
+        """Test the number of queries does not grow with the rows"""
+        def count_queries(content, name):
+            with CaptureQueriesContext(connection) as queries:
+                import_roster(
+                    csv_file(content), name, 'students', self.school,
+                    chunk_size=1000
+                )
+            return len(queries)
+
+        few = count_queries(STUDENT_HEADER + student_rows(5), 'a.csv')
+        many = count_queries(
+            STUDENT_HEADER + student_rows(500, start=5), 'b.csv'
+        )
+
+        self.assertEqual(few, many)
+
+    def test_import_enrollments(self):
+        """Test enrollments are resolved by id or natural keys"""
+        lesson = helpers.create_lesson(school=self.school)
+        other_lesson = helpers.create_lesson(
+            'Science', school=helpers.create_school(
+                'Other High', email='info@other.com'
+            )
+        )
+        first = helpers.create_student(self.school, national_id='GH-1')
+        second = helpers.create_student(self.school, 1)
+        models.Enrollment.objects.create(student=second, lesson=lesson)
+        content = (
+            'student_id,national_id,lesson_id,subject_code,term,year\n'
+            f',GH-1,,MATH,first,2024\n'
+            f'{second.pk},,{lesson.pk},,,\n'
+            f'{first.pk},,{lesson.pk},,,\n'
+            f'{first.pk},,{other_lesson.pk},,,\n'
+            f',GH-9,,MATH,First,2023\n'
+        )
+
+        job, errors, _ = import_roster(
+            csv_file(content), 'enrollments.csv', 'enrollments', self.school
+        )
+
+        self.assertEqual((job.rows_imported, job.rows_failed), (1, 2))
+        self.assertEqual(errors, [
+            {'row': 4, 'errors': ['Unknown lesson']},
+            {'row': 5, 'errors': ['Unknown student', 'Unknown lesson']},
+        ])
+        self.assertCountEqual(
+            models.Enrollment.objects.values_list('student_id', 'lesson_id'),
+            [(first.pk, lesson.pk), (second.pk, lesson.pk)]
+        )
+
+    def test_import_enrollments_subject_codes(self):
+        """Test subject codes resolve in any case, to the school's subject
+        before a shared one, and to subjects the catalog lacks"""
+        lesson = helpers.create_lesson(school=self.school)
+        models.Subject.objects.create(
+            name='Shared Maths', subject_type='core', subect_code='MATH'
+        )
+        student = helpers.create_student(self.school, national_id='GH-1')
+        catalog.invalidate()
+        catalog.subject(lesson.subject_id)
+        science = helpers.create_lesson('Science', school=self.school)
+        content = (
+            'national_id,subject_code,term,year\n'
+            'GH-1,math,First,2024\n'
+            'GH-1,SCIE,First,2024\n'
+            'GH-1,NONE,First,2024\n'
+        )
+
+        job, errors, _ = import_roster(
+            csv_file(content), 'enrollments.csv', 'enrollments', self.school
+        )
+
+        self.assertEqual(errors, [{'row': 3, 'errors': ['Unknown lesson']}])
+        self.assertCountEqual(
+            models.Enrollment.objects.values_list('student_id', 'lesson_id'),
+            [(student.pk, lesson.pk), (student.pk, science.pk)]
+        )
+
+    def test_resume_interrupted_import(self):
+        """Test an interrupted import resumes after its last chunk"""
+        content = STUDENT_HEADER + student_rows(5)
+        copy_rows = roster.copy_rows
+        calls = []
+
+        def failing_copy(model, objects):
+            calls.append(len(objects))
+            if len(calls) == 2:
+                raise ConnectionError('lost connection')
+            copy_rows(model, objects)
+
+        with mock.patch('core.roster.copy_rows', failing_copy):
+            with self.assertRaises(ConnectionError):
+                import_roster(
+                    csv_file(content), 'students.csv', 'students',
+                    self.school, chunk_size=2
+                )
+        self.assertEqual(models.RosterImport.objects.get().rows_done, 2)
+
+        job, _, _ = import_roster(
+            csv_file(content), 'students.csv', 'students', self.school,
+            chunk_size=2
+        )
+
+        self.assertEqual((job.rows_done, job.rows_imported), (5, 5))
+        self.assertEqual(models.RosterImport.objects.count(), 1)
+        self.assertEqual(models.Student.objects.count(), 5)
+        with self.assertRaises(RosterError):
+            import_roster(
+                csv_file(content), 'students.csv', 'students', self.school
+            )
+
+    def test_invalid_file(self):
+        """Test files that are not UTF-8 CSV are rejected"""
+        with self.assertRaises(RosterError):
+            import_roster(
+                io.BytesIO(b'first_name\n\xff\xfe\n'), 'students.csv',
+                'students', self.school
+            )
+
+    @skipUnless(openpyxl, 'openpyxl is not installed')
+    def test_import_xlsx(self):
+        """Test teachers can be imported from an XLSX file"""
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append([
+            'first_name', 'last_name', 'gender', 'date_of_birth',
+            'nationality', 'phone_number'
+        ])
+        sheet.append(['Yaw', 'Asante', 'm', '1980-05-01', 'Ghanaian', 244])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+
+        job, errors, _ = import_roster(
+            buffer, 'teachers.xlsx', 'teachers', self.school
+        )
+
+        self.assertEqual((job.rows_imported, errors), (1, []))
+        teacher = models.Teacher.objects.get()
+        self.assertEqual(teacher.phone_number, '244')
+        self.assertEqual(teacher.school, self.school)
+
+    def test_command(self):
+        """Test the command imports a file and reports its progress"""
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        path = os.path.join(directory, 'students.csv')
+        with open(path, 'w') as file:
+            file.write(STUDENT_HEADER + student_rows(3))
+        out = io.StringIO()
+
+        call_command(
+            'import_roster', path, school=self.school.pk, kind='students',
+            stdout=out
+        )
+
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(models.Student.objects.count(), 3)
+
+
+class RosterImportAPITests(TestCase):
+    """Test the roster import endpoint"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+        self.admin = get_user_model().objects.create_user(
+            email='admin@eg.com', password='test@pass123', is_staff=True,
+            school=self.school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def upload(self, content, **data):
+        data['file'] = SimpleUploadedFile(
+            'students.csv', content.encode(), content_type='text/csv'
+        )
+        return self.client.post(IMPORT_URL, data, format='multipart')
+
+    def test_import(self):
+        """Test admins import into their school"""
+        res = self.upload(
+            STUDENT_HEADER + student_rows(2), kind='students'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['job']['rows_imported'], 2)
+        self.assertEqual(res.data['job']['school'], self.school.pk)
+        self.assertEqual(res.data['errors'], [])
+        self.assertIn('rows_per_second', res.data)
+
+    def test_other_school_rejected(self):
+        """Test admins cannot import into another school"""
+        other = helpers.create_school('Other High', email='info@other.com')
+
+        res = self.upload(
+            STUDENT_HEADER + student_rows(1), kind='students',
+            school=other.pk
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('school', res.data)
+        self.assertFalse(models.Student.objects.exists())
+
+    def test_repeated_file_rejected(self):
+        """Test a file already imported is not imported twice"""
+        content = STUDENT_HEADER + student_rows(1)
+        self.upload(content, kind='students')
+
+        res = self.upload(content, kind='students')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file', res.data)
+        self.assertEqual(models.Student.objects.count(), 1)
+
+    def test_requires_admin(self):
+        """Test teachers cannot import rosters"""
+        teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123', is_teacher=True
+        )
+        self.client.force_authenticate(user=teacher)
+
+        res = self.upload(STUDENT_HEADER, kind='students')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
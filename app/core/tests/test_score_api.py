@@ -0,0 +1,117 @@
+"""Test for the score entry API"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import grades, models
+from core.tests import helpers
+
+
+def scores_url(assignment_id):
+    return reverse('core:assignment-scores', args=[assignment_id])
+
+
+class ScoreBatchTests(TestCase):
+    """Test entering the scores of a class"""
+
+    def setUp(self):
+        school = helpers.create_school()
+        self.lesson = helpers.create_lesson(school=school)
+        assignments = helpers.create_assignments(self.lesson, {
+            'Tests': (100, [20]),
+        })
+        self.assignment = assignments['Tests'][0]
+        self.students = [
+            helpers.create_student(school, index) for index in range(4)
+        ]
+        for student in self.students[:3]:
+            models.Enrollment.objects.create(
+                student=student, lesson=self.lesson
+            )
+        self.teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123', is_teacher=True,
+            school=school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+
+    def test_enter_scores(self):
+        """Test a batch of scores is saved and totals are refreshed"""
+        payload = {'scores': [
+            {'student': student.pk, 'score': score}
+            for student, score in zip(self.students, ['15', 20, '7.5'])
+        ]}
+        res = self.client.post(
+            scores_url(self.assignment.pk), payload, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'saved': 3, 'errors': []})
+        self.assertEqual(
+            models.Score.objects.get(student=self.students[2]).score,
+            Decimal('7.50')
+        )
+        self.assertEqual(grades.check(self.lesson), [])
+
+    def test_scores_are_upserted(self):
+        """Test entering a score again replaces the stored one"""
+        models.Score.objects.create(
+            student=self.students[0], assignment=self.assignment, score=1
+        )
+        payload = {'scores': [{'student': self.students[0].pk, 'score': 18}]}
+        self.client.post(
+            scores_url(self.assignment.pk), payload, format='json'
+        )
+
+        score = models.Score.objects.get()
+        self.assertEqual(score.score, Decimal('18'))
+        self.assertEqual(grades.check(self.lesson), [])
+
+    def test_invalid_rows_are_reported(self):
+        """Test invalid rows are returned while valid rows are saved"""
+        payload = {'scores': [
+            {'student': self.students[0].pk, 'score': 12},
+            {'student': self.students[1].pk, 'score': 21},
+            {'student': self.students[2].pk, 'score': 'abc'},
+            {'student': self.students[3].pk, 'score': 5},
+            {'student': 'x', 'score': 5},
+        ]}
+        res = self.client.post(
+            scores_url(self.assignment.pk), payload, format='json'
+        )
+
+        self.assertEqual(res.data['saved'], 1)
+        self.assertEqual(
+            [error['row'] for error in res.data['errors']], [1, 2, 3, 4]
+        )
+        self.assertEqual(models.Score.objects.count(), 1)
+
+    def test_enter_scores_from_csv(self):
+        """Test scores can be uploaded as a CSV file"""
+        content = 'student,score\n' + ''.join(
+            f'{student.pk},{index + 10}\n'
+            for index, student in enumerate(self.students[:3])
+        )
+        upload = SimpleUploadedFile(
+            'scores.csv', content.encode(), content_type='text/csv'
+        )
+        res = self.client.post(
+            scores_url(self.assignment.pk), {'file': upload},
+            format='multipart'
+        )
+
+        self.assertEqual(res.data, {'saved': 3, 'errors': []})
+
+    def test_scores_or_file_required(self):
+        """Test a request without scores is rejected"""
+        res = self.client.post(
+            scores_url(self.assignment.pk), {}, format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
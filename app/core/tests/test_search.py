@@ -0,0 +1,133 @@
+"""Tests for people search"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models
+from core.search import prefix_query, search_people, trigram_available
+from core.tests import helpers
+
+SEARCH_URL = reverse('core:people-search')
+
+
+class SearchTests(TestCase):
+    """Test matching and ranking students"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+        self.kwame = helpers.create_student(
+            self.school, first_name='Kwame', last_name='Mensah',
+            national_id='GHA-712345678-1', phone_number='0244123456'
+        )
+        self.ama = helpers.create_student(
+            self.school, first_name='Ama', middle_name='Kwame',
+            last_name='Owusu', phone_number='020-198-7654'
+        )
+        self.kofi = helpers.create_student(
+            self.school, first_name='Kofi', last_name='Boateng'
+        )
+
+    def search(self, text):
+        return list(search_people(models.Student.objects.all(), text))
+
+    def test_generated_columns(self):
+        """Test the search columns follow the fields on every write"""
+        self.assertEqual(
+            models.Student.objects.get(pk=self.kwame.pk).search_text,
+            'kwame  mensah gha-712345678-1 0244123456'
+        )
+
+        models.Student.objects.filter(pk=self.kofi.pk).update(
+            last_name='Asante'
+        )
+
+        self.assertEqual(self.search('asante'), [self.kofi])
+        self.assertEqual(self.search('boateng'), [])
+
+    def test_prefixes_of_every_word(self):
+        """Test each word of a query matches the start of a name"""
+        self.assertEqual(self.search('Kwa Men'), [self.kwame])
+        self.assertEqual(self.search('ko'), [self.kofi])
+        self.assertEqual(self.search('  '), [])
+        self.assertIsNone(prefix_query('--'))
+
+    def test_ids_and_phone_numbers(self):
+        """Test ids match by their parts and phone numbers by digits"""
+        self.assertEqual(self.search('712345678'), [self.kwame])
+        self.assertEqual(self.search('gha 7123'), [self.kwame])
+        self.assertEqual(self.search('0201987654'), [self.ama])
+        self.assertEqual(self.search('020198'), [self.ama])
+
+    def test_typos(self):
+        """Test misspelt names and the middle of numbers match"""
+        if not trigram_available(connection.alias):
+            self.skipTest('pg_trgm is not installed')
+        self.assertEqual(self.search('kwami mensa'), [self.kwame])
+        self.assertEqual(self.search('4123456'), [self.kwame])
+
+    def test_names_rank_above_other_fields(self):
+        """Test matches on a name rank above matches on an id"""
+        yaw = helpers.create_student(
+            self.school, first_name='Yaw', last_name='Addo',
+            national_id='KWAME-9'
+        )
+        results = search_people(models.Student.objects.all(), 'kwame')
+
+        self.assertEqual(list(results), [self.kwame, self.ama, yaw])
+        self.assertGreater(results[1].rank, results[2].rank)
+
+
+class SearchAPITests(TestCase):
+    """Test the people search endpoint"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+        self.student = helpers.create_student(
+            self.school, first_name='Kwame', last_name='Mensah'
+        )
+        self.teacher = helpers.create_teacher(
+            self.school, first_name='Kwame', last_name='Asare'
+        )
+        other = helpers.create_school('Other High', email='info@other.com')
+        helpers.create_student(other, first_name='Kwame', last_name='Addo')
+        self.user = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123',
+            is_teacher=True, school=self.school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_search_school_students(self):
+        """Test only the students of the teacher's school are found"""
+        res = self.client.get(SEARCH_URL, {'q': 'kwame'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['id'] for row in res.data], [self.student.pk])
+        self.assertEqual(res.data[0]['last_name'], 'Mensah')
+
+    def test_search_teachers(self):
+        """Test teachers are searched with the type parameter"""
+        res = self.client.get(SEARCH_URL, {'q': 'kwa', 'type': 'teacher'})
+
+        self.assertEqual([row['id'] for row in res.data], [self.teacher.pk])
+
+    def test_invalid_query(self):
+        """Test queries shorter than two characters are rejected"""
+        res = self.client.get(SEARCH_URL, {'q': 'k'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_requires_teacher(self):
+        """Test users who are not teachers cannot search"""
+        user = get_user_model().objects.create_user(
+            email='student@eg.com', password='test@pass123',
+            school=self.school
+        )
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(SEARCH_URL, {'q': 'kwame'})
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,151 @@
+"""Tests for school scoping"""
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models
+from core.scores import save_scores
+from core.tenancy import current_school_id, scoped_to, unscoped
+from core.tests import helpers
+
+
+class TenancyTests(TestCase):
+    """Test school keys and scoped queries"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+        self.other_school = helpers.create_school(
+            'Other High', email='info@other.com'
+        )
+        self.lesson = helpers.create_lesson(school=self.school)
+        self.other_lesson = helpers.create_lesson(
+            'Science', school=self.other_school
+        )
+        self.assignment = helpers.create_assignments(
+            self.lesson, {'Exam': (100, [50])}
+        )['Exam'][0]
+        self.other_assignment = helpers.create_assignments(
+            self.other_lesson, {'Exam': (100, [50])}
+        )['Exam'][0]
+        self.student = helpers.create_student(self.school)
+        models.Enrollment.objects.create(
+            student=self.student, lesson=self.lesson
+        )
+
+    def test_school_copied_on_save(self):
+        """Test lessons, assignments and scores take their school"""
+        score = models.Score.objects.create(
+            student=self.student, assignment=self.assignment, score=40
+        )
+
+        self.assertEqual(self.lesson.school, self.school)
+        self.assertEqual(self.assignment.school, self.school)
+        self.assertEqual(score.school, self.school)
+
+    def test_shared_subject_lesson_needs_school(self):
+        """Test lessons of a shared subject keep the school they are given
+        and are refused without one"""
+        shared = models.Subject.objects.create(
+            name='Shared', subject_type='core', subect_code='SHAR'
+        )
+        lesson = models.Lesson.objects.create(
+            subject=shared, school=self.school, term='First', year=2024
+        )
+
+        with scoped_to(self.school):
+            self.assertIn(lesson, models.Lesson.scoped.all())
+        with self.assertRaises(ValidationError):
+            models.Lesson.objects.create(
+                subject=shared, term='First', year=2024
+            )
+
+    def test_bulk_scores_take_school(self):
+        """Test scores saved in bulk get the assignment's school"""
+        save_scores(self.assignment, [{'student': self.student.pk,
+                                       'score': '30'}])
+
+        score = models.Score.objects.get()
+        self.assertEqual(score.school_id, self.school.pk)
+
+    def test_scoped_managers(self):
+        """Test scoped managers only return the current school's rows"""
+        shared = models.Subject.objects.create(
+            name='Shared', subject_type='core', subect_code='SHAR'
+        )
+        self.assertIsNone(current_school_id())
+        self.assertEqual(models.Lesson.scoped.count(), 2)
+
+        with scoped_to(self.school):
+            self.assertEqual(current_school_id(), self.school.pk)
+            self.assertEqual(list(models.Lesson.scoped.all()), [self.lesson])
+            self.assertEqual(
+                list(models.Assignment.scoped.all()), [self.assignment]
+            )
+            self.assertCountEqual(
+                models.Subject.scoped.all(), [self.lesson.subject, shared]
+            )
+
+        self.assertIsNone(current_school_id())
+
+        with scoped_to(None):
+            self.assertEqual(models.Lesson.scoped.count(), 0)
+            with unscoped():
+                self.assertEqual(models.Lesson.scoped.count(), 2)
+
+    def test_subject_names_unique_per_school(self):
+        """Test schools can each have a subject of the same name"""
+        models.Subject.objects.create(
+            school=self.other_school, name='Mathematics',
+            subject_type='core', subect_code='MATH'
+        )
+
+        self.assertEqual(
+            models.Subject.objects.filter(name='Mathematics').count(), 2
+        )
+
+    def test_api_scoped_to_user_school(self):
+        """Test teachers cannot reach another school's lessons"""
+        teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123',
+            is_teacher=True, school=self.school
+        )
+        client = APIClient()
+        client.force_authenticate(user=teacher)
+
+        own = client.get(
+            reverse('core:lesson-gradebook', args=[self.lesson.pk])
+        )
+        other = client.get(
+            reverse('core:lesson-gradebook', args=[self.other_lesson.pk])
+        )
+        scores = client.post(
+            reverse('core:assignment-scores', args=[self.other_assignment.pk]),
+            {'scores': []}, format='json'
+        )
+
+        self.assertEqual(own.status_code, status.HTTP_200_OK)
+        self.assertEqual(other.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(scores.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_user_without_school_sees_nothing(self):
+        """Test users without a school cannot reach any school's lessons"""
+        teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123',
+            is_teacher=True
+        )
+        superuser = get_user_model().objects.create_superuser(
+            email='super@eg.com', password='test@pass123'
+        )
+        client = APIClient()
+        url = reverse('core:lesson-gradebook', args=[self.other_lesson.pk])
+
+        client.force_authenticate(user=teacher)
+        res = client.get(url)
+        client.force_authenticate(user=superuser)
+        res_superuser = client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(res_superuser.status_code, status.HTTP_200_OK)
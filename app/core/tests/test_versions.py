@@ -0,0 +1,141 @@
+"""Tests for conditional requests and the response cache"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models, versions
+from core.scores import save_scores
+from core.tests import helpers
+
+
+def gradebook_url(lesson_id):
+    return reverse('core:lesson-gradebook', args=[lesson_id])
+
+
+class VersionedResponseTests(TestCase):
+    """Test ETags, 304 responses and cached responses"""
+
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE['ALIAS']].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.school = helpers.create_school()
+            self.lesson = helpers.create_lesson(school=self.school)
+            self.assignment = helpers.create_assignments(
+                self.lesson, {'Exam': (100, [50])}
+            )['Exam'][0]
+            self.student = helpers.create_student(self.school)
+            models.Enrollment.objects.create(
+                student=self.student, lesson=self.lesson
+            )
+        self.teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123',
+            is_teacher=True, school=self.school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+
+    def test_not_modified(self):
+        """Test a current ETag gets a 304 without building the response"""
+        res = self.client.get(gradebook_url(self.lesson.pk))
+        etag = res['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                gradebook_url(self.lesson.pk), HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res['ETag'], etag)
+        self.assertIn('Last-Modified', res)
+
+    def test_cached_response(self):
+        """Test responses are served from the cache until data changes"""
+        first = self.client.get(gradebook_url(self.lesson.pk))
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(gradebook_url(self.lesson.pk))
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.json(), first.json())
+        self.assertIn('no-cache', cached['Cache-Control'])
+        self.assertIn('private', cached['Cache-Control'])
+
+    def test_writes_change_etag(self):
+        """Test score writes, single or in bulk, invalidate responses"""
+        first = self.client.get(gradebook_url(self.lesson.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            save_scores(self.assignment, [
+                {'student': self.student.pk, 'score': '25'}
+            ])
+        second = self.client.get(
+            gradebook_url(self.lesson.pk), HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Score.objects.filter(student=self.student).get().delete()
+        third = self.client.get(gradebook_url(self.lesson.pk))
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data['students'][0]['total'], 50.0)
+        self.assertIsNone(third.data['students'][0]['total'])
+        self.assertEqual(
+            len({first['ETag'], second['ETag'], third['ETag']}), 3
+        )
+
+    def test_other_school_writes_keep_etag(self):
+        """Test changes to another school leave the version alone"""
+        etag, _ = versions.current_version(self.school.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            other = helpers.create_school(
+                'Other High', email='info@other.com'
+            )
+            helpers.create_student(other)
+
+        self.assertEqual(versions.current_version(self.school.pk)[0], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Subject.objects.create(
+                name='Shared', subject_type='core', subect_code='SHAR'
+            )
+        self.assertNotEqual(
+            versions.current_version(self.school.pk)[0], etag
+        )
+
+    def test_bumped_once_per_transaction_after_commit(self):
+        """Test a transaction's writes bump the version once it commits,
+        and rolled back writes not at all"""
+        version = models.DataVersion.objects.get(
+            scope=f'school:{self.school.pk}'
+        ).version
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for index in range(1, 4):
+                helpers.create_student(self.school, index)
+            with self.assertNumQueries(0):
+                versions.bump(self.school.pk)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            helpers.create_student(self.school, 4)
+            raise RuntimeError
+
+        self.assertEqual(len(callbacks), 4)
+        self.assertEqual(models.DataVersion.objects.get(
+            scope=f'school:{self.school.pk}'
+        ).version, version + 1)
+
+    def test_users_without_school_not_versioned(self):
+        """Test responses to users of no school are neither tagged nor
+        cached"""
+        admin = get_user_model().objects.create_superuser(
+            'admin@eg.com', 'test@pass123'
+        )
+        self.client.force_authenticate(user=admin)
+
+        res = self.client.get(gradebook_url(self.lesson.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', res)
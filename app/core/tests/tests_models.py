@@ -2,8 +2,11 @@
 Test for models
 """
 
+from datetime import timedelta
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from core import models
 
 
@@ -37,6 +40,25 @@ class ModelTests(TestCase):
         )
         self.assertTrue(user.is_superuser)
 
+    def test_create_role_users(self):
+        """Test role helpers set their own flag and save once"""
+        manager = get_user_model().objects
+        for create, flag in [
+            (manager.create_teacheruser, 'is_teacher'),
+            (manager.create_studentuser, 'is_student'),
+            (manager.create_guardianuser, 'is_guardian'),
+        ]:
+            with self.assertNumQueries(1):
+                user = create(f'{flag}@eg.com', 'test@pass')
+
+            flags = {
+                name: getattr(user, name)
+                for name in ['is_teacher', 'is_student', 'is_guardian']
+            }
+            self.assertEqual(
+                flags, {name: name == flag for name in flags}
+            )
+
     def test_create_teacher_and_student_pins(self):
         """Test create pin(s) for students and teachers"""
         pin = models.PIN.objects.create(
@@ -44,3 +66,26 @@ class ModelTests(TestCase):
         )
         print(pin.pin_code)
         self.assertEqual(pin.pin_type, 'teacher')
+
+    def test_pin_queryset_expiry(self):
+        """Test available and expired pins are selected in SQL"""
+        past = timezone.now() - timedelta(days=1)
+        available = models.PIN.objects.create(
+            pin_code='AVAILABLE1', pin_type='student'
+        )
+        models.PIN.objects.create(
+            pin_code='USED000001', pin_type='student', is_used=True
+        )
+        overdue = models.PIN.objects.create(
+            pin_code='OVERDUE001', pin_type='student', expire=past
+        )
+        marked = models.PIN.objects.create(
+            pin_code='MARKED0001', pin_type='student', is_expired=True
+        )
+
+        self.assertEqual(list(models.PIN.objects.available()), [available])
+        self.assertEqual(
+            set(models.PIN.objects.expired()), {overdue, marked}
+        )
+        self.assertEqual(list(models.PIN.objects.stale()), [overdue])
+        self.assertTrue(marked.has_expired())
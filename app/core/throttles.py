@@ -0,0 +1,47 @@
+"""
+Rate limits of the unauthenticated endpoints.
+
+Throttles run before the view, so rejected attempts never reach the
+password hasher. Rates are set in ``DEFAULT_THROTTLE_RATES``, and the
+request history is kept in the ``shared`` cache so each limit holds
+across every worker rather than per process.
+"""
+from collections.abc import Mapping
+
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from rest_framework.throttling import SimpleRateThrottle
+
+shared_cache = ConnectionProxy(caches, 'shared')
+
+
+class LoginIPRateThrottle(SimpleRateThrottle):
+    """Limit login attempts per client IP"""
+    scope = 'login_ip'
+    cache = shared_cache
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_ident(request)
+        }
+
+
+class LoginEmailRateThrottle(SimpleRateThrottle):
+    """Limit login attempts per email address, whatever the client"""
+    scope = 'login_email'
+    cache = shared_cache
+
+    def get_cache_key(self, request, view):
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return self.cache_format % {
+            'scope': self.scope, 'ident': email.strip().lower()
+        }
+
+
+class PINRedeemIPRateThrottle(LoginIPRateThrottle):
+    """Limit pin redemptions per client IP, against guessing pin codes"""
+    scope = 'pin_redeem_ip'
@@ -1,12 +1,64 @@
 """URLS Mapping for the Core API"""
 from django.urls import path
 
-from core import views
+from core import async_views, views
 
 app_name = 'core'
 
 urlpatterns = [
     path('token/', views.CreateTokenView.as_view(), name='token'),
     path('me/', views.ManageUserView.as_view(), name='me'),
-    path('pins/', views.PINListCreateAPIVIew.as_view(), name='pins')
+    path(
+        'users/bulk/', views.ProvisionUsersView.as_view(), name='users-bulk'
+    ),
+    path('pins/', views.PINListCreateAPIVIew.as_view(), name='pins'),
+    path(
+        'pins/export/', views.PINExportAPIView.as_view(), name='pins-export'
+    ),
+    path(
+        'pins/redeem/', views.RedeemPINView.as_view(), name='pins-redeem'
+    ),
+    path(
+        'lessons/<int:pk>/gradebook/', views.LessonGradebookView.as_view(),
+        name='lesson-gradebook'
+    ),
+    path(
+        'lessons/<int:pk>/rankings/', views.LessonRankingView.as_view(),
+        name='lesson-rankings'
+    ),
+    path('rankings/', views.TermRankingView.as_view(), name='rankings'),
+    path(
+        'lessons/<int:pk>/attendance/', views.LessonAttendanceView.as_view(),
+        name='lesson-attendance'
+    ),
+    path(
+        'people/search/', views.PersonSearchView.as_view(),
+        name='people-search'
+    ),
+    path(
+        'assignments/<int:pk>/scores/', views.AssignmentScoresView.as_view(),
+        name='assignment-scores'
+    ),
+    path(
+        'roster/import/', views.RosterImportView.as_view(),
+        name='roster-import'
+    ),
+    path(
+        'report-cards/', views.ReportCardJobListCreateView.as_view(),
+        name='report-cards'
+    ),
+    path(
+        'report-cards/<int:pk>/', views.ReportCardJobDetailView.as_view(),
+        name='report-card'
+    ),
+    path(
+        'report-cards/<int:pk>/archive/',
+        views.ReportCardArchiveView.as_view(), name='report-card-archive'
+    ),
+    path('async/me/', async_views.me, name='async-me'),
+    path('async/pins/', async_views.pin_list, name='async-pins'),
+    path(
+        'async/lessons/<int:pk>/gradebook/', async_views.lesson_gradebook,
+        name='async-lesson-gradebook'
+    ),
 ]
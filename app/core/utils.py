@@ -1,9 +1,117 @@
-import uuid
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+
+from core.allocators import _random_pin, get_allocator
 from core.models import PIN
 
+logger = logging.getLogger(__name__)
+
+# User flag set for each pin type when a pin is redeemed.
+PIN_ROLE_FLAGS = {
+    'teacher': 'is_teacher',
+    'student': 'is_student',
+}
+
+
+class PINUnavailable(Exception):
+    """The pin does not exist, is used, expired or being redeemed"""
+
 
 def generate_unique_pin():
     while True:
-        pin = (str(uuid.uuid4()).replace("-", "")[:10]).upper()
+        pin = _random_pin()
         if not PIN.objects.filter(pin_code=pin).exists():
             return pin
+
+
+def generate_pins(pin_type, count, school=None, batch_size=None,
+                  issued_to=None):
+    """Create ``count`` pins in batches.
+
+    ``issued_to`` optionally lists ``count`` users, each issued one pin
+    that sets their password when redeemed.
+    Returns the created pins and the time in seconds spent on each batch.
+    """
+    batch_size = batch_size or settings.PIN_GENERATION_BATCH_SIZE
+    allocator = get_allocator()
+    pins = []
+    timings = []
+    with transaction.atomic():
+        while len(pins) < count:
+            started = time.perf_counter()
+            size = min(batch_size, count - len(pins))
+            expire = PIN.default_expire()
+            codes = allocator.allocate(size)
+            while True:
+                users = (
+                    issued_to[len(pins):len(pins) + size]
+                    if issued_to is not None else [None] * size
+                )
+                batch = [
+                    PIN(
+                        pin_code=code, pin_type=pin_type,
+                        school=school, expire=expire, issued_to=user
+                    )
+                    for code, user in zip(codes, users)
+                ]
+                try:
+                    with transaction.atomic():
+                        PIN.objects.bulk_create(batch)
+                    break
+                except IntegrityError:
+                    # Some of the codes are already stored, either by a
+                    # concurrent request or by an earlier allocator.
+                    # Replace only those.
+                    logger.info('PIN batch collided, retrying')
+                    taken = set(
+                        PIN.objects.filter(
+                            pin_code__in=codes
+                        ).values_list('pin_code', flat=True)
+                    )
+                    codes = [code for code in codes if code not in taken]
+                    codes += allocator.allocate(size - len(codes))
+            pins.extend(batch)
+            timings.append(time.perf_counter() - started)
+            logger.info(
+                'Generated %d %s pins in %.3fs',
+                size, pin_type, timings[-1]
+            )
+    return pins, timings
+
+
+def redeem_pin(pin_code, email, password):
+    """Claim a pin and create its user in one transaction.
+
+    A pin issued to an account sets that account's password instead, if
+    ``email`` is the account's. The pin row is locked with ``SKIP LOCKED``
+    so concurrent redemptions of the same pin do not queue behind each
+    other: exactly one claims it and the others fail straight away.
+    """
+    user = get_user_model()(email=email)
+    # Hash before taking the lock, it is the slowest step.
+    user.set_password(password)
+    with transaction.atomic():
+        pin = PIN.objects.available().select_for_update(
+            skip_locked=True
+        ).filter(pin_code=pin_code.upper()).first()
+        if pin is None:
+            raise PINUnavailable(pin_code)
+        if pin.issued_to_id is not None:
+            password = user.password
+            user = pin.issued_to
+            if user.email.lower() != email.lower():
+                raise PINUnavailable(pin_code)
+            user.password = password
+            user.save(update_fields=['password'])
+        else:
+            user.school_id = pin.school_id
+            setattr(user, PIN_ROLE_FLAGS[pin.pin_type], True)
+            user.save()
+        pin.is_used = True
+        pin.used_by = user
+        pin.save(update_fields=['is_used', 'used_by'])
+    return user
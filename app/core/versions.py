@@ -0,0 +1,166 @@
+"""
+Data versions for conditional requests and response caching.
+
+Each school has a version counter, bumped once a write to the rows its
+slow-changing resources are built from commits. The signal handlers in
+``core.signals`` bump it when such rows are saved or deleted, and bulk
+writes, which send no signals, call ``bump`` themselves. Rows shared by
+all schools bump the ``shared`` counter. A transaction bumps each
+counter once, however many rows it writes, and outside of it: writers
+of a school do not queue on the counter's row lock, and responses are
+rebuilt once per transaction instead of per row. Until the bump,
+responses may be cached with newer data than their version, never
+older; a worker dying in between leaves them cached until the next
+change or the cache TTL.
+Lessons have their own counter, bumped whenever their grade totals
+change, for data derived from one lesson's grades only, and the
+``catalog`` counter stamps the catalog of ``core.catalog``.
+
+``versioned`` derives the ETag and Last-Modified of a view's GET
+responses from the counters of the requesting user's school. A client
+revalidating with a current ETag gets a 304 after that one query, before
+the view runs, and the data of other responses is cached under the
+version, so it is built once per change. Requests of users without a
+school are served as usual.
+"""
+import functools
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from core import authentication, catalog
+from core.models import DataVersion
+
+SHARED = 'shared'
+
+# Scopes of this thread's pending bumps.
+_pending = threading.local()
+
+
+def _scope(school_id):
+    return SHARED if school_id is None else f'school:{school_id}'
+
+
+def bump(school_id):
+    """Record a change to the data of a school, or shared data for None,
+    once the current transaction commits"""
+    scope = _scope(school_id)
+    scopes = _pending.__dict__.setdefault('scopes', set())
+    scopes.add(scope)
+    # Every bump registers a callback, as rolled back savepoints drop
+    # theirs, but only the first to run after the commit writes.
+    transaction.on_commit(functools.partial(_bump_pending, scope))
+
+
+def _bump_pending(scope):
+    if scope in _pending.scopes:
+        _pending.scopes.discard(scope)
+        _bump(scope)
+
+
+def bump_catalog():
+    """Record a change to the subjects, lessons or assignment types"""
+    _bump(catalog.SCOPE)
+
+
+def bump_tokens():
+    """Record a change to tokens or users that cached tokens must see"""
+    _bump(authentication.SCOPE)
+
+
+def _bump(scope):
+    now = timezone.now()
+    changes = {'version': F('version') + 1, 'updated_at': now}
+    if DataVersion.objects.filter(scope=scope).update(**changes):
+        return
+    _, created = DataVersion.objects.get_or_create(
+        scope=scope, defaults={'version': 1, 'updated_at': now}
+    )
+    if not created:
+        DataVersion.objects.filter(scope=scope).update(**changes)
+
+
+def bump_lessons(lesson_ids):
+    """Record a change to the grade totals of lessons"""
+    scopes = [f'lesson:{lesson_id}' for lesson_id in set(lesson_ids)]
+    now = timezone.now()
+    changes = {'version': F('version') + 1, 'updated_at': now}
+    if DataVersion.objects.filter(scope__in=scopes).update(
+        **changes
+    ) == len(scopes):
+        return
+    # Create the missing counters, then bump them all again, which only
+    # moves the others further.
+    DataVersion.objects.bulk_create([
+        DataVersion(scope=scope, updated_at=now) for scope in scopes
+    ], ignore_conflicts=True)
+    DataVersion.objects.filter(scope__in=scopes).update(**changes)
+
+
+def lesson_version(lesson_id):
+    """Return the version of a lesson's grade totals"""
+    return DataVersion.objects.filter(
+        scope=f'lesson:{lesson_id}'
+    ).values_list('version', flat=True).first() or 0
+
+
+def current_version(school_id):
+    """Return the ETag and last change time of a school's data"""
+    versions = {
+        scope: (version, updated_at)
+        for scope, version, updated_at in DataVersion.objects.filter(
+            scope__in=[_scope(school_id), SHARED]
+        ).values_list('scope', 'version', 'updated_at')
+    }
+    own, own_changed = versions.get(_scope(school_id), (0, None))
+    shared, shared_changed = versions.get(SHARED, (0, None))
+    changed = [time for time in (own_changed, shared_changed) if time]
+    return f'"{school_id}-{own}-{shared}"', max(changed, default=None)
+
+
+def versioned(method):
+    """Validate and cache the GET responses of a view method by version"""
+    @functools.wraps(method)
+    def wrapper(view, request, *args, **kwargs):
+        school_id = request.user.school_id
+        if school_id is None:
+            return method(view, request, *args, **kwargs)
+        # The version must be read before the view reads the data. Each
+        # statement sees its own snapshot, so data read first could be
+        # older than the version and be cached under it until the next
+        # change.
+        etag, changed = current_version(school_id)
+        last_modified = int(changed.timestamp()) if changed else None
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            cache = caches[settings.RESPONSE_CACHE['ALIAS']]
+            path = hashlib.sha256(request.get_full_path().encode())
+            key = f'response:{etag}:{path.hexdigest()}'
+            data = cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                cache.set(key, response.data, settings.RESPONSE_CACHE['TTL'])
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # Clients keep responses but revalidate them on every use.
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return wrapper
@@ -1,22 +1,68 @@
 """View for the core API"""
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.translation import gettext as _
 from rest_framework import (
     generics,
-    authentication,
-    permissions,status
+    permissions,status,
+    serializers
 )
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from core.serializers import (
     AuthTokenSerializer,
     UserSerializer, PINSerializer,
-    PINGenerateRequestSerializer
+    PINGenerateRequestSerializer,
+    PINExportRequestSerializer,
+    PINFilterSerializer,
+    PINRedeemSerializer,
+    GradebookSerializer,
+    LessonRankingSerializer,
+    TermRankingSerializer,
+    TermRankingFilterSerializer,
+    PersonSearchFilterSerializer,
+    PersonSearchResultSerializer,
+    ScoreBatchSerializer,
+    ScoreBatchResultSerializer,
+    AttendanceMarkSerializer,
+    AttendanceMarkResultSerializer,
+    AttendanceFilterSerializer,
+    LessonAttendanceSerializer,
+    RosterImportRequestSerializer,
+    RosterImportResultSerializer,
+    ProvisionUsersSerializer,
+    ProvisionedUserSerializer,
+    ReportCardJobSerializer
+)
+from app.replicas import replica_reads
+from core import models, report_cards
+from core.attendance import AttendanceError, lesson_attendance, mark_class
+from core.authentication import CachedTokenAuthentication
+from core.exports import WRITERS, keyset_rows
+from core.filters import filter_pins
+from core.gradebook import GradebookError, compute_gradebook
+from core.pagination import KeysetPagination
+from core.provisioning import provision_users
+from core.rankings import lesson_ranking, term_ranking
+from core.roster import RosterError, import_roster
+from core.scores import save_scores
+from core.search import search_people
+from core.throttles import (
+    LoginEmailRateThrottle,
+    LoginIPRateThrottle,
+    PINRedeemIPRateThrottle
 )
-from core import models
-from core.utils import generate_unique_pin
+from core.utils import generate_pins
+from core.versions import versioned
 from drf_spectacular.utils import extend_schema
-from core.permisssions import IsAdminUser
+from core.permisssions import IsAdminUser, IsTeacherUser
 
 
 class CreateTokenView(ObtainAuthToken):
@@ -25,6 +71,10 @@ class CreateTokenView(ObtainAuthToken):
     permission_classes = [
         permissions.AllowAny
     ]
+    throttle_classes = [
+        LoginIPRateThrottle,
+        LoginEmailRateThrottle
+    ]
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
@@ -34,7 +84,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     """Manage the authenticated user"""
     serializer_class = UserSerializer
     authentication_classes = [
-        authentication.TokenAuthentication
+        CachedTokenAuthentication
     ]
     permission_classes = [
         permissions.IsAuthenticated
@@ -45,11 +95,55 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
         return self.request.user
 
 
-class PINListCreateAPIVIew(generics.ListCreateAPIView):
+class SchoolPINMixin:
+    """Limit pins to the school of the requesting user"""
     queryset = models.PIN.objects.all()
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.school_id is not None:
+            return queryset.filter(school_id=user.school_id)
+        return queryset if user.is_superuser else queryset.none()
+
+
+class ProvisionUsersView(generics.GenericAPIView):
+    """Create users of the requesting admin's school in bulk"""
+    serializer_class = ProvisionUsersSerializer
+    permission_classes = [
+        IsAdminUser
+    ]
+
+    @extend_schema(responses={201: ProvisionedUserSerializer(many=True)})
+    def post(self, request, format=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            users, pins = provision_users(
+                serializer.validated_data['accounts'],
+                serializer.validated_data['role'],
+                school=request.user.school,
+                issue_pins=serializer.validated_data['issue_pins']
+            )
+        except IntegrityError:
+            raise serializers.ValidationError(
+                {'accounts': _('Emails repeated or already in use')}
+            )
+
+        pin_codes = [pin.pin_code for pin in pins] or [None] * len(users)
+        result = ProvisionedUserSerializer([
+            {'id': user.pk, 'email': user.email, 'pin_code': pin_code}
+            for user, pin_code in zip(users, pin_codes)
+        ], many=True)
+        return Response(result.data, status=status.HTTP_201_CREATED)
+
+
+@replica_reads
+class PINListCreateAPIVIew(SchoolPINMixin, generics.ListCreateAPIView):
     permission_classes = [
         IsAdminUser
     ]
+    pagination_class = KeysetPagination
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -62,28 +156,327 @@ class PINListCreateAPIVIew(generics.ListCreateAPIView):
         responses={201: PINSerializer(many=True)}
     )
     def post(self, request, format=None):
-        pin_type = request.data.get('pin_type')
-        pin_count = request.data.get('pin_count', 1)
-        school = request.user.school
-        if not pin_type:
+        request_serializer = PINGenerateRequestSerializer(data=request.data)
+        request_serializer.is_valid(raise_exception=True)
+        pins, timings = generate_pins(
+            request_serializer.validated_data['pin_type'],
+            request_serializer.validated_data['pin_count'],
+            school=request.user.school
+        )
+
+        serializer = PINSerializer(pins, many=True)
+        response = Response(serializer.data, status=status.HTTP_201_CREATED)
+        response['Server-Timing'] = ', '.join(
+            f'pin-batch-{index};dur={seconds * 1000:.1f}'
+            for index, seconds in enumerate(timings)
+        )
+        return response
+
+    def filter_queryset(self, queryset):
+        serializer = PINFilterSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return filter_pins(queryset, serializer.validated_data)
+
+    @extend_schema(parameters=[PINFilterSerializer])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+@replica_reads
+class PINExportAPIView(SchoolPINMixin, generics.GenericAPIView):
+    """Stream pins as CSV or NDJSON for printing"""
+    serializer_class = PINExportRequestSerializer
+    permission_classes = [
+        IsAdminUser
+    ]
+    export_fields = (
+        'id', 'pin_code', 'pin_type', 'school_id', 'is_used',
+        'used_by_id', 'issued_to__email', 'created_at', 'expire'
+    )
+
+    @extend_schema(parameters=[PINExportRequestSerializer])
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        output = serializer.validated_data['output']
+        pins = filter_pins(self.get_queryset(), serializer.validated_data)
+        # Rows are read while the response streams, after the request's
+        # database routing has ended, so choose the database now.
+        rows = keyset_rows(
+            pins.using(pins.db), self.export_fields,
+            settings.PIN_EXPORT_CHUNK_SIZE
+        )
+
+        writer, content_type = WRITERS[output]
+        response = StreamingHttpResponse(
+            writer(self.export_fields, rows), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="pins.{output}"'
+        )
+        return response
+
+
+class RedeemPINView(generics.CreateAPIView):
+    """Redeem a pin to create a teacher or student account"""
+    serializer_class = PINRedeemSerializer
+    authentication_classes = []
+    permission_classes = [
+        permissions.AllowAny
+    ]
+    throttle_classes = [
+        PINRedeemIPRateThrottle
+    ]
+
+
+@replica_reads
+class LessonGradebookView(APIView):
+    """Return the grades of every student of a lesson"""
+    permission_classes = [
+        IsTeacherUser
+    ]
+
+    @extend_schema(responses={200: GradebookSerializer})
+    @versioned
+    def get(self, request, pk):
+        lesson = get_object_or_404(models.Lesson.scoped, pk=pk)
+        try:
+            gradebook = compute_gradebook(lesson)
+        except GradebookError as error:
             return Response(
-                {"error": "pin_type is required"},
+                {"error": str(error)},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        pins = []
-        for _ in range(pin_count):
-            pin_code = generate_unique_pin()
-            pin = models.PIN(
-                pin_code=pin_code,
-                pin_type=pin_type,
-                school=school
+
+        return Response({
+            'lesson': lesson.pk,
+            'categories': gradebook.categories(),
+            'students': gradebook.rows(),
+        })
+
+
+@replica_reads
+class LessonRankingView(APIView):
+    """Return the class positions of the students of a lesson"""
+    permission_classes = [
+        IsTeacherUser
+    ]
+
+    @extend_schema(responses={200: LessonRankingSerializer})
+    def get(self, request, pk):
+        lesson = get_object_or_404(models.Lesson.scoped, pk=pk)
+        return Response(lesson_ranking(lesson))
+
+
+@replica_reads
+class TermRankingView(APIView):
+    """Return the overall positions of the school's students in a term"""
+    permission_classes = [
+        IsTeacherUser
+    ]
+
+    @extend_schema(
+        parameters=[TermRankingFilterSerializer],
+        responses={200: TermRankingSerializer}
+    )
+    def get(self, request):
+        serializer = TermRankingFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        if request.user.school_id is None:
+            raise serializers.ValidationError(
+                _('Rankings are kept for the school you belong to')
             )
-            pin.save()
-            pins.append(pin)
-        
-        serializer = PINSerializer(pins, many=True)
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(term_ranking(
+            request.user.school_id, serializer.validated_data['term'],
+            serializer.validated_data['year']
+        ))
 
+
+@replica_reads
+class PersonSearchView(APIView):
+    """Find the school's students or teachers by name, id or phone"""
+    permission_classes = [
+        IsTeacherUser
+    ]
+    person_models = {
+        'student': models.Student, 'teacher': models.Teacher
+    }
+
+    @extend_schema(
+        parameters=[PersonSearchFilterSerializer],
+        responses={200: PersonSearchResultSerializer(many=True)}
+    )
+    def get(self, request):
+        serializer = PersonSearchFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        if request.user.school_id is None:
+            raise serializers.ValidationError(
+                _('Search covers the school you belong to')
+            )
+        people = self.person_models[params['type']].objects.filter(
+            school_id=request.user.school_id
+        ).only(
+            'id', 'first_name', 'middle_name', 'last_name', 'national_id',
+            'phone_number'
+        )
+        results = search_people(people, params['q'])[:params['limit']]
+        return Response(
+            PersonSearchResultSerializer(results, many=True).data
+        )
+
+
+class AssignmentScoresView(generics.GenericAPIView):
+    """Enter the scores of a whole class for an assignment"""
+    serializer_class = ScoreBatchSerializer
+    permission_classes = [
+        IsTeacherUser
+    ]
+
+    def get_queryset(self):
+        return models.Assignment.scoped.select_related('assignment_type')
+
+    @extend_schema(responses={200: ScoreBatchResultSerializer})
+    def post(self, request, pk):
+        assignment = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        saved, errors = save_scores(
+            assignment, serializer.validated_data['scores']
+        )
+        return Response({'saved': saved, 'errors': errors})
+
+
+@replica_reads
+class LessonAttendanceView(APIView):
+    """Mark the attendance of a class and report it by month"""
+    permission_classes = [
+        IsTeacherUser
+    ]
+
+    @extend_schema(
+        parameters=[AttendanceFilterSerializer],
+        responses={200: LessonAttendanceSerializer}
+    )
+    def get(self, request, pk):
+        lesson = get_object_or_404(models.Lesson.scoped, pk=pk)
+        serializer = AttendanceFilterSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        report = lesson_attendance(lesson, serializer.validated_data['month'])
+        return Response(LessonAttendanceSerializer(report).data)
+
+    @extend_schema(
+        request=AttendanceMarkSerializer,
+        responses={200: AttendanceMarkResultSerializer}
+    )
+    def post(self, request, pk):
+        lesson = get_object_or_404(models.Lesson.scoped, pk=pk)
+        serializer = AttendanceMarkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        try:
+            marked = mark_class(
+                lesson, params['date'], params['period'], params['absent']
+            )
+        except AttendanceError as error:
+            return Response(
+                {"error": str(error)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'marked': marked})
+
+
+class RosterImportView(generics.GenericAPIView):
+    """Import students, teachers or enrollments from a CSV or XLSX file.
+
+    Posting a file whose import was interrupted resumes it.
+    """
+    serializer_class = RosterImportRequestSerializer
+    permission_classes = [
+        IsAdminUser
+    ]
+
+    @extend_schema(responses={201: RosterImportResultSerializer})
+    def post(self, request, format=None):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        school = serializer.validated_data.get('school', request.user.school)
+        if school is None or not (
+            request.user.is_superuser or school.pk == request.user.school_id
+        ):
+            raise serializers.ValidationError(
+                {'school': _('Choose a school you administer')}
+            )
+        file = serializer.validated_data['file']
+        try:
+            job, errors, rows_per_second = import_roster(
+                file, file.name, serializer.validated_data['kind'], school
+            )
+        except RosterError as error:
+            raise serializers.ValidationError({'file': str(error)})
+
+        result = RosterImportResultSerializer({
+            'job': job, 'errors': errors, 'rows_per_second': rows_per_second
+        })
+        return Response(result.data, status=status.HTTP_201_CREATED)
+
+
+class SchoolReportCardMixin:
+    """Limit report card jobs to the school of the requesting user"""
+    serializer_class = ReportCardJobSerializer
+    permission_classes = [
+        IsAdminUser
+    ]
+
+    def get_queryset(self):
+        return models.ReportCardJob.objects.filter(
+            school_id=self.request.user.school_id
+        ).order_by('-created_at')
+
+
+class ReportCardJobListCreateView(
+    SchoolReportCardMixin, generics.ListCreateAPIView
+):
+    """Queue the report cards of a term and follow their progress"""
+    pagination_class = KeysetPagination
+
+    def create(self, request, *args, **kwargs):
+        if request.user.school_id is None:
+            raise serializers.ValidationError(
+                _('Report cards are built for the school you administer')
+            )
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def perform_create(self, serializer):
+        serializer.save(
+            school_id=self.request.user.school_id,
+            requested_by=self.request.user
+        )
+
+
+class ReportCardJobDetailView(
+    SchoolReportCardMixin, generics.RetrieveAPIView
+):
+    """Progress of a report card job"""
+
+
+class ReportCardArchiveView(SchoolReportCardMixin, generics.GenericAPIView):
+    """Download the zip archive of a finished report card job"""
+
+    @extend_schema(responses={(200, 'application/zip'): bytes})
     def get(self, request, *args, **kwargs):
-        return super().get(request, *args, **kwargs)
+        job = self.get_object()
+        if job.status != 'done':
+            raise Http404(_('The report cards are not ready'))
+        path = Path(settings.REPORT_CARD_DIR) / job.archive
+        try:
+            archive = path.open('rb')
+        except FileNotFoundError:
+            report_cards.requeue(job)
+            raise Http404(_('The report cards are being built again'))
+        return FileResponse(
+            archive, as_attachment=True, filename=job.archive,
+            content_type='application/zip'
+        )
@@ -0,0 +1,33 @@
+"""
+Gunicorn settings of the production profile, read from the environment.
+
+Sync workers serve the DRF views, one request at a time each, so the
+default is the usual 2 x CPUs + 1. Set GUNICORN_WORKER_CLASS to
+``uvicorn.workers.UvicornWorker`` to serve the ASGI application instead,
+where one worker per CPU is enough.
+"""
+import multiprocessing
+import os
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+
+_cpus = multiprocessing.cpu_count()
+workers = int(os.environ.get(
+    'WEB_CONCURRENCY', _cpus if 'uvicorn' in worker_class else _cpus * 2 + 1
+))
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Restart workers now and then so leaks cannot build up, at staggered
+# times so they do not all restart together.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 500))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
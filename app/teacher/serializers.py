@@ -0,0 +1,103 @@
+"""
+Serializers for the Teacher API
+"""
+from rest_framework import serializers
+
+
+class ReadOnlySerializer(serializers.Serializer):
+    """Serializer for long read-only lists.
+
+    Fields are declared as usual and document the output, but a row is
+    built by following each field's source attributes directly. Values
+    that are already JSON types are used as they are, skipping most of
+    the per field work of DRF serializers.
+    """
+
+    def to_representation(self, instance):
+        row = {}
+        for field in self._readable_fields:
+            value = instance
+            for attr in field.source_attrs:
+                if value is None:
+                    break
+                value = getattr(value, attr)
+            if value is not None and not isinstance(
+                value, (str, int, float)
+            ):
+                value = field.to_representation(value)
+            row[field.field_name] = value
+        return row
+
+
+class SubjectSerializer(ReadOnlySerializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    code = serializers.CharField(source='subect_code')
+
+
+class LessonSerializer(ReadOnlySerializer):
+    id = serializers.IntegerField()
+    subject = SubjectSerializer()
+    description = serializers.CharField()
+    term = serializers.CharField()
+    year = serializers.IntegerField()
+    student_count = serializers.IntegerField()
+
+
+class PersonSerializer(ReadOnlySerializer):
+    id = serializers.IntegerField()
+    first_name = serializers.CharField()
+    middle_name = serializers.CharField()
+    last_name = serializers.CharField()
+    gender = serializers.CharField()
+    email = serializers.EmailField(source='user.email', allow_null=True)
+
+
+class TeacherSerializer(PersonSerializer):
+    phone_number = serializers.CharField()
+
+
+class EnrolledLessonSerializer(ReadOnlySerializer):
+    id = serializers.IntegerField(source='lesson.id')
+    subject = serializers.CharField(source='lesson.subject.name')
+    term = serializers.CharField(source='lesson.term')
+    year = serializers.IntegerField(source='lesson.year')
+
+
+class StudentSerializer(PersonSerializer):
+    grade_level = serializers.CharField()
+    lessons = EnrolledLessonSerializer(source='enrollments', many=True)
+
+
+class RosterStudentSerializer(ReadOnlySerializer):
+    """A student in the roster of a lesson"""
+    id = serializers.IntegerField(source='student.id')
+    first_name = serializers.CharField(source='student.first_name')
+    middle_name = serializers.CharField(source='student.middle_name')
+    last_name = serializers.CharField(source='student.last_name')
+    gender = serializers.CharField(source='student.gender')
+    email = serializers.EmailField(
+        source='student.user.email', allow_null=True
+    )
+    grade_level = serializers.CharField(source='student.grade_level')
+    enrollment = serializers.IntegerField(source='id')
+
+
+class LessonRosterSerializer(serializers.Serializer):
+    """Students enrolled in a lesson"""
+    lesson = LessonSerializer()
+    students = RosterStudentSerializer(many=True)
+
+
+class LessonFilterSerializer(serializers.Serializer):
+    """Query parameters for filtering lessons"""
+    year = serializers.IntegerField(required=False)
+    term = serializers.CharField(required=False)
+
+
+class StudentFilterSerializer(serializers.Serializer):
+    """Query parameters for filtering students"""
+    grade_level = serializers.CharField(required=False)
+    lesson = serializers.IntegerField(
+        required=False, help_text='Only students enrolled in this lesson'
+    )
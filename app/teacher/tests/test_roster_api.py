@@ -0,0 +1,183 @@
+"""Tests for the roster endpoints"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import models
+from core.tests import helpers
+
+LESSONS_URL = reverse('teacher:lessons')
+STUDENTS_URL = reverse('teacher:students')
+TEACHERS_URL = reverse('teacher:teachers')
+
+
+def roster_url(lesson_id):
+    return reverse('teacher:lesson-roster', args=[lesson_id])
+
+
+class RosterAPITests(TestCase):
+    """Test the roster lists of a school"""
+
+    def setUp(self):
+        self.school = helpers.create_school()
+        self.other_school = helpers.create_school(
+            'Other High', email='info@other.com'
+        )
+        self.teacher = get_user_model().objects.create_user(
+            email='teacher@eg.com', password='test@pass123',
+            is_teacher=True, school=self.school
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher)
+        self.lesson = helpers.create_lesson(school=self.school)
+        self.other_lesson = helpers.create_lesson(
+            'Science', school=self.other_school
+        )
+
+    def add_students(self, count, start=0):
+        students = []
+        # Run the version bumps made on commit.
+        with self.captureOnCommitCallbacks(execute=True):
+            for index in range(start, start + count):
+                student = helpers.create_student(self.school, index)
+                student.user = get_user_model().objects.create_user(
+                    email=f'student{index}@eg.com', is_student=True
+                )
+                student.save()
+                models.Enrollment.objects.create(
+                    student=student, lesson=self.lesson
+                )
+                students.append(student)
+        return students
+
+    def test_lesson_roster(self):
+        """Test the roster lists enrolled students by name"""
+        students = self.add_students(2)
+        helpers.create_student(self.school, 9)
+
+        res = self.client.get(roster_url(self.lesson.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['lesson']['student_count'], 2)
+        self.assertEqual(
+            res.data['lesson']['subject'],
+            {'id': self.lesson.subject_id, 'name': 'Mathematics',
+             'code': 'MATH'}
+        )
+        self.assertEqual(res.data['students'][0], {
+            'id': students[0].pk, 'first_name': 'First0', 'middle_name': '',
+            'last_name': 'Last0', 'gender': 'f', 'email': 'student0@eg.com',
+            'grade_level': 'JHS 1',
+            'enrollment': students[0].enrollments.get().pk,
+        })
+
+    def test_lesson_roster_query_count(self):
+        """Test the roster costs the same queries for any class size"""
+        self.add_students(2)
+        with self.assertNumQueries(3):
+            self.client.get(roster_url(self.lesson.pk))
+
+        self.add_students(20, start=2)
+        with self.assertNumQueries(3):
+            res = self.client.get(roster_url(self.lesson.pk))
+        self.assertEqual(len(res.data['students']), 22)
+
+    def test_other_school_roster_not_found(self):
+        """Test teachers cannot read the roster of another school"""
+        res = self.client.get(roster_url(self.other_lesson.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_lessons(self):
+        """Test lessons of the school are listed with their class size"""
+        self.add_students(3)
+        helpers.create_lesson('English', school=self.school, year=2023)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(LESSONS_URL, {'year': 2024})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(lesson['id'], lesson['student_count'])
+             for lesson in res.data['results']],
+            [(self.lesson.pk, 3)]
+        )
+
+    def test_students_with_lessons(self):
+        """Test students are listed with their lessons in fixed queries"""
+        self.add_students(2)
+        english = helpers.create_lesson('English', school=self.school)
+        models.Enrollment.objects.create(
+            student=models.Student.objects.first(), lesson=english
+        )
+        helpers.create_student(self.other_school, 5)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(STUDENTS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+        lessons = res.data['results'][0]['lessons']
+        self.assertEqual(
+            [lesson['subject'] for lesson in lessons],
+            ['Mathematics', 'English']
+        )
+
+        self.add_students(20, start=2)
+        with self.assertNumQueries(3):
+            res = self.client.get(STUDENTS_URL, {'lesson': self.lesson.pk})
+        self.assertEqual(len(res.data['results']), 22)
+
+    def test_students_pagination(self):
+        """Test walking the pages returns every student once"""
+        students = self.add_students(5)
+        ids = []
+        url = STUDENTS_URL + '?page_size=2'
+        while url:
+            res = self.client.get(url)
+            ids += [student['id'] for student in res.data['results']]
+            url = res.data['next']
+
+        self.assertEqual(ids, [student.pk for student in students])
+
+    def test_teachers(self):
+        """Test teachers of the school are listed with their email"""
+        teacher = helpers.create_teacher(self.school, user=self.teacher)
+        helpers.create_teacher(self.other_school, 1)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(TEACHERS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['id'], row['email']) for row in res.data['results']],
+            [(teacher.pk, 'teacher@eg.com')]
+        )
+
+    def test_requires_teacher(self):
+        """Test students cannot read rosters"""
+        student = get_user_model().objects.create_user(
+            email='student@eg.com', password='test@pass123', is_student=True
+        )
+        self.client.force_authenticate(user=student)
+
+        for url in [LESSONS_URL, STUDENTS_URL, roster_url(self.lesson.pk)]:
+            res = self.client.get(url)
+
+            self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_teacher_without_school_lists_nothing(self):
+        """Test teachers without a school see no school's people"""
+        self.add_students(1)
+        helpers.create_teacher(self.school)
+        teacher = get_user_model().objects.create_user(
+            email='new@eg.com', password='test@pass123', is_teacher=True
+        )
+        self.client.force_authenticate(user=teacher)
+
+        for url in [STUDENTS_URL, TEACHERS_URL]:
+            res = self.client.get(url)
+
+            self.assertEqual(res.data['results'], [])
@@ -0,0 +1,16 @@
+"""URLS Mapping for the Teacher API"""
+from django.urls import path
+
+from teacher import views
+
+app_name = 'teacher'
+
+urlpatterns = [
+    path('lessons/', views.LessonListView.as_view(), name='lessons'),
+    path(
+        'lessons/<int:pk>/students/', views.LessonRosterView.as_view(),
+        name='lesson-roster'
+    ),
+    path('students/', views.StudentListView.as_view(), name='students'),
+    path('teachers/', views.TeacherListView.as_view(), name='teachers'),
+]
@@ -1,3 +1,158 @@
-from django.shortcuts import render
+"""
+Views for the Teacher API
 
-# Create your views here.
+Roster lists are read with a fixed number of queries whatever the size
+of the school or class: related rows are joined with ``select_related``
+or fetched in one more query with ``prefetch_related``, and ``only``
+reads just the columns serialized. Responses are validated and cached
+by the version of the school's data.
+"""
+from django.db.models import Count, Prefetch
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import extend_schema
+from rest_framework import generics
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from app.replicas import replica_reads
+from core.models import Enrollment, Lesson, Student, Teacher
+from core.pagination import IdKeysetPagination
+from core.permisssions import IsTeacherUser
+from core.versions import versioned
+from teacher.serializers import (
+    LessonFilterSerializer,
+    LessonRosterSerializer,
+    LessonSerializer,
+    StudentFilterSerializer,
+    StudentSerializer,
+    TeacherSerializer
+)
+
+PERSON_FIELDS = (
+    'id', 'first_name', 'middle_name', 'last_name', 'gender', 'user__email'
+)
+LESSON_FIELDS = (
+    'id', 'description', 'term', 'year',
+    'subject__id', 'subject__name', 'subject__subect_code'
+)
+
+
+class SchoolRosterMixin:
+    """Limit rows to the school of the requesting user"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.school_id is not None:
+            return queryset.filter(school_id=user.school_id)
+        return queryset if user.is_superuser else queryset.none()
+
+
+@replica_reads
+class LessonListView(generics.ListAPIView):
+    """Lessons of the school with their subject and number of students"""
+    serializer_class = LessonSerializer
+    pagination_class = IdKeysetPagination
+    permission_classes = [
+        IsTeacherUser
+    ]
+
+    def get_queryset(self):
+        return Lesson.scoped.select_related('subject').only(
+            *LESSON_FIELDS
+        ).annotate(student_count=Count('enrollments'))
+
+    def filter_queryset(self, queryset):
+        serializer = LessonFilterSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return queryset.filter(**serializer.validated_data)
+
+    @extend_schema(parameters=[LessonFilterSerializer])
+    @versioned
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+@replica_reads
+class LessonRosterView(APIView):
+    """Students enrolled in a lesson, by name"""
+    permission_classes = [
+        IsTeacherUser
+    ]
+
+    @extend_schema(responses={200: LessonRosterSerializer})
+    @versioned
+    def get(self, request, pk):
+        lesson = get_object_or_404(
+            Lesson.scoped.select_related('subject').only(*LESSON_FIELDS),
+            pk=pk
+        )
+        enrollments = list(
+            Enrollment.objects.filter(lesson=lesson).select_related(
+                'student__user'
+            ).only(
+                'id', 'student__grade_level',
+                *(f'student__{field}' for field in PERSON_FIELDS)
+            ).order_by(
+                'student__last_name', 'student__first_name', 'student_id'
+            )
+        )
+        lesson.student_count = len(enrollments)
+        return Response(LessonRosterSerializer({
+            'lesson': lesson, 'students': enrollments
+        }).data)
+
+
+@replica_reads
+class StudentListView(SchoolRosterMixin, generics.ListAPIView):
+    """Students of the school with the lessons they are enrolled in"""
+    queryset = Student.objects.all()
+    serializer_class = StudentSerializer
+    pagination_class = IdKeysetPagination
+    permission_classes = [
+        IsTeacherUser
+    ]
+
+    def get_queryset(self):
+        lessons = Enrollment.objects.select_related('lesson__subject').only(
+            'student', 'lesson__id', 'lesson__term', 'lesson__year',
+            'lesson__subject__name'
+        ).order_by('lesson_id')
+        return super().get_queryset().select_related('user').only(
+            'grade_level', *PERSON_FIELDS
+        ).prefetch_related(Prefetch('enrollments', queryset=lessons))
+
+    def filter_queryset(self, queryset):
+        serializer = StudentFilterSerializer(data=self.request.query_params)
+        serializer.is_valid(raise_exception=True)
+        filters = serializer.validated_data
+        if 'grade_level' in filters:
+            queryset = queryset.filter(grade_level=filters['grade_level'])
+        if 'lesson' in filters:
+            queryset = queryset.filter(enrollments__lesson=filters['lesson'])
+        return queryset
+
+    @extend_schema(parameters=[StudentFilterSerializer])
+    @versioned
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+@replica_reads
+class TeacherListView(SchoolRosterMixin, generics.ListAPIView):
+    """Teachers of the school"""
+    queryset = Teacher.objects.all()
+    serializer_class = TeacherSerializer
+    pagination_class = IdKeysetPagination
+    permission_classes = [
+        IsTeacherUser
+    ]
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('user').only(
+            'phone_number', *PERSON_FIELDS
+        )
+
+    @versioned
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)